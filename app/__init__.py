@@ -2,10 +2,11 @@
 OceanVocab Editor - Application Factory
 """
 import os
+import click
 from flask import Flask, request
 from dotenv import load_dotenv
 
-from app.extensions import db, babel
+from app.extensions import db, babel, migrate
 from app.routes import register_blueprints
 from config.settings import config
 
@@ -30,8 +31,16 @@ def create_app(config_name=None):
     
     # Initialize extensions
     db.init_app(app)
+    migrate.init_app(app, db, directory=os.path.join(app.root_path, '..', 'migrations'))
     babel.init_app(app, locale_selector=get_locale)
     
+    # Keep derived data (SPARQL store, caches) in step with vocabulary writes
+    init_change_tracking(app)
+    
+    # Background import jobs
+    from app.services import import_jobs
+    import_jobs.init_app(app)
+    
     # Context processor for templates
     @app.context_processor
     def inject_conf_var():
@@ -46,21 +55,115 @@ def create_app(config_name=None):
     return app
 
 
+def init_change_tracking(app):
+    """Install change listeners and subscribe derived data stores."""
+    from app.services import (
+        changes, relations, closure, vocab_stats, search, sparql_store, sparql_cache, sparql_pool,
+        concept_cache, snapshot
+    )
+    changes.init_app(app)
+    relations.init_app(app)
+    closure.init_app(app)
+    vocab_stats.init_app(app)
+    search.init_app(app)
+    sparql_store.init_app(app)
+    sparql_cache.init_app(app)
+    sparql_pool.init_app(app)
+    concept_cache.init_app(app)
+    snapshot.init_app(app)
+
+
 def register_cli_commands(app):
     """Register CLI commands."""
     
     @app.cli.command("init-db")
     def init_db_command():
-        """Creates database tables."""
-        db.create_all()
+        """Creates or upgrades the database tables (runs the migrations)."""
+        from flask_migrate import upgrade
+        upgrade()
         print("Initialized the database.")
     
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """EXPLAINs the hot queries; fails if one needs a sequential scan."""
+        from app.services.query_plans import check_query_plans
+        try:
+            results = check_query_plans()
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        for result in results:
+            status = 'ok' if result['ok'] else 'SEQ SCAN ' + ', '.join(result['seq_scans'])
+            print(f"{result['name']:<30} {status:<25} {', '.join(result['indexes'])}")
+        failed = [result['name'] for result in results if not result['ok']]
+        if failed:
+            raise click.ClickException(f"{len(failed)} hot queries scan tables sequentially")
+    
+    @app.cli.command("check-rdf-reader")
+    def check_rdf_reader_command():
+        """Round-trips data/RDF through the streaming RDF/XML reader; fails on any difference."""
+        from app.services.rdf_loader import rdf_paths
+        from app.services.reader_checks import check_round_trip
+        failed = 0
+        for path in rdf_paths(os.path.join(app.root_path, '..', 'data', 'RDF')):
+            for result in check_round_trip(path):
+                if result['error']:
+                    status = 'ERROR ' + result['error']
+                elif result['ok']:
+                    status = 'ok'
+                else:
+                    status = f"{result['missing']} missing, {result['unexpected']} unexpected triples"
+                print(f"{os.path.basename(path):<30} {result['format']:<12} {status}")
+                failed += not result['ok']
+        if failed:
+            raise click.ClickException(f"{failed} round trips differ from rdflib")
+    
     @app.cli.command("import-rdf")
-    def import_rdf_command():
+    @click.option('--workers', type=int, default=None, help='Parser processes (default: CPU count).')
+    @click.option('--force', is_flag=True, help='Re-import files that have not changed.')
+    def import_rdf_command(workers, force):
         """Imports all RDF files from the data/RDF directory."""
         from app.services.rdf_loader import import_all_rdf
         rdf_dir = os.path.join(app.root_path, '..', 'data', 'RDF')
-        if os.path.exists(rdf_dir):
-            import_all_rdf(rdf_dir)
-        else:
+        if not os.path.exists(rdf_dir):
             print(f"Directory not found: {rdf_dir}")
+            return
+        
+        results = import_all_rdf(rdf_dir, workers=workers, force=force)
+        print(f"{'File':<30} {'Status':<10} {'Concepts':>9} {'Parse (s)':>10} {'Write (s)':>10}")
+        for result in results:
+            print(f"{result['file']:<30} {result['status']:<10} {result.get('concepts', ''):>9} "
+                  f"{result.get('parse_seconds', 0):>10.2f} {result.get('write_seconds', 0):>10.2f}"
+                  + (f"  {result['error']}" if result.get('error') else ''))
+    
+    @app.cli.command("bootstrap-rdf")
+    @click.option('--workers', type=int, default=None, help='Parser processes (default: CPU count).')
+    def bootstrap_rdf_command(workers):
+        """Loads all RDF files from data/RDF into an empty database with COPY."""
+        from app.services.bootstrap import bootstrap_rdf
+        rdf_dir = os.path.join(app.root_path, '..', 'data', 'RDF')
+        if not os.path.exists(rdf_dir):
+            print(f"Directory not found: {rdf_dir}")
+            return
+        
+        try:
+            summary = bootstrap_rdf(rdf_dir, workers=workers)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        print(f"{'File':<30} {'Status':<10} {'Concepts':>9} {'Parse (s)':>10} {'Copy (s)':>10}")
+        for result in summary['files']:
+            print(f"{result['file']:<30} {result['status']:<10} {result.get('concepts', ''):>9} "
+                  f"{result.get('parse_seconds', 0):>10.2f} {result.get('copy_seconds', 0):>10.2f}"
+                  + (f"  {result['error']}" if result.get('error') else ''))
+        print(f"Loaded {summary['concepts']} concepts in {summary['total_seconds']:.1f}s "
+              f"(index build {summary['index_seconds']:.1f}s)")
+    
+    @app.cli.command("export-all")
+    @click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+    @click.option('--force', is_flag=True, help='Re-serialize vocabularies that did not change.')
+    def export_all_command(workers, force):
+        """Dumps all vocabularies to a gzip-compressed N-Quads archive."""
+        from app.services.dump import build_dump, dump_dir
+        manifest = build_dump(workers or app.config.get('DUMP_WORKERS'), force=force)
+        for entry in manifest['vocabularies']:
+            print(f"{entry['code']}: {entry['triples']} triples (sha256 {entry['sha256'][:12]})")
+        print(f"Wrote {manifest['triples']} triples to {os.path.join(dump_dir(), manifest['file'])}")
@@ -1,6 +1,8 @@
 """Flask extensions initialization."""
 from flask_sqlalchemy import SQLAlchemy
 from flask_babel import Babel
+from flask_migrate import Migrate
 
 db = SQLAlchemy()
 babel = Babel()
+migrate = Migrate()
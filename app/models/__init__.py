@@ -3,5 +3,12 @@ from app.extensions import db
 from app.models.user import User
 from app.models.vocabulary import Vocabulary, Term
 from app.models.change_request import ChangeRequest
+from app.models.import_job import ImportJob
+from app.models.source_file import SourceFile
+from app.models.term_relation import TermRelation
+from app.models.concept_closure import ConceptClosure, ConceptNode
+from app.models.vocabulary_stats import VocabularyStats
+from app.models.term_search import TermSearch
 
-__all__ = ['db', 'User', 'Vocabulary', 'Term', 'ChangeRequest']
+__all__ = ['db', 'User', 'Vocabulary', 'Term', 'ChangeRequest', 'ImportJob', 'SourceFile', 'TermRelation',
+           'ConceptClosure', 'ConceptNode', 'VocabularyStats', 'TermSearch']
@@ -6,6 +6,12 @@ from app.extensions import db
 
 class ChangeRequest(db.Model):
     __tablename__ = 'change_requests'
+    __table_args__ = (
+        # Review queue: pending requests, newest first (routes.admin)
+        db.Index('ix_change_requests_status_created', 'status', 'created_at'),
+        # Requests of a term (foreign key lookups when terms are reviewed or removed)
+        db.Index('ix_change_requests_term', 'term_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
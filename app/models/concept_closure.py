@@ -0,0 +1,32 @@
+"""ConceptClosure and ConceptNode models."""
+from app.extensions import db
+
+
+class ConceptClosure(db.Model):
+    """
+    Ancestor/descendant pair of a vocabulary's hierarchy, self pairs included (depth 0).
+    
+    Maintained by app.services.closure from the broader/narrower relations.
+    """
+    __tablename__ = 'concept_closure'
+    __table_args__ = (
+        # Ancestors of a concept (breadcrumbs)
+        db.Index('ix_concept_closure_descendant', 'vocab_id', 'descendant', 'depth'),
+    )
+    
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id', ondelete='CASCADE'), primary_key=True)
+    ancestor = db.Column(db.String(100), primary_key=True)
+    depth = db.Column(db.Integer, primary_key=True)  # Shortest path length, 0 for the concept itself
+    descendant = db.Column(db.String(100), primary_key=True)
+
+
+class ConceptNode(db.Model):
+    """Precomputed hierarchy position and subtree size of a live concept."""
+    __tablename__ = 'concept_nodes'
+    
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id', ondelete='CASCADE'), primary_key=True)
+    concept_id = db.Column(db.String(100), primary_key=True)
+    level = db.Column(db.Integer, nullable=False)  # Longest broader chain above the concept
+    child_count = db.Column(db.Integer, nullable=False)
+    descendant_count = db.Column(db.Integer, nullable=False)
+    is_top_concept = db.Column(db.Boolean, nullable=False)  # No broader concept in the vocabulary
@@ -0,0 +1,61 @@
+"""ImportJob model."""
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+from app.extensions import db
+
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+    __table_args__ = (
+        # Recent imports of a user (import page)
+        db.Index('ix_import_jobs_user_created', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)  # Original upload name
+    path = db.Column(db.String(500))  # Spooled upload, removed when the job ends
+    format = db.Column(db.String(20), nullable=False)
+    action = db.Column(db.String(20), nullable=False)  # create, update
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id'), nullable=True)  # Target or result
+    add_new = db.Column(db.Boolean, default=True)
+    update_existing = db.Column(db.Boolean, default=True)
+    dry_run = db.Column(db.Boolean, default=False)  # Only report the diff, write nothing
+    
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    processed = db.Column(db.Integer, default=0)  # Concepts handled so far
+    added = db.Column(db.Integer, default=0)
+    updated = db.Column(db.Integer, default=0)
+    unchanged = db.Column(db.Integer, default=0)
+    skipped = db.Column(db.Integer, default=0)
+    report = db.Column(JSONB)  # bulk.DiffReport.to_dict() of the finished import
+    files = db.Column(JSONB)  # Per-member results of a zip import
+    error = db.Column(db.Text)
+    owner = db.Column(db.String(100))  # Process running the job (import_jobs.process_owner)
+    heartbeat_at = db.Column(db.DateTime)  # Refreshed by the owner while the job is queued or running
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Progress snapshot for the import page."""
+        end = self.finished_at or datetime.utcnow()
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'action': self.action,
+            'status': self.status,
+            'dry_run': bool(self.dry_run),
+            'vocab_id': self.vocab_id,
+            'processed': self.processed or 0,
+            'added': self.added or 0,
+            'updated': self.updated or 0,
+            'unchanged': self.unchanged or 0,
+            'skipped': self.skipped or 0,
+            'report': self.report,
+            'files': self.files,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'elapsed': round((end - self.started_at).total_seconds(), 1) if self.started_at else None,
+        }
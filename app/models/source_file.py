@@ -0,0 +1,14 @@
+"""SourceFile model."""
+from datetime import datetime
+from app.extensions import db
+
+
+class SourceFile(db.Model):
+    """Reference RDF file loaded by ``flask import-rdf``, with the hash of its last import."""
+    __tablename__ = 'source_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), unique=True, nullable=False)  # e.g., 'geografias.rdf'
+    sha256 = db.Column(db.String(64), nullable=False)
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id', ondelete='SET NULL'), nullable=True)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,21 @@
+"""TermRelation model."""
+from app.extensions import db
+
+
+class TermRelation(db.Model):
+    """
+    One broader/narrower/related statement of a term, as asserted in its JSONB columns.
+    
+    Kept in step with Term by app.services.relations; inverse relations are
+    derived when querying, so a statement only has to be asserted on one side.
+    """
+    __tablename__ = 'term_relations'
+    __table_args__ = (
+        # Inverse lookups ("who points at X")
+        db.Index('ix_term_relations_target', 'vocab_id', 'target', 'relation'),
+    )
+    
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id', ondelete='CASCADE'), primary_key=True)
+    source = db.Column(db.String(100), primary_key=True)  # concept_id of the asserting term
+    relation = db.Column(db.String(20), primary_key=True)  # broader, narrower, related
+    target = db.Column(db.String(500), primary_key=True)  # concept_id (or URI) it points at
@@ -0,0 +1,29 @@
+"""TermSearch model."""
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from app.extensions import db
+
+# Plain text where tsvector is not available (SQLite test databases)
+SearchDocument = TSVECTOR().with_variant(db.Text(), 'sqlite')
+
+
+class TermSearch(db.Model):
+    """
+    Search documents of a live term: one weighted tsvector per language and its labels.
+    
+    Maintained by app.services.search from the Term columns.
+    """
+    __tablename__ = 'term_search'
+    __table_args__ = (
+        # Full-text matches per language
+        db.Index('ix_term_search_es', 'document_es', postgresql_using='gin'),
+        db.Index('ix_term_search_en', 'document_en', postgresql_using='gin'),
+        # Typo-tolerant label matches (pg_trgm)
+        db.Index('ix_term_search_labels', 'labels', postgresql_using='gin',
+                 postgresql_ops={'labels': 'gin_trgm_ops'}),
+    )
+    
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id', ondelete='CASCADE'), primary_key=True)
+    concept_id = db.Column(db.String(100), primary_key=True)
+    document_es = db.Column(SearchDocument)  # Labels (A), alt labels (B), definition (C), Spanish config
+    document_en = db.Column(SearchDocument)  # Same, English config
+    labels = db.Column(db.Text)  # Preferred and alternative labels, accents folded
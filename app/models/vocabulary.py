@@ -1,8 +1,38 @@
 """Vocabulary and Term models."""
+import hashlib
+import json
 from datetime import datetime
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import JSONB
 from app.extensions import db
 
+# Term columns holding concept content (what an import writes)
+TERM_DATA_FIELDS = (
+    'pref_label_es', 'pref_label_en', 'definition_es', 'definition_en',
+    'alt_labels', 'broader', 'narrower', 'related',
+    'exact_match', 'close_match', 'source'
+)
+
+
+def _canonical(value):
+    if not value:
+        return None  # '', [] and None all mean "no value"
+    if isinstance(value, list):
+        # Lists come from RDF (unordered), so their order is not content
+        return sorted(json.dumps(item, sort_keys=True, ensure_ascii=False) for item in value)
+    return value
+
+
+def content_fingerprint(values):
+    """
+    Return the SHA-256 hex digest of a term's content.
+    
+    Args:
+        values: Mapping with the TERM_DATA_FIELDS keys (a term dict or row)
+    """
+    canonical = [_canonical(values.get(field)) for field in TERM_DATA_FIELDS]
+    return hashlib.sha256(json.dumps(canonical, ensure_ascii=False).encode('utf-8')).hexdigest()
+
 
 class Vocabulary(db.Model):
     __tablename__ = 'vocabularies'
@@ -18,6 +48,10 @@ class Vocabulary(db.Model):
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Bumped on every Term or Vocabulary write (see app.services.changes)
+    content_version = db.Column(db.Integer, nullable=False, default=0)
+    content_modified_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
     owner = db.relationship('User', backref='owned_vocabularies')
     
     terms = db.relationship('Term', backref='vocabulary', lazy=True)
@@ -25,6 +59,25 @@ class Vocabulary(db.Model):
 
 class Term(db.Model):
     __tablename__ = 'terms'
+    __table_args__ = (
+        # One row per concept; also the conflict target of bulk upserts (see app.services.bulk)
+        db.UniqueConstraint('vocab_id', 'concept_id', name='uq_terms_vocab_concept'),
+        # Containment lookups for hierarchy traversal (see app.services.hierarchy)
+        db.Index('ix_terms_broader', 'broader', postgresql_using='gin',
+                 postgresql_ops={'broader': 'jsonb_path_ops'}),
+        db.Index('ix_terms_narrower', 'narrower', postgresql_using='gin',
+                 postgresql_ops={'narrower': 'jsonb_path_ops'}),
+        db.Index('ix_terms_related', 'related', postgresql_using='gin',
+                 postgresql_ops={'related': 'jsonb_path_ops'}),
+        # Editor views list and count the live terms of a vocabulary (routes.vocab, routes.main)
+        db.Index('ix_terms_vocab_live', 'vocab_id', 'concept_id',
+                 postgresql_where=db.text('deleted_at IS NULL')),
+        # Exports, the SPARQL store and hierarchy lookups read approved terms only
+        db.Index('ix_terms_vocab_approved', 'vocab_id', 'concept_id',
+                 postgresql_where=db.text("status = 'approved'")),
+        # Last modification per vocabulary (vocabulary list)
+        db.Index('ix_terms_vocab_updated', 'vocab_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id'), nullable=False)
@@ -44,6 +97,7 @@ class Term(db.Model):
     
     # Metadata
     source = db.Column(db.String(500))  # dc:source from RDF
+    content_hash = db.Column(db.String(64))  # content_fingerprint() of the data fields
     
     # Status and soft delete
     status = db.Column(db.String(20), default='approved')  # approved, deprecated, deleted
@@ -53,3 +107,11 @@ class Term(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+
+@event.listens_for(Term, 'before_insert')
+@event.listens_for(Term, 'before_update')
+def _set_content_hash(mapper, connection, target):
+    """Keep content_hash in step with edits made through the ORM."""
+    target.content_hash = content_fingerprint(
+        {field: getattr(target, field) for field in TERM_DATA_FIELDS}
+    )
@@ -0,0 +1,17 @@
+"""VocabularyStats model."""
+from app.extensions import db
+
+
+class VocabularyStats(db.Model):
+    """
+    Term counts and last term modification of a vocabulary.
+    
+    Maintained by app.services.vocab_stats in the transaction that writes the
+    terms, so listing vocabularies never has to count them.
+    """
+    __tablename__ = 'vocabulary_stats'
+    
+    vocab_id = db.Column(db.Integer, db.ForeignKey('vocabularies.id', ondelete='CASCADE'), primary_key=True)
+    live_terms = db.Column(db.Integer, nullable=False, default=0)
+    deleted_terms = db.Column(db.Integer, nullable=False, default=0)  # Soft-deleted
+    last_modified_at = db.Column(db.DateTime)  # Latest Term.updated_at, None without terms
@@ -4,6 +4,7 @@ from app.routes.auth import auth_bp
 from app.routes.vocab import vocab_bp
 from app.routes.admin import admin_bp
 from app.routes.sparql import sparql_bp
+from app.routes.search import search_bp
 
 
 def register_blueprints(app):
@@ -13,3 +14,4 @@ def register_blueprints(app):
     app.register_blueprint(vocab_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(sparql_bp)
+    app.register_blueprint(search_bp)
@@ -11,12 +11,10 @@ def index():
         user = {'name': session.get('user_name'), 'role': session.get('user_role')}
     
     # Fetch statistics for home page
-    from app.models import Vocabulary, Term, User
-    stats = {
-        'vocabularies': Vocabulary.query.count(),
-        'concepts': Term.query.filter(Term.deleted_at.is_(None)).count(),
-        'users': User.query.count()
-    }
+    from app.models import User
+    from app.services.vocab_stats import catalogue_totals
+    stats = catalogue_totals()
+    stats['users'] = User.query.count()
     
     return render_template('index.html', user=user, stats=stats)
 
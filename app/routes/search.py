@@ -0,0 +1,49 @@
+"""Search routes - full-text and fuzzy term search, as a page and as JSON."""
+from flask import Blueprint, render_template, request, session, jsonify, url_for
+from app.services.search import search
+
+search_bp = Blueprint('search', __name__)
+
+
+def _search_args():
+    """(query, vocab_id, page, per_page) from the request arguments."""
+    return (
+        request.args.get('q', '').strip(),
+        request.args.get('vocab', type=int),
+        request.args.get('page', 1, type=int),
+        request.args.get('per_page', type=int),
+    )
+
+
+@search_bp.route('/search')
+def search_page():
+    """Search terms across one or all vocabularies."""
+    query, vocab_id, page, per_page = _search_args()
+    results = search(query, vocab_id, page, per_page)
+    user_role = session.get('user_role', 'viewer')
+    return render_template('search/results.html', results=results, vocab_id=vocab_id, user_role=user_role)
+
+
+@search_bp.route('/api/search')
+def search_api():
+    """
+    Search terms as JSON.
+    
+    Arguments: q (websearch syntax), vocab (vocabulary ID), page, per_page.
+    """
+    query, vocab_id, page, per_page = _search_args()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    results = search(query, vocab_id, page, per_page)
+    return jsonify({
+        'query': results.query,
+        'total': results.total,
+        'truncated': results.truncated,
+        'page': results.page,
+        'per_page': results.per_page,
+        'results': [
+            dict(result, url=url_for('vocab.term_detail_page', term_id=result['id'], _external=True))
+            for result in results.results
+        ],
+        'facets': results.facets,
+    })
@@ -1,63 +1,289 @@
 """SPARQL and export routes."""
-from flask import Blueprint, request, Response, abort
-from app.models import Vocabulary
-from app.services.export import generate_rdf_graph, export_to_csv
-import rdflib
+import hashlib
+from flask import (
+    Blueprint, request, Response, abort, send_file, stream_with_context, jsonify, url_for,
+    current_app, redirect
+)
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import secure_filename
+from app.models import db, Vocabulary, Term
+from app.services.export import stream_csv, stream_ntriples, TERM_RDF_COLUMNS
+from app.services.export_cache import (
+    cached_export_path, stream_through_cache, export_etag, export_last_modified
+)
+from app.services.skos_writer import stream_vocabulary, serialize_concept
+from app.services.hierarchy import subtree_concept_ids, concept_exists
+from app.services.concept_cache import cache as concept_cache
+from app.services.sparql_store import vocabulary_versions
+from app.services.dump import published_dump, dump_is_current, rebuilder, DUMP_FILENAME
+from app.services.sparql_cache import cache, analyze_query, byte_size
+from app.services.sparql_pool import (
+    pool, PoolBusyError, QueryTimeoutError, QueryError, DEFAULT_MAX_RESULTS
+)
 
 sparql_bp = Blueprint('sparql', __name__)
 
 
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'nt': 'application/n-triples',
+    'rdf': 'application/rdf+xml',
+    'ttl': 'text/turtle',
+    'jsonld': 'application/ld+json',
+}
+
+# Every format is streamed from a server-side cursor (and teed into the cache)
+EXPORT_STREAMS = {
+    'csv': lambda vocab, concept_ids=None: stream_csv(vocab.id, concept_ids=concept_ids),
+    'nt': lambda vocab, concept_ids=None: stream_ntriples(vocab, concept_ids=concept_ids),
+    'rdf': lambda vocab, concept_ids=None: stream_vocabulary(vocab, 'rdf', concept_ids=concept_ids),
+    'ttl': lambda vocab, concept_ids=None: stream_vocabulary(vocab, 'ttl', concept_ids=concept_ids),
+    'jsonld': lambda vocab, concept_ids=None: stream_vocabulary(vocab, 'jsonld', concept_ids=concept_ids),
+}
+
+
 @sparql_bp.route('/vocab/<int:vocab_id>/export/<format>')
 def export_vocab(vocab_id, format):
-    if format == 'csv':
-        csv_data = export_to_csv(vocab_id)
-        return Response(
-            csv_data,
-            mimetype="text/csv",
-            headers={"Content-disposition": f"attachment; filename=vocab_{vocab_id}.csv"}
-        )
+    if format not in EXPORT_MIMETYPES:
+        abort(400)
+    mimetype = EXPORT_MIMETYPES[format]
     
-    # RDF formats
-    g = generate_rdf_graph(vocab_id)
-    if not g:
+    vocab = Vocabulary.query.get(vocab_id)
+    if not vocab:
         abort(404)
-        
-    if format == 'rdf':  # XML
-        data = g.serialize(format='xml')
-        mimetype = "application/rdf+xml"
-    elif format == 'ttl':  # Turtle
-        data = g.serialize(format='turtle')
-        mimetype = "text/turtle"
-    elif format == 'jsonld':  # JSON-LD
-        data = g.serialize(format='json-ld')
-        mimetype = "application/ld+json"
-    else:
-        abort(400)
-        
-    return Response(
-        data,
+    
+    # Optional subtree: ?root=<concept_id>[&depth=<levels below the root>]
+    root = request.args.get('root')
+    depth = request.args.get('depth')
+    if depth is not None:
+        if not root or not depth.isdigit():
+            abort(400)
+        depth = int(depth)
+    
+    # Answer conditional requests before touching the terms
+    etag = export_etag(vocab, format)
+    last_modified = export_last_modified(vocab)
+    if root:
+        scope = hashlib.sha1(f"{root}\0{depth}".encode('utf-8')).hexdigest()[:12]
+        etag = f"{etag}-{scope}"
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+    
+    if root:
+        # Branch exports are cheap to build, so they are streamed without the disk cache
+        if not concept_exists(vocab.id, root):
+            abort(404)
+        chunks = EXPORT_STREAMS[format](vocab, subtree_concept_ids(vocab.id, root, depth))
+        download_name = secure_filename(f"vocab_{vocab_id}_{root}.{format}")
+        response = Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={"Content-disposition": f"attachment; filename={download_name}"}
+        )
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+    
+    download_name = f"vocab_{vocab_id}.{format}"
+    path = cached_export_path(vocab, format)
+    
+    if path is None:
+        chunks = EXPORT_STREAMS[format](vocab)
+        response = Response(
+            stream_with_context(stream_through_cache(vocab, format, chunks)),
+            mimetype=mimetype,
+            headers={"Content-disposition": f"attachment; filename={download_name}"}
+        )
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+    
+    return send_file(
+        path,
         mimetype=mimetype,
-        headers={"Content-disposition": f"attachment; filename=vocab_{vocab_id}.{format}"}
+        as_attachment=True,
+        download_name=download_name,
+        etag=etag,
+        last_modified=last_modified,
+        max_age=0
+    )
+
+
+# Negotiable RDF representations of a single concept
+CONCEPT_MIMETYPES = {
+    'text/turtle': 'ttl',
+    'application/rdf+xml': 'rdf',
+    'application/ld+json': 'jsonld',
+}
+
+
+@sparql_bp.route('/id/<vocab_code>/')
+def resolve_scheme(vocab_code):
+    """Dereference a ConceptScheme URI: the vocabulary page or its full export."""
+    vocab = Vocabulary.query.filter_by(code=vocab_code).first_or_404()
+    best = request.accept_mimetypes.best_match(['text/html', *CONCEPT_MIMETYPES])
+    format = CONCEPT_MIMETYPES.get(best)
+    if format is None:
+        return redirect(url_for('vocab.view_vocab', vocab_id=vocab.id), code=303)
+    return redirect(url_for('sparql.export_vocab', vocab_id=vocab.id, format=format), code=303)
+
+
+@sparql_bp.route('/id/<vocab_code>/<path:concept_id>')
+def resolve_concept(vocab_code, concept_id):
+    """
+    Dereference a concept URI.
+    
+    Browsers are redirected (303) to the term page; RDF clients get a small
+    Turtle, RDF/XML or JSON-LD document chosen from the Accept header (or
+    forced with ``?format=ttl|rdf|jsonld``).
+    """
+    vocab = Vocabulary.query.filter_by(code=vocab_code).first_or_404()
+    row = db.session.query(Term.id, Term.status, Term.updated_at, *TERM_RDF_COLUMNS).filter(
+        Term.vocab_id == vocab.id, Term.concept_id == concept_id
+    ).first()
+    if row is None:
+        abort(404)
+    
+    format = request.args.get('format')
+    if format not in CONCEPT_MIMETYPES.values():
+        best = request.accept_mimetypes.best_match(['text/html', *CONCEPT_MIMETYPES])
+        format = CONCEPT_MIMETYPES.get(best)
+    if format is None:
+        return redirect(url_for('vocab.term_detail_page', term_id=row.id), code=303)
+    
+    if row.status == 'deleted':
+        abort(410)
+    if row.status != 'approved':
+        abort(404)
+    
+    stamp = (row.updated_at, vocab.code, vocab.base_uri)
+    key = (vocab.id, concept_id, format)
+    document = concept_cache.get(key, stamp)
+    if document is None:
+        document = serialize_concept(vocab, row, format)
+        concept_cache.put(key, stamp, document)
+    
+    mimetype = next(m for m, f in CONCEPT_MIMETYPES.items() if f == format)
+    response = Response(document, mimetype=mimetype)
+    response.set_etag(hashlib.sha1(repr(stamp + (format,)).encode('utf-8')).hexdigest())
+    response.headers['Vary'] = 'Accept'
+    return response.make_conditional(request)
+
+
+def _published_dump():
+    """
+    (archive path, manifest, stale) of the last published dump, starting a
+    background rebuild when it is missing or behind the database.
+    """
+    path, manifest = published_dump()
+    stale = not dump_is_current(manifest)
+    if stale:
+        rebuilder.request(current_app._get_current_object())
+    return path, manifest, stale
+
+
+def _dump_not_ready():
+    response = Response("The catalogue dump is being built, try again later", status=503)
+    response.headers['Retry-After'] = '60'
+    return response
+
+
+@sparql_bp.route('/export/all.nq.gz')
+def export_all():
+    """
+    Whole catalogue as gzip-compressed N-Quads, one named graph per vocabulary.
+    
+    Serves the last published dump; X-Dump-Stale tells whether vocabularies
+    changed since (a rebuild is then under way, see dump.DumpRebuilder).
+    """
+    path, manifest, stale = _published_dump()
+    if manifest is None:
+        return _dump_not_ready()
+    response = send_file(
+        path,
+        mimetype='application/gzip',
+        as_attachment=True,
+        download_name=DUMP_FILENAME,
+        etag=manifest['sha256'],
+        max_age=0
     )
+    response.headers['X-Dump-Stale'] = 'true' if stale else 'false'
+    return response
+
+
+@sparql_bp.route('/export/all/manifest.json')
+def export_all_manifest():
+    """Per-vocabulary checksums and versions of the published dump, with a 'stale' flag."""
+    _, manifest, stale = _published_dump()
+    if manifest is None:
+        return _dump_not_ready()
+    response = jsonify(dict(manifest, stale=stale))
+    response.headers['X-Dump-Stale'] = 'true' if stale else 'false'
+    return response
 
 
 @sparql_bp.route('/sparql', methods=['GET', 'POST'])
 def sparql_endpoint():
-    """Simplified SPARQL endpoint that queries ALL vocabularies."""
+    """
+    SPARQL endpoint over ALL vocabularies (one named graph per vocabulary).
+    
+    SELECT results are paged with ``offset``/``limit`` (capped at
+    SPARQL_MAX_RESULTS); the total is reported in X-Total-Results.
+    """
     query = request.args.get('query') or request.form.get('query')
     if not query:
         return "No query provided", 400
+    
+    max_results = current_app.config.get('SPARQL_MAX_RESULTS', DEFAULT_MAX_RESULTS)
+    try:
+        offset = max(int(request.values.get('offset', 0)), 0)
+        limit = min(max(int(request.values.get('limit', max_results)), 0), max_results)
+    except ValueError:
+        return "offset and limit must be integers", 400
         
-    # Aggregate all vocabs into one graph
-    full_graph = rdflib.Graph()
-    vocabularies = Vocabulary.query.all()
-    for vocab in vocabularies:
-        g = generate_rdf_graph(vocab.id)
-        if g:
-            full_graph += g
-            
     try:
-        results = full_graph.query(query)
-        return Response(results.serialize(format='json'), mimetype='application/sparql-results+json')
+        query_key, graph_iris = analyze_query(query)
     except Exception as e:
         return str(e), 400
+    
+    # Key on the versions of every vocabulary the query can read
+    versions = vocabulary_versions()
+    if graph_iris is None:
+        dependencies = None
+    else:
+        dependencies = {vocab_id for vocab_id, (_, iri) in versions.items() if iri in graph_iris}
+    dependency_versions = sorted(
+        (vocab_id, version) for vocab_id, (version, _) in versions.items()
+        if dependencies is None or vocab_id in dependencies
+    )
+    cache_key = (query_key, offset, limit, tuple(dependency_versions))
+    
+    cached = cache.get(cache_key)
+    if cached is None:
+        try:
+            cached = pool.run(query, offset, limit)
+        except QueryError as e:
+            return str(e), 400
+        except QueryTimeoutError as e:
+            return str(e), 504
+        except PoolBusyError as e:
+            return str(e), 503
+        cache.put(cache_key, cached, dependencies, size=byte_size(cached[0]))
+    payload, total = cached
+    
+    response = Response(payload, mimetype='application/sparql-results+json')
+    if total is not None:
+        response.headers['X-Total-Results'] = str(total)
+        if offset + limit < total:
+            next_url = url_for('sparql.sparql_endpoint', query=query, offset=offset + limit, limit=limit)
+            response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+
+@sparql_bp.route('/sparql/cache')
+def sparql_cache_stats():
+    """Hit/miss counters and size of the SPARQL result cache."""
+    return jsonify(cache.stats())
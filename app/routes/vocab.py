@@ -1,9 +1,12 @@
 """Vocabulary routes - viewing and editing terms."""
+import os
+import tempfile
 from datetime import datetime
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash
+from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify, abort
 from flask_babel import gettext as _
-from app.models import db, Vocabulary, Term, ChangeRequest, User
+from app.models import db, Vocabulary, Term, ChangeRequest, User, ImportJob
 from app.routes.auth import login_required
+from app.services import relations, closure, vocab_stats
 
 vocab_bp = Blueprint('vocab', __name__)
 
@@ -15,21 +18,19 @@ vocab_bp = Blueprint('vocab', __name__)
 @vocab_bp.route('/vocabs')
 def vocab_list():
     """List all vocabularies."""
-    from sqlalchemy import func
-    
     vocabularies = Vocabulary.query.order_by(Vocabulary.name).all()
     
-    # Get term counts and last modified for each vocabulary
-    vocab_stats = {}
-    vocab_last_modified = {}
-    for vocab in vocabularies:
-        vocab_stats[vocab.id] = Term.query.filter_by(vocab_id=vocab.id).filter(Term.deleted_at.is_(None)).count()
-        # Get the most recent updated_at from terms
-        last_term = Term.query.filter_by(vocab_id=vocab.id).order_by(Term.updated_at.desc()).first()
-        vocab_last_modified[vocab.id] = last_term.updated_at if last_term else vocab.created_at
+    # Term counts and last modified from the maintained statistics
+    stats = vocab_stats.vocabulary_stats(vocabularies)
+    vocab_counts = {vocab.id: stats[vocab.id].live_terms for vocab in vocabularies}
+    vocab_last_modified = {
+        vocab.id: stats[vocab.id].last_modified_at or vocab.created_at for vocab in vocabularies
+    }
+    pending_counts = vocab_stats.pending_requests()
     
     user_role = session.get('user_role', 'viewer')
-    return render_template('vocab/list.html', vocabularies=vocabularies, vocab_stats=vocab_stats, vocab_last_modified=vocab_last_modified, user_role=user_role)
+    return render_template('vocab/list.html', vocabularies=vocabularies, vocab_stats=vocab_counts,
+                           vocab_last_modified=vocab_last_modified, pending_counts=pending_counts, user_role=user_role)
 
 
 @vocab_bp.route('/vocab/new', methods=['GET'])
@@ -148,7 +149,11 @@ def vocab_import_form():
     
     # Get existing vocabularies for update option
     vocabularies = Vocabulary.query.order_by(Vocabulary.name).all()
-    return render_template('vocab/import.html', vocabularies=vocabularies, user_role=user_role)
+    
+    # Recent imports of this user, polled by the page while they run
+    jobs = (ImportJob.query.filter_by(user_id=session.get('user_id'))
+            .order_by(ImportJob.created_at.desc()).limit(10).all())
+    return render_template('vocab/import.html', vocabularies=vocabularies, user_role=user_role, jobs=jobs)
 
 
 @vocab_bp.route('/vocab/import', methods=['POST'])
@@ -160,10 +165,8 @@ def vocab_import():
         flash(_('No tienes permisos para importar vocabularios.'), 'error')
         return redirect(url_for('vocab.vocab_list'))
     
-    from app.services.import_service import (
-        parse_rdf_file, detect_format, 
-        create_vocabulary_from_graph, update_vocabulary_from_graph
-    )
+    from app.services.import_service import detect_format
+    from app.services.import_jobs import upload_dir, runner
     
     # Get file
     file = request.files.get('file')
@@ -171,55 +174,54 @@ def vocab_import():
         flash(_('Por favor selecciona un archivo.'), 'error')
         return redirect(url_for('vocab.vocab_import_form'))
     
-    # Detect format and parse
-    format = detect_format(file.filename)
-    content = file.read()
-    
-    try:
-        # Try to decode if bytes
-        if isinstance(content, bytes):
-            content = content.decode('utf-8')
-    except UnicodeDecodeError:
-        pass  # Keep as bytes for some formats
-    
-    graph = parse_rdf_file(content, format)
-    if not graph:
-        flash(_('Error al parsear el archivo. Verifica que sea un archivo RDF válido.'), 'error')
-        return redirect(url_for('vocab.vocab_import_form'))
-    
     action = request.form.get('action', 'create')
-    
+    vocab_id = None
     if action == 'update':
         vocab_id = request.form.get('vocab_id')
         if not vocab_id:
             flash(_('Por favor selecciona un vocabulario para actualizar.'), 'error')
             return redirect(url_for('vocab.vocab_import_form'))
-        
-        add_new = 'add_new' in request.form
-        update_existing = 'update_existing' in request.form
-        
-        stats = update_vocabulary_from_graph(
-            int(vocab_id), graph, 
-            add_new=add_new, 
-            update_existing=update_existing
-        )
-        
-        if stats:
-            flash(_('Vocabulario actualizado: %(added)d agregados, %(updated)d actualizados, %(skipped)d omitidos.', 
-                   added=stats['added'], updated=stats['updated'], skipped=stats['skipped']), 'success')
-            return redirect(url_for('vocab.view_vocab', vocab_id=vocab_id))
-        else:
-            flash(_('Error al actualizar el vocabulario.'), 'error')
-            return redirect(url_for('vocab.vocab_import_form'))
+        vocab_id = int(vocab_id)
+    
+    # Spool the upload to disk and hand it to the background import runner
+    fd, path = tempfile.mkstemp(dir=upload_dir(), suffix=os.path.splitext(file.filename)[1])
+    os.close(fd)
+    file.save(path)
+    
+    job = ImportJob(
+        user_id=session.get('user_id'),
+        filename=file.filename,
+        path=path,
+        format=detect_format(file.filename),
+        action=action,
+        vocab_id=vocab_id,
+        add_new='add_new' in request.form,
+        update_existing='update_existing' in request.form,
+        dry_run=action == 'update' and 'dry_run' in request.form
+    )
+    db.session.add(job)
+    db.session.commit()
+    runner.submit(job.id)
+    
+    if job.dry_run:
+        flash(_('Simulación iniciada. El informe de cambios aparecerá en esta página.'), 'success')
     else:
-        # Create new vocabulary
-        vocab = create_vocabulary_from_graph(graph)
-        if vocab:
-            flash(_('Vocabulario importado exitosamente.'), 'success')
-            return redirect(url_for('vocab.view_vocab', vocab_id=vocab.id))
-        else:
-            flash(_('Error al crear el vocabulario desde el archivo.'), 'error')
-            return redirect(url_for('vocab.vocab_import_form'))
+        flash(_('Importación iniciada. Puedes seguir su progreso en esta página.'), 'success')
+    return redirect(url_for('vocab.vocab_import_form', job=job.id))
+
+
+@vocab_bp.route('/vocab/import/jobs/<int:job_id>')
+@login_required
+def vocab_import_job(job_id):
+    """Progress of a background import job (polled by the import page)."""
+    job = ImportJob.query.get_or_404(job_id)
+    # Only the user who started the job (or an admin) may follow it
+    if job.user_id != session.get('user_id') and session.get('user_role') != 'admin':
+        abort(404)
+    data = job.to_dict()
+    if job.status == 'done' and job.vocab_id:
+        data['vocab_url'] = url_for('vocab.view_vocab', vocab_id=job.vocab_id)
+    return jsonify(data)
 
 
 # ========================================
@@ -258,9 +260,12 @@ def view_vocab(vocab_id):
     for parent_id in children_map:
         children_map[parent_id].sort(key=lambda x: x.concept_id)
     
+    # Subtree sizes for the tree, precomputed by the closure index
+    nodes = closure.node_stats(vocab_id)
+    
     user_role = session.get('user_role', 'viewer')
     
-    return render_template('vocab/editor.html', vocab=vocab, terms=terms, roots=roots, children_map=children_map, user_role=user_role, show_deleted=show_deleted)
+    return render_template('vocab/editor.html', vocab=vocab, terms=terms, roots=roots, children_map=children_map, nodes=nodes, user_role=user_role, show_deleted=show_deleted)
 
 
 @vocab_bp.route('/vocab/<int:vocab_id>/term/new')
@@ -324,10 +329,19 @@ def term_detail_page(term_id):
     user_role = session.get('user_role', 'viewer')
     show_delete = request.args.get('action') == 'delete'
     
-    # Get all terms for this vocabulary to resolve broader/narrower references
-    all_terms = {t.concept_id: t for t in Term.query.filter_by(vocab_id=term.vocab_id).all()}
-    
-    return render_template('terms/detail.html', term=term, vocab=vocab, user_role=user_role, all_terms=all_terms, show_delete=show_delete)
+    # Direct relations, including those only asserted by the other term
+    term_relations = relations.neighbours(term.vocab_id, term.concept_id)
+    breadcrumbs = [concept_id for concept_id, _depth in closure.ancestors(term.vocab_id, term.concept_id)]
+    linked_ids = {concept_id for targets in term_relations.values() for concept_id in targets}
+    linked_ids.update(breadcrumbs)
+    linked_terms = {
+        t.concept_id: t for t in
+        Term.query.filter(Term.vocab_id == term.vocab_id, Term.concept_id.in_(linked_ids)).all()
+    } if linked_ids else {}
+    
+    return render_template('terms/detail.html', term=term, vocab=vocab, user_role=user_role,
+                           term_relations=term_relations, linked_terms=linked_terms, breadcrumbs=breadcrumbs,
+                           show_delete=show_delete)
 
 
 @vocab_bp.route('/term/<int:term_id>/edit', methods=['GET'])
@@ -0,0 +1,89 @@
+"""Compressed and archived vocabulary uploads.
+
+``.gz`` and ``.bz2`` uploads are decompressed on the fly while the importer
+reads them, so the spooled upload stays compressed on disk and nothing is
+inflated in memory. A ``.zip`` upload may hold several vocabulary files;
+each member is streamed out of the archive and imported on its own (see
+import_service.import_archive).
+"""
+import bz2
+import gzip
+import os
+import zipfile
+
+ARCHIVE_FORMAT = 'zip'
+
+COMPRESSED_OPENERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+}
+
+
+def strip_compression(filename):
+    """
+    Split a compression suffix off a file name.
+
+    Returns:
+        (file name without .gz/.bz2, opener for the compression or None)
+    """
+    root, ext = os.path.splitext(filename)
+    opener = COMPRESSED_OPENERS.get(ext.lower())
+    return (root, opener) if opener else (filename, None)
+
+
+def open_source(path, filename=None):
+    """
+    Open an upload for reading as a binary stream, decompressing .gz/.bz2 as it is read.
+
+    Args:
+        path: Path of the spooled upload
+        filename: Original file name (its suffix decides the compression); defaults to path
+    """
+    _, opener = strip_compression(filename or path)
+    return opener(path, 'rb') if opener else open(path, 'rb')
+
+
+def archive_members(archive, formats):
+    """
+    List the importable members of a zip archive.
+
+    Directories, hidden files, macOS metadata, nested archives and files
+    with an unknown extension are left out.
+
+    Args:
+        archive: zipfile.ZipFile
+        formats: {extension: format} (see import_service.FILE_FORMATS)
+
+    Returns:
+        list of (ZipInfo, format)
+    """
+    members = []
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        format = formats.get(os.path.splitext(strip_compression(name)[0])[1].lower())
+        if format is None or format == ARCHIVE_FORMAT:
+            continue
+        members.append((info, format))
+    return members
+
+
+def open_member(archive, info):
+    """Open a zip member as a binary stream, decompressing a .gz/.bz2 member on the fly."""
+    _, opener = strip_compression(info.filename)
+    fileobj = archive.open(info)
+    return opener(fileobj, 'rb') if opener else fileobj
+
+
+def open_archive(path):
+    """
+    Open a zip upload.
+
+    Raises:
+        ValueError: if the file is not a zip archive
+    """
+    try:
+        return zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(str(e)) from e
@@ -0,0 +1,263 @@
+"""COPY-based bootstrap of an empty database from the reference RDF files.
+
+``flask import-rdf`` goes through the bulk upsert path, which compares every
+concept with what is stored and keeps the unique constraint and GIN index
+up to date row by row. A fresh replica has nothing to compare with, so
+``flask bootstrap-rdf`` takes a faster route:
+
+1. The files are parsed in a process pool (rdf_loader.iter_parsed_sources).
+2. The secondary indexes on ``terms``, ``term_relations`` and
+   ``term_search`` are dropped (DEFERRED_INDEXES, SEARCH_INDEXES).
+3. Each parsed file is turned into CSV streams and loaded with ``COPY``
+   into ``vocabularies``, ``terms`` and ``term_relations``; rows are
+   produced lazily, so a file is never held as CSV text in memory.
+4. The indexes are rebuilt in one pass, the hierarchy closure is built
+   (closure.rebuild_closure) with the vocabulary statistics
+   (vocab_stats.refresh_stats) and the search documents (search.sync_search,
+   whose indexes are built last), the tables are analyzed and the SourceFile
+   hashes are recorded, so later ``import-rdf`` runs skip the unchanged
+   files.
+
+Everything up to the commit runs in one transaction: a failed load leaves
+the database empty. Requires PostgreSQL (psycopg2).
+"""
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint, CreateIndex, DropConstraint, DropIndex
+from app.models import db, Vocabulary, Term, SourceFile, TermRelation, TermSearch
+from app.models.vocabulary import TERM_DATA_FIELDS, content_fingerprint
+from app.services.rdf_loader import rdf_paths, iter_parsed_sources, file_sha256
+from app.services.relations import term_statements
+from app.services.closure import rebuild_closure
+from app.services.vocab_stats import refresh_stats
+from app.services.search import sync_search
+
+# Built after the load instead of being maintained row by row
+DEFERRED_INDEXES = list(Term.__table__.indexes) + list(TermRelation.__table__.indexes)
+# Built once the search documents are written, after the indexes above
+SEARCH_INDEXES = list(TermSearch.__table__.indexes)
+DEFERRED_CONSTRAINTS = [
+    constraint for constraint in Term.__table__.constraints
+    if constraint.name == 'uq_terms_vocab_concept'
+]
+
+VOCABULARY_COPY_COLUMNS = (
+    'id', 'code', 'name', 'name_en', 'description', 'description_en', 'base_uri',
+    'created_at', 'content_version', 'content_modified_at'
+)
+TERM_COPY_COLUMNS = ('vocab_id', 'concept_id') + TERM_DATA_FIELDS + (
+    'content_hash', 'status', 'created_at', 'updated_at'
+)
+RELATION_COPY_COLUMNS = ('vocab_id', 'source', 'relation', 'target')
+
+JSON_FIELDS = {'alt_labels', 'broader', 'narrower', 'related', 'exact_match', 'close_match'}
+
+# Rows per chunk handed to COPY
+COPY_CHUNK_ROWS = 5000
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of str chunks (what copy_expert reads from)."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _csv_chunks(rows):
+    """Serialize rows to COPY CSV text, COPY_CHUNK_ROWS at a time; None becomes NULL."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % COPY_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    Stream rows into a table with COPY ... FROM STDIN.
+
+    Args:
+        cursor: psycopg2 cursor
+        table: Table name
+        columns: Column names, in row order
+        rows: Iterable of tuples; None values are loaded as NULL
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor.copy_expert(sql, _ChunkReader(_csv_chunks(rows)))
+
+
+def _unique_records(records):
+    """{concept_id: record}, keeping the last record of a repeated concept_id."""
+    unique = {}
+    for record in records:
+        unique[record['concept_id']] = record
+    return unique
+
+
+def _term_rows(vocab_id, records, now):
+    """Yield TERM_COPY_COLUMNS tuples for {concept_id: record}."""
+    for concept_id, record in records.items():
+        values = {field: record.get(field) or None for field in TERM_DATA_FIELDS}
+        yield (vocab_id, concept_id) + tuple(
+            json.dumps(values[field], ensure_ascii=False)
+            if field in JSON_FIELDS and values[field] is not None else values[field]
+            for field in TERM_DATA_FIELDS
+        ) + (content_fingerprint(values), 'approved', now, now)
+
+
+def _relation_rows(vocab_id, records):
+    """Yield RELATION_COPY_COLUMNS tuples for {concept_id: record} (see relations.sync_relations)."""
+    for concept_id, record in records.items():
+        for relation, target in term_statements(concept_id, record):
+            yield vocab_id, concept_id, relation, target
+
+
+def _vocabulary_row(vocab_id, parsed, now):
+    scheme = parsed['scheme']
+    code = parsed['code']
+    return (
+        vocab_id, code, scheme['name'] or code, scheme['name_en'],
+        scheme['description'] or '', scheme['description_en'], scheme['uri'],
+        now, 1, now
+    )
+
+
+def _ddl(connection, elements):
+    for element in elements:
+        connection.execute(element)
+
+
+def database_is_empty():
+    """Whether the database holds no vocabularies (terms cannot exist without one)."""
+    return Vocabulary.query.first() is None
+
+
+def bootstrap_rdf(directory, workers=None):
+    """
+    Load every RDF file of a directory into an empty database with COPY.
+
+    Args:
+        directory: Directory with .rdf files
+        workers: Parser processes (default: CPU count; 1 parses in-process)
+
+    Returns:
+        dict with 'files' (per-file dicts with file, status (loaded or
+        skipped), concepts, parse_seconds, copy_seconds and error),
+        'concepts', 'index_seconds' and 'total_seconds'
+
+    Raises:
+        RuntimeError: if the database is not PostgreSQL, is not empty, or a file fails to parse
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError('bootstrap-rdf requires PostgreSQL (COPY)')
+    if not database_is_empty():
+        raise RuntimeError('The database already holds vocabularies; use import-rdf instead')
+
+    start = time.perf_counter()
+    paths = rdf_paths(directory)
+    connection = db.session.connection()
+    cursor = connection.connection.dbapi_connection.cursor()
+    maintenance_work_mem = current_app.config.get('BOOTSTRAP_MAINTENANCE_WORK_MEM')
+    if maintenance_work_mem:
+        connection.execute(text("SELECT set_config('maintenance_work_mem', :value, true)"),
+                           {'value': maintenance_work_mem})
+
+    results = {}
+    loaded = {}
+    try:
+        _ddl(connection, [DropIndex(index, if_exists=True) for index in DEFERRED_INDEXES + SEARCH_INDEXES])
+        _ddl(connection, [DropConstraint(constraint, if_exists=True) for constraint in DEFERRED_CONSTRAINTS])
+
+        for file_path, parsed, error in iter_parsed_sources(paths, workers):
+            name = os.path.basename(file_path)
+            if error is not None:
+                raise RuntimeError(f"Failed to parse {name}: {error}") from error
+            if not parsed['scheme']:
+                results[file_path] = {'file': name, 'status': 'skipped', 'error': 'No ConceptScheme found'}
+                continue
+
+            copy_start = time.perf_counter()
+            now = datetime.utcnow()
+            vocab_id = connection.execute(
+                text("SELECT nextval(pg_get_serial_sequence('vocabularies', 'id'))")
+            ).scalar()
+            copy_rows(cursor, 'vocabularies', VOCABULARY_COPY_COLUMNS, [_vocabulary_row(vocab_id, parsed, now)])
+            records = _unique_records(parsed['records'])
+            copy_rows(cursor, 'terms', TERM_COPY_COLUMNS, _term_rows(vocab_id, records, now))
+            copy_rows(cursor, 'term_relations', RELATION_COPY_COLUMNS, _relation_rows(vocab_id, records))
+            loaded[file_path] = vocab_id
+            results[file_path] = {
+                'file': name,
+                'status': 'loaded',
+                'concepts': len(parsed['records']),
+                'parse_seconds': parsed['parse_seconds'],
+                'copy_seconds': time.perf_counter() - copy_start,
+            }
+            print(f"Loaded {name}: {len(parsed['records'])} concepts")
+
+        index_start = time.perf_counter()
+        _ddl(connection, [AddConstraint(constraint) for constraint in DEFERRED_CONSTRAINTS])
+        _ddl(connection, [CreateIndex(index) for index in DEFERRED_INDEXES])
+        for vocab_id in loaded.values():
+            rebuild_closure(connection, vocab_id)
+            refresh_stats(connection, vocab_id)
+            sync_search(connection, vocab_id)
+        _ddl(connection, [CreateIndex(index) for index in SEARCH_INDEXES])
+        index_seconds = time.perf_counter() - index_start
+
+        imported_at = datetime.utcnow()
+        for file_path, vocab_id in loaded.items():
+            db.session.add(SourceFile(
+                filename=os.path.basename(file_path), sha256=file_sha256(file_path),
+                vocab_id=vocab_id, imported_at=imported_at
+            ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    # Planner statistics for the freshly loaded tables
+    with db.engine.connect() as analyze_connection:
+        analyze_connection.execute(text('ANALYZE vocabularies'))
+        analyze_connection.execute(text('ANALYZE terms'))
+        analyze_connection.execute(text('ANALYZE term_relations'))
+        analyze_connection.execute(text('ANALYZE concept_closure'))
+        analyze_connection.execute(text('ANALYZE concept_nodes'))
+        analyze_connection.execute(text('ANALYZE vocabulary_stats'))
+        analyze_connection.execute(text('ANALYZE term_search'))
+        analyze_connection.commit()
+
+    return {
+        'files': [results[file_path] for file_path in paths if file_path in results],
+        'concepts': sum(result.get('concepts', 0) for result in results.values()),
+        'index_seconds': index_seconds,
+        'total_seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,183 @@
+"""Set-based persistence of imported terms.
+
+Importers hand over plain term dicts (see import_service.extract_terms) and
+this module writes them in batches of ``INSERT ... ON CONFLICT DO UPDATE`` on
+(vocab_id, concept_id), instead of one SELECT plus one INSERT/UPDATE per
+concept. Changes are reported to app.services.changes with mark_changed,
+since the ORM unit of work never sees these rows.
+
+Before writing, every batch is diffed against the stored rows by content
+fingerprint (Term.content_hash): concepts are classified as new, changed or
+unchanged and only new and changed rows are written. A DiffReport collects
+the classification, plus the stored concepts missing from the source, and a
+dry run produces the report without writing anything.
+"""
+from datetime import datetime
+from sqlalchemy import null, select
+from sqlalchemy.dialects.postgresql import insert
+from app.models import db, Term
+from app.models.vocabulary import TERM_DATA_FIELDS, content_fingerprint
+from app.services.changes import mark_changed
+from app.services.vocab_stats import record_write
+
+BULK_BATCH_SIZE = 1000
+
+# Beyond this many concepts a write is reported as a whole-vocabulary change
+MAX_TRACKED_CONCEPTS = 10000
+
+JSON_FIELDS = {'alt_labels', 'broader', 'narrower', 'related', 'exact_match', 'close_match'}
+
+# MERGE keeps the stored value of every field the import leaves empty
+# (import_service); OVERWRITE replaces every data column (rdf_loader).
+MERGE = 'merge'
+OVERWRITE = 'overwrite'
+
+
+class DiffReport:
+    """Classification of the concepts of an import against the stored vocabulary."""
+
+    KINDS = ('new', 'changed', 'unchanged', 'missing', 'skipped')
+    SAMPLE_SIZE = 20  # concept_ids kept per kind for display
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far (the import is being redone)."""
+        self.counts = dict.fromkeys(self.KINDS, 0)
+        self.samples = {kind: [] for kind in self.KINDS}
+        self._seen = set()
+
+    def add(self, kind, concept_id):
+        self.counts[kind] += 1
+        if len(self.samples[kind]) < self.SAMPLE_SIZE:
+            self.samples[kind].append(concept_id)
+
+    def see(self, concept_id):
+        self._seen.add(concept_id)
+
+    def finish(self, vocab_id):
+        """Count the stored (non-deleted) concepts the source did not mention."""
+        rows = db.session.execute(
+            select(Term.concept_id).where(Term.vocab_id == vocab_id, Term.status != 'deleted')
+        )
+        for (concept_id,) in rows:
+            if concept_id not in self._seen:
+                self.add('missing', concept_id)
+
+    def to_dict(self):
+        return {'counts': dict(self.counts), 'samples': {kind: list(ids) for kind, ids in self.samples.items()}}
+
+
+def _row(vocab_id, data, now):
+    row = {
+        'vocab_id': vocab_id,
+        'concept_id': data['concept_id'],
+        'status': 'approved',
+        'content_hash': data['content_hash'],
+        'created_at': now,
+        'updated_at': now,
+    }
+    for field in TERM_DATA_FIELDS:
+        value = data.get(field)
+        # A Python None would be stored as JSON 'null' instead of SQL NULL
+        row[field] = null() if value is None and field in JSON_FIELDS else value
+    return row
+
+
+def _batches(records, batch_size):
+    """Deduplicate records by concept_id (last one wins) and split them into batches."""
+    unique = {}
+    for data in records:
+        unique[data['concept_id']] = data
+    records = list(unique.values())
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
+
+def _stored_rows(vocab_id, concept_ids, with_content):
+    """Stored rows of a batch by concept_id; data columns only when MERGE needs them."""
+    columns = [Term.concept_id, Term.content_hash]
+    if with_content:
+        columns += [getattr(Term, field) for field in TERM_DATA_FIELDS]
+    rows = db.session.execute(
+        select(*columns).where(Term.vocab_id == vocab_id, Term.concept_id.in_(concept_ids))
+    )
+    return {row.concept_id: row._mapping for row in rows}
+
+
+def _content(data, stored, mode):
+    """The data fields a write would leave in the row."""
+    if mode == MERGE and stored is not None:
+        return {field: data.get(field) or stored[field] for field in TERM_DATA_FIELDS}
+    return {field: data.get(field) or None for field in TERM_DATA_FIELDS}
+
+
+def upsert_terms(vocab_id, records, add_new=True, update_existing=True,
+                 mode=MERGE, batch_size=BULK_BATCH_SIZE, dry_run=False, report=None):
+    """
+    Insert or update terms of a vocabulary in batches, writing only what changed.
+
+    Does not commit; the caller owns the transaction.
+
+    Args:
+        vocab_id: ID of the vocabulary the terms belong to
+        records: Iterable of term dicts with 'concept_id' and TERM_DATA_FIELDS keys
+        add_new: Whether to insert concepts not yet in the vocabulary
+        update_existing: Whether to update concepts already in the vocabulary
+        mode: MERGE or OVERWRITE (see above)
+        batch_size: Rows per statement
+        dry_run: Classify the records without writing
+        report: Optional DiffReport to record the classification in
+
+    Returns:
+        dict with stats: {'added': int, 'updated': int, 'unchanged': int, 'skipped': int}
+    """
+    stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    table = Term.__table__
+    touched = set()
+    added = 0
+    now = datetime.utcnow()
+
+    for batch in _batches(records, batch_size):
+        stored_rows = _stored_rows(vocab_id, [data['concept_id'] for data in batch], mode == MERGE)
+        rows = []
+        for data in batch:
+            concept_id = data['concept_id']
+            stored = stored_rows.get(concept_id)
+            if report is not None:
+                report.see(concept_id)
+            if not (add_new if stored is None else update_existing):
+                kind = 'skipped'
+            else:
+                content = _content(data, stored, mode)
+                content_hash = content_fingerprint(content)
+                if stored is None:
+                    kind = 'new'
+                elif stored['content_hash'] == content_hash:
+                    kind = 'unchanged'
+                else:
+                    kind = 'changed'
+                if kind != 'unchanged':
+                    content.update(concept_id=concept_id, content_hash=content_hash)
+                    rows.append(_row(vocab_id, content, now))
+            stats[{'new': 'added', 'changed': 'updated'}.get(kind, kind)] += 1
+            if report is not None:
+                report.add(kind, concept_id)
+
+        if not rows or dry_run:
+            continue
+        # Rows already hold their final content (MERGE is resolved above), so
+        # a conflict (a concept added concurrently) simply takes the new values
+        stmt = insert(table).values(rows)
+        values = {field: stmt.excluded[field] for field in TERM_DATA_FIELDS}
+        values['content_hash'] = stmt.excluded.content_hash
+        values['updated_at'] = stmt.excluded.updated_at
+        db.session.execute(stmt.on_conflict_do_update(constraint='uq_terms_vocab_concept', set_=values))
+        touched.update(row['concept_id'] for row in rows)
+        added += sum(1 for row in rows if row['concept_id'] not in stored_rows)
+
+    if touched:
+        record_write(vocab_id, added, now)
+        mark_changed(vocab_id, touched if len(touched) <= MAX_TRACKED_CONCEPTS else None)
+    return stats
@@ -0,0 +1,200 @@
+"""Change tracking for vocabulary content.
+
+Terms and vocabularies are written through the ORM by the editor routes and
+through bulk statements by the importers. Both paths end up recorded here,
+per session, and are handed to subscribers once the transaction commits so
+derived data (the SPARQL store, caches) can patch itself instead of being
+rebuilt from scratch.
+
+Every recorded change also bumps ``Vocabulary.content_version`` inside the
+same transaction, which gives other processes (and HTTP clients, via ETags)
+a cheap way to tell whether anything derived from a vocabulary is stale.
+"""
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Vocabulary, Term
+
+PENDING_KEY = 'vocab_changes'
+DEFERRED_KEY = 'vocab_deferred_writes'
+
+# Concepts remembered per vocabulary for deferred callbacks; past this many
+# they are called with None (the whole vocabulary)
+MAX_DEFERRED_CONCEPTS = 100000
+
+# concept_ids is a set of changed concepts, or None when the whole vocabulary
+# (or its metadata) changed. old_version/new_version bracket the content_version
+# bumps made by the committed transaction.
+VocabChange = namedtuple('VocabChange', 'vocab_id concept_ids old_version new_version')
+
+_subscribers = []
+_term_writers = []
+_deferred_writers = []
+
+
+def subscribe(callback):
+    """
+    Register a callback to be told about committed vocabulary changes.
+
+    The callback is called with a VocabChange after the commit, when the
+    session can no longer emit SQL, so callbacks should only mark state stale.
+    """
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+    return callback
+
+
+def on_terms_written(callback, deferred=False):
+    """
+    Register a callback to run inside the transaction that wrote terms.
+
+    The callback is called as callback(connection, vocab_id, concept_ids)
+    after a flush or a bulk write, with concept_ids None when any term of the
+    vocabulary may have changed. Unlike subscribe() callbacks it runs before
+    the commit and may emit SQL, which commits or rolls back with the change.
+
+    A deferred callback is called once per vocabulary just before the commit
+    instead, with the concepts of all the writes since merged. Bulk imports
+    write in chunks, so work that would otherwise be repeated for every
+    chunk (walking the hierarchy, recounting) belongs there.
+    """
+    writers = _deferred_writers if deferred else _term_writers
+    if callback not in writers:
+        writers.append(callback)
+    return callback
+
+
+def _terms_written(session, changed):
+    if _deferred_writers:
+        deferred = session.info.setdefault(DEFERRED_KEY, {})
+        for vocab_id, concept_ids in changed.items():
+            if vocab_id in deferred and deferred[vocab_id] is None:
+                continue
+            if concept_ids is None:
+                deferred[vocab_id] = None
+                continue
+            merged = deferred.setdefault(vocab_id, set())
+            merged.update(concept_ids)
+            if len(merged) > MAX_DEFERRED_CONCEPTS:
+                deferred[vocab_id] = None
+    if not _term_writers:
+        return
+    connection = session.connection()
+    for vocab_id, concept_ids in changed.items():
+        for callback in _term_writers:
+            callback(connection, vocab_id, concept_ids)
+
+
+def _bump_versions(connection, vocab_ids):
+    """Increment content_version for the given vocabularies; return {id: new_version}."""
+    if not vocab_ids:
+        return {}
+    stmt = (
+        update(Vocabulary.__table__)
+        .where(Vocabulary.__table__.c.id.in_(list(vocab_ids)))
+        .values(
+            content_version=Vocabulary.__table__.c.content_version + 1,
+            content_modified_at=datetime.utcnow()
+        )
+        .returning(Vocabulary.__table__.c.id, Vocabulary.__table__.c.content_version)
+    )
+    return {row.id: row.content_version for row in connection.execute(stmt)}
+
+
+def _record(session, changed):
+    """Merge {vocab_id: concept_ids | None} into the session and bump versions."""
+    versions = _bump_versions(session.connection(), changed.keys())
+    pending = session.info.setdefault(PENDING_KEY, {})
+    for vocab_id, concept_ids in changed.items():
+        new_version = versions.get(vocab_id)
+        if new_version is None:
+            continue  # Vocabulary no longer exists
+        if vocab_id not in pending:
+            pending[vocab_id] = VocabChange(
+                vocab_id, None if concept_ids is None else set(concept_ids),
+                new_version - 1, new_version
+            )
+            continue
+        previous = pending[vocab_id]
+        if previous.concept_ids is None or concept_ids is None:
+            merged = None
+        else:
+            merged = previous.concept_ids | set(concept_ids)
+        pending[vocab_id] = previous._replace(concept_ids=merged, new_version=new_version)
+
+
+def mark_changed(vocab_id, concept_ids=None, session=None):
+    """
+    Record a change made outside the ORM unit of work (bulk statements).
+
+    Args:
+        vocab_id: ID of the vocabulary that changed
+        concept_ids: Iterable of changed concept IDs, or None for the whole vocabulary
+        session: Session the change was made in (defaults to db.session)
+    """
+    if session is None:
+        session = db.session()
+    _record(session, {vocab_id: concept_ids})
+    _terms_written(session, {vocab_id: concept_ids})
+
+
+def _after_flush(session, flush_context):
+    """Collect Terms and Vocabularies written by this flush."""
+    changed = {}
+    terms = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, (Term, Vocabulary)):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Vocabulary):
+            changed[obj.id] = None
+            continue
+        terms.setdefault(obj.vocab_id, set()).add(obj.concept_id)
+        if obj.vocab_id not in changed:
+            changed[obj.vocab_id] = {obj.concept_id}
+        elif changed[obj.vocab_id] is not None:
+            changed[obj.vocab_id].add(obj.concept_id)
+    if changed:
+        _record(session, changed)
+    if terms:
+        _terms_written(session, terms)
+
+
+def _before_commit(session):
+    """Run the deferred callbacks for the terms written in this transaction."""
+    if not _deferred_writers:
+        return
+    session.flush()  # Pending ORM changes add to the deferred writes
+    deferred = session.info.pop(DEFERRED_KEY, None)
+    if not deferred:
+        return
+    connection = session.connection()
+    for vocab_id, concept_ids in deferred.items():
+        for callback in _deferred_writers:
+            callback(connection, vocab_id, concept_ids)
+
+
+def _after_commit(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    for change in pending.values():
+        for callback in _subscribers:
+            callback(change)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(DEFERRED_KEY, None)
+
+
+def init_app(app):
+    """Install the session listeners (idempotent)."""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'before_commit', _before_commit)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
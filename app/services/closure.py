@@ -0,0 +1,256 @@
+"""Closure-table index of the concept hierarchy.
+
+ConceptClosure stores every (ancestor, descendant) pair of a vocabulary's
+broader/narrower hierarchy with the length of the shortest path between
+them, and ConceptNode the per-concept figures derived from it (level, child
+and descendant counts, top-concept flag). Subtrees, ancestries and subtree
+sizes then become single range lookups on the primary keys instead of
+recursive walks.
+
+Both tables are derived from TermRelation and updated incrementally once
+per writing transaction, just before it commits (a deferred
+changes.on_terms_written hook, so a chunked import walks the hierarchy once
+rather than once per chunk): only the concepts below a written concept
+(before and after the write) get new ancestor rows, and only those and
+their ancestors get new node figures.
+"""
+from sqlalchemy import String, and_, case, cast, delete, func, insert, literal, select, union
+from app.models import db, Term, TermRelation, ConceptClosure, ConceptNode
+from app.services import changes
+from app.services.relations import BROADER, NARROWER, MAX_DEPTH
+
+# Written concepts plus the concepts below them; past this many the whole
+# vocabulary is rebuilt, which is cheaper than many IN lists
+INCREMENTAL_LIMIT = 20000
+
+# Concepts per IN list
+BATCH_SIZE = 1000
+
+CLOSURE_COLUMNS = ('vocab_id', 'ancestor', 'descendant', 'depth')
+NODE_COLUMNS = ('vocab_id', 'concept_id', 'level', 'child_count', 'descendant_count', 'is_top_concept')
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), BATCH_SIZE):
+        yield values[start:start + BATCH_SIZE]
+
+
+def _parent_edges(vocab_id):
+    """CTE of (child, parent) pairs between live concepts, from both broader and narrower."""
+    relations = TermRelation.__table__
+    terms = Term.__table__
+    # The source of a relation is always live (see relations.sync_relations); check the target
+    live_target = and_(
+        terms.c.vocab_id == relations.c.vocab_id,
+        terms.c.concept_id == relations.c.target,
+        terms.c.deleted_at.is_(None),
+    )
+    broader = (
+        select(cast(relations.c.source, String).label('child'), cast(relations.c.target, String).label('parent'))
+        .join(terms, live_target)
+        .where(relations.c.vocab_id == vocab_id, relations.c.relation == BROADER)
+    )
+    narrower = (
+        select(cast(relations.c.target, String).label('child'), cast(relations.c.source, String).label('parent'))
+        .join(terms, live_target)
+        .where(relations.c.vocab_id == vocab_id, relations.c.relation == NARROWER)
+    )
+    return union(broader, narrower).cte('edges')
+
+
+def _closure_rows(vocab_id, concept_ids=None):
+    """Select of CLOSURE_COLUMNS rows for the ancestors of live concepts (all, or concept_ids)."""
+    terms = Term.__table__
+    edges = _parent_edges(vocab_id)
+    seed = select(
+        cast(terms.c.concept_id, String).label('ancestor'),
+        cast(terms.c.concept_id, String).label('descendant'),
+        literal(0).label('depth'),
+    ).where(terms.c.vocab_id == vocab_id, terms.c.deleted_at.is_(None))
+    if concept_ids is not None:
+        seed = seed.where(terms.c.concept_id.in_(concept_ids))
+    walk = seed.cte('walk', recursive=True)
+    walk = walk.union(
+        select(edges.c.parent, walk.c.descendant, walk.c.depth + 1)
+        .join(edges, edges.c.child == walk.c.ancestor)
+        .where(walk.c.depth < MAX_DEPTH)
+    )
+    return (
+        select(literal(vocab_id), walk.c.ancestor, walk.c.descendant, func.min(walk.c.depth))
+        .group_by(walk.c.ancestor, walk.c.descendant)
+    )
+
+
+def _below(connection, vocab_id, concept_ids):
+    """Concepts below concept_ids in the current relations (not in the closure yet)."""
+    terms = Term.__table__
+    edges = _parent_edges(vocab_id)
+    walk = (
+        select(cast(terms.c.concept_id, String).label('concept_id'), literal(0).label('depth'))
+        .where(terms.c.vocab_id == vocab_id, terms.c.concept_id.in_(concept_ids))
+        .cte('below', recursive=True)
+    )
+    walk = walk.union(
+        select(edges.c.child, walk.c.depth + 1)
+        .join(edges, edges.c.parent == walk.c.concept_id)
+        .where(walk.c.depth < MAX_DEPTH)
+    )
+    return set(connection.execute(select(walk.c.concept_id).distinct()).scalars())
+
+
+def _node_rows(vocab_id, concept_ids=None):
+    """Select of NODE_COLUMNS rows computed from the closure (all concepts, or concept_ids)."""
+    closure = ConceptClosure.__table__
+    up = (
+        select(closure.c.descendant.label('concept_id'), func.max(closure.c.depth).label('level'))
+        .where(closure.c.vocab_id == vocab_id)
+        .group_by(closure.c.descendant)
+    )
+    down = (
+        select(
+            closure.c.ancestor.label('concept_id'),
+            func.sum(case((closure.c.depth == 1, 1), else_=0)).label('child_count'),
+            (func.count() - 1).label('descendant_count'),
+        )
+        .where(closure.c.vocab_id == vocab_id)
+        .group_by(closure.c.ancestor)
+    )
+    if concept_ids is not None:
+        up = up.where(closure.c.descendant.in_(concept_ids))
+        down = down.where(closure.c.ancestor.in_(concept_ids))
+    up = up.subquery('up')
+    down = down.subquery('down')
+    return (
+        select(literal(vocab_id), up.c.concept_id, up.c.level, down.c.child_count,
+               down.c.descendant_count, up.c.level == 0)
+        .join(down, down.c.concept_id == up.c.concept_id)
+    )
+
+
+def _ancestors_of(connection, vocab_id, concept_ids):
+    closure = ConceptClosure.__table__
+    found = set()
+    for chunk in _chunks(concept_ids):
+        found.update(connection.execute(
+            select(closure.c.ancestor)
+            .where(closure.c.vocab_id == vocab_id, closure.c.descendant.in_(chunk))
+            .distinct()
+        ).scalars())
+    return found
+
+
+def rebuild_closure(connection, vocab_id):
+    """Rebuild the closure and node rows of a whole vocabulary."""
+    closure = ConceptClosure.__table__
+    nodes = ConceptNode.__table__
+    connection.execute(delete(nodes).where(nodes.c.vocab_id == vocab_id))
+    connection.execute(delete(closure).where(closure.c.vocab_id == vocab_id))
+    connection.execute(insert(closure).from_select(CLOSURE_COLUMNS, _closure_rows(vocab_id)))
+    connection.execute(insert(nodes).from_select(NODE_COLUMNS, _node_rows(vocab_id)))
+
+
+def update_closure(connection, vocab_id, concept_ids=None):
+    """
+    Bring the closure up to date after terms of a vocabulary were written.
+
+    Called once per transaction, before the commit (see init_app).
+
+    Args:
+        connection: Connection of the writing transaction
+        vocab_id: Vocabulary ID
+        concept_ids: concept_ids of the written terms, or None for the whole vocabulary
+    """
+    if concept_ids is None or len(concept_ids) > INCREMENTAL_LIMIT:
+        rebuild_closure(connection, vocab_id)
+        return
+
+    closure = ConceptClosure.__table__
+    nodes = ConceptNode.__table__
+    written = set(concept_ids)
+    # Whatever was or is now below a written concept may have new ancestors
+    affected = set(written)
+    for chunk in _chunks(written):
+        affected.update(connection.execute(
+            select(closure.c.descendant)
+            .where(closure.c.vocab_id == vocab_id, closure.c.ancestor.in_(chunk))
+        ).scalars())
+    for chunk in _chunks(written):
+        affected.update(_below(connection, vocab_id, chunk))
+    if len(affected) > INCREMENTAL_LIMIT:
+        rebuild_closure(connection, vocab_id)
+        return
+
+    # Subtree sizes change for everything above them, before and after
+    refresh = affected | _ancestors_of(connection, vocab_id, affected)
+    for chunk in _chunks(affected):
+        connection.execute(
+            delete(closure).where(closure.c.vocab_id == vocab_id, closure.c.descendant.in_(chunk))
+        )
+        connection.execute(insert(closure).from_select(CLOSURE_COLUMNS, _closure_rows(vocab_id, chunk)))
+    refresh |= _ancestors_of(connection, vocab_id, affected)
+
+    for chunk in _chunks(refresh):
+        connection.execute(delete(nodes).where(nodes.c.vocab_id == vocab_id, nodes.c.concept_id.in_(chunk)))
+        connection.execute(insert(nodes).from_select(NODE_COLUMNS, _node_rows(vocab_id, chunk)))
+
+
+def subtree(vocab_id, concept_id, max_depth=None):
+    """
+    Select of the concept_ids in a branch, root included, nearest levels first.
+
+    Args:
+        vocab_id: Vocabulary ID
+        concept_id: Root of the branch
+        max_depth: Levels below the root to include (None for the whole branch)
+    """
+    closure = ConceptClosure.__table__
+    query = select(closure.c.descendant.label('concept_id')).where(
+        closure.c.vocab_id == vocab_id, closure.c.ancestor == concept_id
+    )
+    if max_depth is not None:
+        query = query.where(closure.c.depth <= max_depth)
+    return query
+
+
+def ancestors(vocab_id, concept_id):
+    """
+    Ancestors of a concept, top first (breadcrumbs).
+
+    Returns:
+        list of (concept_id, depth), depth 1 for direct parents
+    """
+    closure = ConceptClosure.__table__
+    rows = db.session.execute(
+        select(closure.c.ancestor, closure.c.depth)
+        .where(closure.c.vocab_id == vocab_id, closure.c.descendant == concept_id, closure.c.depth > 0)
+        .order_by(closure.c.depth.desc(), closure.c.ancestor)
+    )
+    return [(row.ancestor, row.depth) for row in rows]
+
+
+def node_stats(vocab_id, concept_ids=None):
+    """
+    ConceptNode figures of a vocabulary's concepts.
+
+    Returns:
+        {concept_id: ConceptNode}
+    """
+    query = ConceptNode.query.filter(ConceptNode.vocab_id == vocab_id)
+    if concept_ids is not None:
+        query = query.filter(ConceptNode.concept_id.in_(list(concept_ids)))
+    return {node.concept_id: node for node in query}
+
+
+def top_concepts(vocab_id):
+    """concept_ids of the vocabulary's top concepts, sorted."""
+    return list(db.session.execute(
+        select(ConceptNode.concept_id)
+        .where(ConceptNode.vocab_id == vocab_id, ConceptNode.is_top_concept.is_(True))
+        .order_by(ConceptNode.concept_id)
+    ).scalars())
+
+
+def init_app(app):
+    """Keep the closure in step with the term writes of every transaction."""
+    changes.on_terms_written(update_closure, deferred=True)
@@ -0,0 +1,55 @@
+"""Cache of per-concept RDF documents for dereferenceable concept URIs.
+
+Each entry is tagged with the Term's updated_at and the vocabulary's base
+URI, which the route reads anyway to resolve the concept, so entries written
+by a stale process are never served. Committed changes evict the affected
+concepts right away.
+"""
+import threading
+from collections import OrderedDict
+from app.services import changes
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class ConceptDocumentCache:
+    """LRU of serialized concept documents keyed by (vocab_id, concept_id, format)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stamp, document)
+
+    def get(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, stamp, document):
+        with self._lock:
+            self._entries[key] = (stamp, document)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def on_change(self, change):
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[0] == change.vocab_id
+                and (change.concept_ids is None or key[1] in change.concept_ids)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+
+cache = ConceptDocumentCache()
+
+
+def init_app(app):
+    """Configure the cache size and subscribe it to vocabulary changes."""
+    cache.max_entries = app.config.get('CONCEPT_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+    changes.subscribe(cache.on_change)
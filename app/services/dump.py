@@ -0,0 +1,305 @@
+"""Bulk dump of the whole catalogue as gzip-compressed N-Quads.
+
+Each vocabulary is serialized (and compressed) by its own worker process into
+a gzip member; members are then concatenated, which is still a valid gzip
+stream. Every ConceptScheme gets its own named graph, and a JSON manifest
+records the content_version, triple count and SHA-256 of each vocabulary so
+harvesters can tell what changed without downloading the archive.
+
+The compressed part of each vocabulary is kept next to the archive, named
+after its content_version, so a rebuild only re-serializes the vocabularies
+that changed since the previous dump. Builds take a lock file in the dump
+directory, so only one process builds at a time. Each archive is published
+under a name derived from its SHA-256 before the manifest that points to it
+replaces the previous one, so the manifest always describes the file it
+names. The previous archive is kept for downloads that read the previous
+manifest.
+"""
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import current_app
+from rdflib import URIRef
+from app.extensions import db
+from app.models import Vocabulary
+from app.services.export import vocabulary_base_uri, stream_nquads
+from app.services.sparql_store import vocabulary_versions
+
+try:
+    import fcntl
+except ImportError:  # Not on POSIX: only builds within this process are serialized
+    fcntl = None
+
+DUMP_FILENAME = 'catalogue.nq.gz'
+MANIFEST_FILENAME = 'catalogue.manifest.json'
+LOCK_FILENAME = 'catalogue.lock'
+PARTS_DIRNAME = 'parts'
+
+_build_lock = threading.Lock()
+
+
+def dump_dir():
+    """Return the dump directory, creating it if needed."""
+    path = current_app.config.get('DUMP_DIR') or os.path.join(current_app.instance_path, 'dumps')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _archive_filename(sha256):
+    return f"catalogue-{sha256[:16]}.nq.gz"
+
+
+def _part_filename(vocab_id, content_version):
+    return f"vocab_{vocab_id}.v{content_version}.nq.gz"
+
+
+@contextmanager
+def _building(blocking=True):
+    """
+    Hold the build lock of the dump directory, across threads and processes.
+
+    Yields:
+        True, or False when not blocking and another build holds the lock
+    """
+    if not _build_lock.acquire(blocking=blocking):
+        yield False
+        return
+    try:
+        with open(os.path.join(dump_dir(), LOCK_FILENAME), 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+            yield True  # The flock is released when the file is closed
+    finally:
+        _build_lock.release()
+
+
+def _serialize_vocabulary(vocab_id, work_dir):
+    """
+    Write one vocabulary as a gzip member of N-Quads.
+
+    Returns a manifest entry, with the path of the member in 'part', or None
+    if the vocabulary no longer exists.
+    """
+    vocab = Vocabulary.query.get(vocab_id)
+    if not vocab:
+        return None
+
+    graph_uri = URIRef(vocabulary_base_uri(vocab))
+    path = os.path.join(work_dir, _part_filename(vocab.id, vocab.content_version))
+    digest = hashlib.sha256()
+    triples = 0
+    with gzip.open(path, 'wb') as f:
+        for chunk in stream_nquads(vocab, graph_uri):
+            data = chunk.encode('utf-8')
+            digest.update(data)
+            triples += chunk.count('\n')
+            f.write(data)
+
+    return {
+        'id': vocab.id,
+        'code': vocab.code,
+        'graph': str(graph_uri),
+        'content_version': vocab.content_version,
+        'triples': triples,
+        'sha256': digest.hexdigest(),
+        'part': path,
+    }
+
+
+_worker_app = None
+
+
+def _init_worker():
+    """Give each pool process its own app and database connection."""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app()
+
+
+def _serialize_in_worker(vocab_id, work_dir):
+    with _worker_app.app_context():
+        return _serialize_vocabulary(vocab_id, work_dir)
+
+
+def _reusable_entries(manifest, parts_dir):
+    """{vocab_id: entry} of a manifest whose parts are still on disk."""
+    if not manifest:
+        return {}
+    return {
+        entry['id']: entry for entry in manifest['vocabularies']
+        if entry.get('part') and os.path.exists(os.path.join(parts_dir, entry['part']))
+    }
+
+
+def _prune(out_dir, parts_dir, manifest, previous):
+    """Remove the archives and parts that neither manifest refers to."""
+    keep = {manifest['file']} | ({previous['file']} if previous else set())
+    for filename in os.listdir(out_dir):
+        if filename.startswith('catalogue') and filename.endswith('.nq.gz') and filename not in keep:
+            os.remove(os.path.join(out_dir, filename))
+    parts = {entry['part'] for entry in manifest['vocabularies']}
+    for filename in os.listdir(parts_dir):
+        if filename not in parts:
+            os.remove(os.path.join(parts_dir, filename))
+
+
+def build_dump(workers=None, force=False, blocking=True):
+    """
+    Serialize the vocabularies that changed and publish a new archive and manifest.
+
+    Args:
+        workers: Number of worker processes (default: CPU count; 1 runs in-process)
+        force: Re-serialize every vocabulary, even those whose content_version
+            did not change (e.g. after changing CONCEPT_BASE_URI)
+        blocking: Wait for a build running in another thread or process;
+            otherwise return None at once
+
+    Returns:
+        The manifest dict, or None if not blocking and another build was running
+    """
+    with _building(blocking) as acquired:
+        if not acquired:
+            return None
+        return _build(workers, force)
+
+
+def _build(workers, force):
+    out_dir = dump_dir()
+    parts_dir = os.path.join(out_dir, PARTS_DIRNAME)
+    os.makedirs(parts_dir, exist_ok=True)
+    previous = load_manifest()
+    reusable = {} if force else _reusable_entries(previous, parts_dir)
+    versions = vocabulary_versions()
+
+    entries = {}
+    stale_ids = []
+    for vocab_id, (version, _) in sorted(versions.items()):
+        entry = reusable.get(vocab_id)
+        if entry is not None and entry['content_version'] == version:
+            entries[vocab_id] = entry
+        else:
+            stale_ids.append(vocab_id)
+    workers = workers or os.cpu_count() or 1
+
+    work_dir = tempfile.mkdtemp(dir=out_dir)
+    try:
+        if workers <= 1 or len(stale_ids) <= 1:
+            built = [_serialize_vocabulary(vocab_id, work_dir) for vocab_id in stale_ids]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(stale_ids)),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            ) as executor:
+                built = list(executor.map(_serialize_in_worker, stale_ids, [work_dir] * len(stale_ids)))
+        for entry in built:
+            if entry:
+                part = os.path.basename(entry['part'])
+                os.replace(entry['part'], os.path.join(parts_dir, part))
+                entries[entry['id']] = dict(entry, part=part)
+        entries = [entries[vocab_id] for vocab_id in sorted(entries)]
+
+        # Concatenated gzip members form a single valid gzip stream
+        archive_tmp = os.path.join(work_dir, DUMP_FILENAME)
+        archive_digest = hashlib.sha256()
+        with open(archive_tmp, 'wb') as out:
+            for entry in entries:
+                with open(os.path.join(parts_dir, entry['part']), 'rb') as part:
+                    while True:
+                        block = part.read(1024 * 1024)
+                        if not block:
+                            break
+                        archive_digest.update(block)
+                        out.write(block)
+
+        manifest = {
+            'generated_at': datetime.utcnow().isoformat() + 'Z',
+            'file': _archive_filename(archive_digest.hexdigest()),
+            'sha256': archive_digest.hexdigest(),
+            'triples': sum(entry['triples'] for entry in entries),
+            'vocabularies': entries,
+        }
+        manifest_tmp = os.path.join(work_dir, MANIFEST_FILENAME)
+        with open(manifest_tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Archive first: a manifest never names a file that is not there yet
+        os.replace(archive_tmp, os.path.join(out_dir, manifest['file']))
+        os.replace(manifest_tmp, os.path.join(out_dir, MANIFEST_FILENAME))
+        _prune(out_dir, parts_dir, manifest, previous)
+        return manifest
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def load_manifest():
+    """Return the current manifest, or None if no dump has been built."""
+    path = os.path.join(dump_dir(), MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_is_current(manifest):
+    """True if the manifest matches the current content version of every vocabulary."""
+    if not manifest:
+        return False
+    dumped = {entry['id']: entry['content_version'] for entry in manifest['vocabularies']}
+    current = {vocab_id: version for vocab_id, (version, _) in vocabulary_versions().items()}
+    return dumped == current
+
+
+def published_dump():
+    """
+    The last published dump, current or not.
+
+    Returns:
+        (archive path, manifest), or (None, None) if no dump has been built
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        return None, None
+    return os.path.join(dump_dir(), manifest['file']), manifest
+
+
+class DumpRebuilder:
+    """Background thread bringing the dump up to date when a request finds it stale."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def request(self, app):
+        """Start a rebuild unless one is already running in this process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), name='dump-builder', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        with app.app_context():
+            try:
+                # In this thread, one vocabulary at a time; flask export-all uses the pool.
+                # Skipped if another process is building.
+                build_dump(workers=1, blocking=False)
+            except Exception as e:
+                app.logger.warning(f"Could not rebuild the catalogue dump: {e}")
+            finally:
+                db.session.remove()
+
+
+rebuilder = DumpRebuilder()
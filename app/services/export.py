@@ -1,8 +1,158 @@
 """Export service - Generate RDF graphs and CSV exports."""
+from flask import current_app, has_app_context
 from rdflib import Graph, Namespace, RDF, SKOS, URIRef, Literal
-from app.models import Vocabulary, Term
+from app.models import db, Vocabulary, Term
 import csv
 import io
+import re
+
+# Rows fetched per round trip when streaming exports
+STREAM_BATCH_SIZE = 1000
+
+DC = Namespace("http://purl.org/dc/elements/1.1/")
+
+# Columns needed to describe a term in RDF (see term_statements)
+TERM_RDF_COLUMNS = (
+    Term.concept_id, Term.pref_label_es, Term.pref_label_en,
+    Term.definition_es, Term.definition_en, Term.alt_labels,
+    Term.broader, Term.narrower, Term.related,
+    Term.exact_match, Term.close_match, Term.source
+)
+
+# Characters that may not appear in an IRIREF (N-Triples/Turtle grammar)
+_IRI_UNSAFE = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+CSV_HEADER = ['ID', 'PrefLabel (ES)', 'PrefLabel (EN)', 'Definition (ES)', 'Definition (EN)', 'Broader']
+
+
+def safe_iri(value):
+    """
+    Percent-encode the characters an IRIREF may not contain.
+    
+    Imported mappings and concept IDs sometimes carry spaces or other stray
+    characters (e.g. ``".../L06/current/20/ - https://..."``), which would
+    make every serialization invalid. Existing ``%XX`` escapes are kept, so
+    applying this twice is harmless.
+    """
+    if _IRI_UNSAFE.search(value) is None:
+        return value
+    return _IRI_UNSAFE.sub(lambda m: ''.join(f'%{b:02X}' for b in m.group(0).encode('utf-8')), value)
+
+
+def concept_iri(base_uri, concept_id):
+    """Return the IRI of a concept within a vocabulary's base URI."""
+    return safe_iri(base_uri + concept_id)
+
+
+def vocabulary_base_uri(vocab):
+    """
+    Return the base URI used for a vocabulary's scheme and concept URIs.
+    
+    Vocabularies without their own base_uri get one from CONCEPT_BASE_URI
+    (e.g. ``https://vocab.example.org/id/{code}/``), which points at the
+    /id/<code>/<concept_id> resolver so concept URIs are dereferenceable.
+    """
+    base_uri = vocab.base_uri
+    if not base_uri:
+        template = current_app.config.get('CONCEPT_BASE_URI') if has_app_context() else None
+        base_uri = (template or "http://example.org/vocab/{code}/").format(code=vocab.code)
+    if not base_uri.endswith('/'):
+        base_uri += '/'
+    return safe_iri(base_uri)
+
+
+def alt_label_parts(alt):
+    """Return (label, lang) for an alt label stored as a dict or a plain string."""
+    if isinstance(alt, dict):
+        return alt.get('label'), alt.get('lang')
+    return alt, None
+
+
+def scheme_statements(vocab, base_uri):
+    """
+    Describe a vocabulary's ConceptScheme as (predicate, value, lang, is_uri) tuples.
+    
+    The subject is always ``base_uri``.
+    """
+    statements = [
+        (str(RDF.type), str(SKOS.ConceptScheme), None, True),
+        (str(SKOS.prefLabel), vocab.name, 'es', False),
+    ]
+    if vocab.description:
+        statements.append((str(SKOS.definition), vocab.description, 'es', False))
+    return statements
+
+
+def term_statements(term, base_uri):
+    """
+    Describe a term as (predicate, value, lang, is_uri) tuples.
+    
+    This is the single definition of the SKOS shape of a term: the rdflib
+    graph path and the direct serializers in skos_writer both build on it.
+    ``term`` may be a Term or any row with the TERM_RDF_COLUMNS attributes.
+    """
+    statements = [
+        (str(RDF.type), str(SKOS.Concept), None, True),
+        (str(SKOS.inScheme), base_uri, None, True),
+    ]
+    
+    if term.pref_label_es:
+        statements.append((str(SKOS.prefLabel), term.pref_label_es, 'es', False))
+    if term.pref_label_en:
+        statements.append((str(SKOS.prefLabel), term.pref_label_en, 'en', False))
+    for alt in term.alt_labels or []:
+        label, lang = alt_label_parts(alt)
+        if label:
+            statements.append((str(SKOS.altLabel), label, lang, False))
+        
+    if term.definition_es:
+        statements.append((str(SKOS.definition), term.definition_es, 'es', False))
+    if term.definition_en:
+        statements.append((str(SKOS.definition), term.definition_en, 'en', False))
+        
+    # Relationships (concept IDs within this vocabulary)
+    for predicate, targets in ((SKOS.broader, term.broader), (SKOS.narrower, term.narrower),
+                               (SKOS.related, term.related)):
+        for target_id in targets or []:
+            statements.append((str(predicate), concept_iri(base_uri, target_id), None, True))
+    
+    # External mappings (full URIs)
+    for predicate, targets in ((SKOS.exactMatch, term.exact_match), (SKOS.closeMatch, term.close_match)):
+        for target in targets or []:
+            statements.append((str(predicate), safe_iri(target), None, True))
+    
+    if term.source:
+        statements.append((str(DC.source), term.source, None, False))
+    
+    return statements
+
+
+def _add_statements(g, subject, statements):
+    for predicate, value, lang, is_uri in statements:
+        obj = URIRef(value) if is_uri else Literal(value, lang=lang)
+        g.add((subject, URIRef(predicate), obj))
+
+
+def add_scheme_triples(g, vocab, base_uri):
+    """Add the ConceptScheme description of a vocabulary to a graph."""
+    _add_statements(g, URIRef(base_uri), scheme_statements(vocab, base_uri))
+
+
+def add_term_triples(g, term, base_uri):
+    """Add the SKOS description of a single term to a graph."""
+    _add_statements(g, URIRef(concept_iri(base_uri, term.concept_id)), term_statements(term, base_uri))
+
+
+def populate_vocabulary_graph(g, vocab):
+    """Add a vocabulary's scheme and all of its approved terms to a graph."""
+    base_uri = vocabulary_base_uri(vocab)
+    add_scheme_triples(g, vocab, base_uri)
+    
+    terms = Term.query.filter_by(vocab_id=vocab.id, status='approved').all()
+    for term in terms:
+        add_term_triples(g, term, base_uri)
+    
+    return g
 
 
 def generate_rdf_graph(vocab_id):
@@ -12,68 +162,109 @@ def generate_rdf_graph(vocab_id):
         return None
         
     g = Graph()
-    base_uri = vocab.base_uri or f"http://example.org/vocab/{vocab.code}/"
-    if not base_uri.endswith('/'):
-        base_uri += '/'
-    
-    NS = Namespace(base_uri)
+    NS = Namespace(vocabulary_base_uri(vocab))
     g.bind('skos', SKOS)
+    g.bind('dc', DC)
     g.bind('vocab', NS)
     
-    # Scheme
-    scheme_uri = URIRef(base_uri)
-    g.add((scheme_uri, RDF.type, SKOS.ConceptScheme))
-    g.add((scheme_uri, SKOS.prefLabel, Literal(vocab.name, lang='es')))
-    if vocab.description:
-        g.add((scheme_uri, SKOS.definition, Literal(vocab.description, lang='es')))
-        
-    # Terms
-    terms = Term.query.filter_by(vocab_id=vocab_id, status='approved').all()
-    for term in terms:
-        term_uri = URIRef(base_uri + term.concept_id)
-        g.add((term_uri, RDF.type, SKOS.Concept))
-        g.add((term_uri, SKOS.inScheme, scheme_uri))
-        
-        if term.pref_label_es:
-            g.add((term_uri, SKOS.prefLabel, Literal(term.pref_label_es, lang='es')))
-        if term.pref_label_en:
-            g.add((term_uri, SKOS.prefLabel, Literal(term.pref_label_en, lang='en')))
-            
-        if term.definition_es:
-            g.add((term_uri, SKOS.definition, Literal(term.definition_es, lang='es')))
-        if term.definition_en:
-            g.add((term_uri, SKOS.definition, Literal(term.definition_en, lang='en')))
-            
-        # Relationships
-        if term.broader:
-            for broader_id in term.broader:
-                g.add((term_uri, SKOS.broader, URIRef(base_uri + broader_id)))
-                
-        if term.narrower:
-            for narrower_id in term.narrower:
-                g.add((term_uri, SKOS.narrower, URIRef(base_uri + narrower_id)))
+    return populate_vocabulary_graph(g, vocab)
 
-    return g
 
+def iter_term_rows(vocab_id, columns, batch_size=STREAM_BATCH_SIZE, concept_ids=None):
+    """
+    Yield approved terms of a vocabulary as column tuples.
 
-def export_to_csv(vocab_id):
-    """Export vocabulary terms to CSV format."""
-    vocab = Vocabulary.query.get(vocab_id)
-    terms = Term.query.filter_by(vocab_id=vocab_id, status='approved').all()
-    
+    Uses a server-side cursor (yield_per) so only one batch of rows is held
+    in memory at a time, whatever the size of the vocabulary. ``concept_ids``
+    optionally restricts the rows to a selectable of concept_ids, such as
+    hierarchy.subtree_concept_ids().
+    """
+    query = db.session.query(*columns).filter(Term.vocab_id == vocab_id, Term.status == 'approved')
+    if concept_ids is not None:
+        query = query.filter(Term.concept_id.in_(concept_ids))
+    query = query.order_by(Term.concept_id).yield_per(batch_size)
+    for row in query:
+        yield row
+
+
+def stream_csv(vocab_id, batch_size=STREAM_BATCH_SIZE, concept_ids=None):
+    """Yield a vocabulary's CSV export in chunks of roughly batch_size rows."""
+    columns = (
+        Term.concept_id, Term.pref_label_es, Term.pref_label_en,
+        Term.definition_es, Term.definition_en, Term.broader
+    )
     output = io.StringIO()
     writer = csv.writer(output)
-    writer.writerow(['ID', 'PrefLabel (ES)', 'PrefLabel (EN)', 'Definition (ES)', 'Definition (EN)', 'Broader'])
+    writer.writerow(CSV_HEADER)
     
-    for term in terms:
-        broader_str = ','.join(term.broader) if term.broader else ''
+    for i, row in enumerate(iter_term_rows(vocab_id, columns, batch_size, concept_ids), 1):
+        broader_str = ','.join(row.broader) if row.broader else ''
         writer.writerow([
-            term.concept_id,
-            term.pref_label_es,
-            term.pref_label_en,
-            term.definition_es,
-            term.definition_en,
+            row.concept_id,
+            row.pref_label_es,
+            row.pref_label_en,
+            row.definition_es,
+            row.definition_en,
             broader_str
         ])
-        
-    return output.getvalue()
+        if i % batch_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    
+    yield output.getvalue()
+
+
+def export_to_csv(vocab_id):
+    """Export vocabulary terms to CSV format."""
+    return ''.join(stream_csv(vocab_id))
+
+
+def _escape_nt_string(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def nt_term(node):
+    """Format an rdflib URIRef or Literal as an N-Triples term."""
+    if isinstance(node, Literal):
+        text = '"' + _escape_nt_string(str(node)) + '"'
+        if node.language:
+            return text + '@' + node.language
+        if node.datatype:
+            return text + '^^<' + safe_iri(str(node.datatype)) + '>'
+        return text
+    return '<' + safe_iri(str(node)) + '>'
+
+
+class _TripleBuffer(list):
+    """List with a Graph-like add(), so add_*_triples can write into it."""
+    add = list.append
+
+
+def iter_vocabulary_triples(vocab, batch_size=STREAM_BATCH_SIZE, concept_ids=None):
+    """Yield a vocabulary's triples as lists, one list per batch of terms."""
+    base_uri = vocabulary_base_uri(vocab)
+    triples = _TripleBuffer()
+    add_scheme_triples(triples, vocab, base_uri)
+    
+    for i, row in enumerate(iter_term_rows(vocab.id, TERM_RDF_COLUMNS, batch_size, concept_ids), 1):
+        add_term_triples(triples, row, base_uri)
+        if i % batch_size == 0:
+            yield triples
+            triples = _TripleBuffer()
+    
+    yield triples
+
+
+def stream_ntriples(vocab, batch_size=STREAM_BATCH_SIZE, concept_ids=None):
+    """Yield a vocabulary's N-Triples export, one chunk per batch of terms."""
+    for triples in iter_vocabulary_triples(vocab, batch_size, concept_ids):
+        yield ''.join(f"{nt_term(s)} {nt_term(p)} {nt_term(o)} .\n" for s, p, o in triples)
+
+
+def stream_nquads(vocab, graph_uri, batch_size=STREAM_BATCH_SIZE):
+    """Yield a vocabulary's triples as N-Quads in the given named graph."""
+    graph = nt_term(graph_uri)
+    for triples in iter_vocabulary_triples(vocab, batch_size):
+        yield ''.join(f"{nt_term(s)} {nt_term(p)} {nt_term(o)} {graph} .\n" for s, p, o in triples)
@@ -0,0 +1,75 @@
+"""On-disk cache of serialized vocabulary exports.
+
+Artifacts are keyed by (vocab_id, content_version, format). A write to a
+vocabulary bumps its content_version, so stale files are simply never looked
+up again and are pruned the next time that format is built. Files live on
+disk so every worker on the host shares them and they survive restarts.
+"""
+import os
+import tempfile
+from flask import current_app
+
+
+def cache_dir():
+    """Return the export cache directory, creating it if needed."""
+    path = current_app.config.get('EXPORT_CACHE_DIR') or os.path.join(
+        current_app.instance_path, 'export_cache'
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def export_etag(vocab, format):
+    """Strong ETag for an export of a vocabulary at its current version."""
+    return f"{vocab.id}-{vocab.content_version}-{format}"
+
+
+def export_last_modified(vocab):
+    """Last-Modified timestamp for a vocabulary's exports."""
+    return vocab.content_modified_at or vocab.created_at
+
+
+def _artifact_path(vocab_id, version, format):
+    return os.path.join(cache_dir(), f"vocab_{vocab_id}.v{version}.{format}")
+
+
+def _prune(vocab_id, keep_version, format):
+    prefix = f"vocab_{vocab_id}.v"
+    suffix = f".{format}"
+    for name in os.listdir(cache_dir()):
+        if name.startswith(prefix) and name.endswith(suffix):
+            if name != f"{prefix}{keep_version}{suffix}":
+                try:
+                    os.remove(os.path.join(cache_dir(), name))
+                except OSError:
+                    pass
+
+
+def cached_export_path(vocab, format):
+    """Return the path of an already cached export, or None."""
+    path = _artifact_path(vocab.id, vocab.content_version, format)
+    return path if os.path.exists(path) else None
+
+
+def stream_through_cache(vocab, format, chunks):
+    """
+    Yield export chunks while also writing them to the cache.
+
+    The artifact only becomes visible once the stream completes; if the
+    client disconnects half-way the partial file is discarded.
+    """
+    version = vocab.content_version
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir(), suffix='.tmp')
+    completed = False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                f.write(data)
+                yield data
+        os.replace(tmp_path, _artifact_path(vocab.id, version, format))
+        completed = True
+        _prune(vocab.id, version, format)
+    finally:
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,35 @@
+"""Hierarchy lookups for branch exports.
+
+Subtrees are read from the closure table (see app.services.closure), which
+holds every ancestor/descendant pair with its depth: a branch, whatever its
+size or depth limit, is one range lookup on the (vocab_id, ancestor, depth)
+primary key.
+"""
+from sqlalchemy import select
+from app.models import db, Term
+from app.services import closure
+
+
+def subtree_concept_ids(vocab_id, root_concept_id, max_depth=None):
+    """
+    Build a selectable of the concept_ids in a subtree, root included.
+
+    Args:
+        vocab_id: Vocabulary ID
+        root_concept_id: concept_id of the subtree root
+        max_depth: Levels below the root to include (None for the whole branch)
+
+    Returns:
+        A select with a single ``concept_id`` column, usable in
+        ``Term.concept_id.in_(...)`` filters (see export.iter_term_rows)
+    """
+    return closure.subtree(vocab_id, root_concept_id, max_depth)
+
+
+def concept_exists(vocab_id, concept_id):
+    """True if the vocabulary has an approved concept with this concept_id."""
+    return db.session.query(
+        select(Term.id)
+        .where(Term.vocab_id == vocab_id, Term.concept_id == concept_id, Term.status == 'approved')
+        .exists()
+    ).scalar()
@@ -0,0 +1,290 @@
+"""Background execution of vocabulary imports.
+
+The import route only spools the upload and records an ImportJob; the
+parse-extract-persist pipeline runs on a small thread pool. Progress is
+written to the job row through its own short transactions, so the import
+itself stays a single transaction and the import page can poll the job
+while it runs.
+
+Jobs only live in the thread pool of the process that accepted them. Each
+job records that process as its owner, and the owner refreshes the job's
+heartbeat while it is queued or running. Before serving its first request a
+process fails the jobs whose owner is gone or whose heartbeat is older than
+IMPORT_HEARTBEAT_TIMEOUT (see recover_jobs); the jobs of live siblings are
+left alone.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import db, ImportJob
+from app.services.archives import ARCHIVE_FORMAT
+
+DEFAULT_WORKERS = 2
+DEFAULT_HEARTBEAT_TIMEOUT = 300
+
+# Seconds between heartbeats of the jobs a process owns
+HEARTBEAT_INTERVAL = 30
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+INTERRUPTED_ERROR = 'La importación se interrumpió: el proceso que la ejecutaba terminó.'
+
+
+def upload_dir():
+    """Return the directory for spooled uploads, creating it if needed."""
+    path = current_app.config.get('IMPORT_UPLOAD_DIR') or os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+_owner = (None, None)  # (pid, owner string)
+
+
+def process_owner():
+    """'host:pid:token' of this process; the token tells it from an earlier process with the same pid."""
+    global _owner
+    pid = os.getpid()
+    if _owner[0] != pid:  # Not set yet, or inherited through a fork
+        _owner = (pid, f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}")
+    return _owner[1]
+
+
+def _owner_gone(owner):
+    """True if owner is a process of this host that no longer runs."""
+    host, _, rest = (owner or '').partition(':')
+    pid, _, _ = rest.partition(':')
+    if host != socket.gethostname() or not pid.isdigit() or os.name != 'posix':
+        return False  # Only the heartbeat can tell
+    if owner != process_owner() and int(pid) == os.getpid():
+        return True  # An earlier process that had our pid
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _update_job(job_id, **values):
+    """Write job fields outside the import's transaction."""
+    with db.engine.begin() as connection:
+        connection.execute(update(ImportJob.__table__).where(ImportJob.__table__.c.id == job_id).values(**values))
+
+
+def _progress_values(stats):
+    return {
+        'heartbeat_at': datetime.utcnow(),
+        'processed': stats['added'] + stats['updated'] + stats['unchanged'] + stats['skipped'],
+        'added': stats['added'],
+        'updated': stats['updated'],
+        'unchanged': stats['unchanged'],
+        'skipped': stats['skipped'],
+    }
+
+
+def _run_archive(path, options):
+    """
+    Import a zip job member by member.
+
+    Returns:
+        (first imported Vocabulary, summed stats, per-member result dicts for ImportJob.files)
+
+    Raises:
+        ValueError: if no member could be imported
+    """
+    from app.services.import_service import import_archive
+
+    results = import_archive(path, **options)
+    files = []
+    stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    vocab = None
+    for result in results:
+        files.append({
+            'name': result['name'],
+            'vocab_id': result['vocab'].id if result['vocab'] is not None else None,
+            'error': result['error'] or (None if result['stats'] else 'No se encontró un vocabulario.'),
+            **(result['stats'] or {}),
+        })
+        if result['stats']:
+            vocab = vocab or result['vocab']
+            for key in stats:
+                stats[key] += result['stats'][key]
+    if vocab is None:
+        raise ValueError('; '.join(f"{entry['name']}: {entry['error']}" for entry in files))
+    return vocab, stats, files
+
+
+def run_job(job_id):
+    """Run an import job to completion (in the current app context)."""
+    from app.services.bulk import DiffReport
+    from app.services.import_service import import_file
+
+    job = ImportJob.query.get(job_id)
+    if job is None or job.status != 'queued':
+        return
+    path = job.path
+    _update_job(job_id, status='running', started_at=datetime.utcnow(),
+                owner=process_owner(), heartbeat_at=datetime.utcnow())
+
+    # Diffs are only meaningful against an existing vocabulary
+    report = DiffReport() if job.action == 'update' else None
+    options = dict(
+        vocab_id=job.vocab_id if job.action == 'update' else None,
+        add_new=job.add_new, update_existing=job.update_existing,
+        progress=lambda stats: _update_job(job_id, **_progress_values(stats)),
+        dry_run=bool(job.dry_run), report=report
+    )
+    try:
+        if job.format == ARCHIVE_FORMAT:
+            vocab, stats, files = _run_archive(path, options)
+        else:
+            vocab, stats = import_file(path, job.format, filename=job.filename, **options)
+            files = None
+        if vocab is None or stats is None:
+            raise LookupError('No se encontró un vocabulario para importar.')
+        _update_job(job_id, status='done', vocab_id=vocab.id, finished_at=datetime.utcnow(),
+                    report=report.to_dict() if report is not None else None, files=files,
+                    **_progress_values(stats))
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Import job {job_id} failed: {e}")
+        message = f"Error al parsear el archivo: {e}" if isinstance(e, ValueError) else str(e)
+        _update_job(job_id, status='failed', error=message, finished_at=datetime.utcnow())
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+        _update_job(job_id, path=None)
+
+
+def heartbeat():
+    """Refresh the heartbeat of the queued and running jobs of this process."""
+    table = ImportJob.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(table)
+            .where(table.c.owner == process_owner(), table.c.status.in_(ACTIVE_STATUSES))
+            .values(heartbeat_at=datetime.utcnow())
+        )
+
+
+def recover_jobs(timeout=DEFAULT_HEARTBEAT_TIMEOUT):
+    """
+    Mark as failed the queued or running jobs that nothing will finish.
+
+    A job is abandoned when its owner is a process of this host that is no
+    longer running, or when its heartbeat (its creation, if it never had
+    one) is older than timeout seconds. Their spooled uploads are removed.
+
+    Args:
+        timeout: Seconds without a heartbeat after which a job is abandoned
+
+    Returns:
+        Number of jobs marked as failed
+    """
+    table = ImportJob.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    me = process_owner()
+    candidates = db.session.execute(
+        select(table.c.id, table.c.path, table.c.owner, table.c.heartbeat_at, table.c.created_at)
+        .where(table.c.status.in_(ACTIVE_STATUSES))
+    ).all()
+    db.session.rollback()
+    count = 0
+    for job in candidates:
+        if job.owner == me:
+            continue
+        last_seen = job.heartbeat_at or job.created_at
+        if not (_owner_gone(job.owner) or last_seen is None or last_seen < cutoff):
+            continue
+        if job.path and os.path.exists(job.path):
+            os.remove(job.path)
+        _update_job(job.id, status='failed', error=INTERRUPTED_ERROR, finished_at=datetime.utcnow(), path=None)
+        count += 1
+    return count
+
+
+class ImportJobRunner:
+    """Thread pool running import jobs; size 0 runs them inline."""
+
+    def __init__(self, size=DEFAULT_WORKERS):
+        self.size = size
+        self._app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._recovered = False
+        self._heart = None
+        self.heartbeat_timeout = DEFAULT_HEARTBEAT_TIMEOUT
+
+    def recover(self):
+        """Run recover_jobs once per process, before this process accepts a job."""
+        if self._recovered:
+            return
+        # Requests wait here, so no job of this process is started before the recovery ends
+        with self._lock:
+            if self._recovered:
+                return
+            try:
+                count = recover_jobs(self.heartbeat_timeout)
+            except (SQLAlchemyError, OSError) as e:
+                db.session.rollback()
+                self._app.logger.warning(f"Could not recover interrupted import jobs: {e}")
+            else:
+                if count:
+                    self._app.logger.warning(f"Marked {count} interrupted import jobs as failed")
+            self._recovered = True
+
+    def submit(self, job_id):
+        # Claim the job before it waits in the queue, so other processes see it is alive
+        _update_job(job_id, owner=process_owner(), heartbeat_at=datetime.utcnow())
+        with self._lock:
+            if self._heart is None or not self._heart.is_alive():
+                self._heart = threading.Thread(target=self._beat, name='import-heartbeat', daemon=True)
+                self._heart.start()
+        if not self.size:
+            run_job(job_id)
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='import-job')
+        self._executor.submit(self._run, job_id)
+
+    def _beat(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self._app.app_context():
+                try:
+                    heartbeat()
+                except SQLAlchemyError as e:
+                    self._app.logger.warning(f"Could not refresh the import job heartbeat: {e}")
+
+    def _run(self, job_id):
+        with self._app.app_context():
+            try:
+                run_job(job_id)
+            finally:
+                db.session.remove()
+
+
+runner = ImportJobRunner()
+
+
+def init_app(app):
+    """
+    Configure the import runner (threads start with the first job).
+
+    Stale jobs are recovered before the first request rather than here:
+    CLI commands and SPARQL workers create the app too, while the server
+    may still be running its jobs.
+    """
+    runner.size = app.config.get('IMPORT_WORKERS', DEFAULT_WORKERS)
+    runner.heartbeat_timeout = app.config.get('IMPORT_HEARTBEAT_TIMEOUT', DEFAULT_HEARTBEAT_TIMEOUT)
+    runner._app = app
+    app.before_request(runner.recover)
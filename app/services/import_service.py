@@ -1,6 +1,34 @@
-"""Import service for vocabulary files (RDF/XML, Turtle, JSON-LD)."""
-from rdflib import Graph, Namespace, RDF, SKOS, DCTERMS, RDFS
+"""Import service for vocabulary files (RDF/XML, N-Triples, Turtle, JSON-LD, CSV, XLSX)."""
+import os
+from rdflib import Graph, Namespace, RDF, SKOS, DCTERMS, RDFS, URIRef
+from sqlalchemy.exc import SQLAlchemyError
 from app.models import db, Vocabulary, Term
+from app.services import skos_reader
+from app.services.archives import (
+    ARCHIVE_FORMAT, archive_members, open_archive, open_member, open_source, strip_compression
+)
+from app.services.bulk import upsert_terms, BULK_BATCH_SIZE
+from app.services.rdf_stream import BLOCK_READERS, GROUPED_READERS, RepeatedSubjectError, iter_subject_blocks
+from app.services.tabular import TABULAR_FORMATS, iter_tabular_terms, tabular_vocabulary_info
+
+# Formats imported block by block without building a Graph (see import_stream)
+STREAMING_FORMATS = set(BLOCK_READERS)
+
+# Concepts handed to the bulk writer at a time when streaming
+STREAM_CHUNK_SIZE = BULK_BATCH_SIZE
+
+# Importable file extensions (after any .gz/.bz2 suffix)
+FILE_FORMATS = {
+    '.csv': 'csv',
+    '.xlsx': 'xlsx',
+    '.ttl': 'turtle',
+    '.nt': 'nt',
+    '.jsonld': 'json-ld',
+    '.json': 'json-ld',
+    '.rdf': 'xml',
+    '.xml': 'xml',
+    '.zip': ARCHIVE_FORMAT,
+}
 
 
 def parse_rdf_file(file_content, format):
@@ -38,16 +66,7 @@ def extract_vocabulary_info(graph):
     if not scheme:
         # Try to infer from concepts
         for s in graph.subjects(RDF.type, SKOS.Concept):
-            # Use the namespace as scheme
-            scheme_uri = str(s).rsplit('/', 1)[0] + '/'
-            return {
-                'uri': scheme_uri,
-                'code': scheme_uri.split('/')[-2] if '/' in scheme_uri else 'imported',
-                'name': 'Imported Vocabulary',
-                'name_en': None,
-                'description': None,
-                'description_en': None
-            }
+            return _inferred_vocabulary_info(s)
     
     # Extract metadata from scheme
     info = {
@@ -94,80 +113,26 @@ def extract_vocabulary_info(graph):
     return info
 
 
+def _inferred_vocabulary_info(concept_uri):
+    """Vocabulary metadata for files without a ConceptScheme, from a concept's namespace."""
+    scheme_uri = str(concept_uri).rsplit('/', 1)[0] + '/'
+    return {
+        'uri': scheme_uri,
+        'code': scheme_uri.split('/')[-2] if '/' in scheme_uri else 'imported',
+        'name': 'Imported Vocabulary',
+        'name_en': None,
+        'description': None,
+        'description_en': None
+    }
+
+
 def extract_terms(graph):
     """
     Extract all SKOS concepts from graph.
     
-    Returns list of term dicts.
+    Returns list of term dicts (see skos_reader.build_term).
     """
-    terms = []
-    
-    for concept in graph.subjects(RDF.type, SKOS.Concept):
-        term = {
-            'concept_id': str(concept).split('/')[-1] or str(concept).split('#')[-1],
-            'uri': str(concept),
-            'pref_label_es': None,
-            'pref_label_en': None,
-            'definition_es': None,
-            'definition_en': None,
-            'alt_labels': [],
-            'broader': [],
-            'narrower': [],
-            'related': [],
-            'exact_match': [],
-            'close_match': [],
-            'source': None
-        }
-        
-        # Preferred labels
-        for label in graph.objects(concept, SKOS.prefLabel):
-            lang = label.language if hasattr(label, 'language') else None
-            if lang == 'es':
-                term['pref_label_es'] = str(label)
-            elif lang == 'en':
-                term['pref_label_en'] = str(label)
-            elif not term['pref_label_es']:
-                term['pref_label_es'] = str(label)
-        
-        # Alt labels
-        for label in graph.objects(concept, SKOS.altLabel):
-            term['alt_labels'].append(str(label))
-        
-        # Definitions
-        for defn in graph.objects(concept, SKOS.definition):
-            lang = defn.language if hasattr(defn, 'language') else None
-            if lang == 'es':
-                term['definition_es'] = str(defn)
-            elif lang == 'en':
-                term['definition_en'] = str(defn)
-            elif not term['definition_es']:
-                term['definition_es'] = str(defn)
-        
-        # Hierarchical relations
-        for broader in graph.objects(concept, SKOS.broader):
-            term['broader'].append(str(broader).split('/')[-1] or str(broader).split('#')[-1])
-        
-        for narrower in graph.objects(concept, SKOS.narrower):
-            term['narrower'].append(str(narrower).split('/')[-1] or str(narrower).split('#')[-1])
-        
-        for related in graph.objects(concept, SKOS.related):
-            term['related'].append(str(related).split('/')[-1] or str(related).split('#')[-1])
-        
-        # Mappings
-        for match in graph.objects(concept, SKOS.exactMatch):
-            term['exact_match'].append(str(match))
-        
-        for match in graph.objects(concept, SKOS.closeMatch):
-            term['close_match'].append(str(match))
-        
-        # Source
-        for source in graph.objects(concept, DCTERMS.source):
-            term['source'] = str(source)
-            break
-        
-        terms.append(term)
-    
-    return terms
+    return skos_reader.extract_terms(graph)
 
 
 def create_vocabulary_from_graph(graph, override_info=None):
@@ -189,48 +154,35 @@ def create_vocabulary_from_graph(graph, override_info=None):
             if value:
                 vocab_info[key] = value
     
-    # Ensure we have a name
-    if not vocab_info.get('name'):
-        vocab_info['name'] = 'Imported Vocabulary'
-    
-    # Create vocabulary
-    vocab = Vocabulary(
-        code=vocab_info.get('code', 'imported'),
-        name=vocab_info['name'],
-        name_en=vocab_info.get('name_en'),
-        description=vocab_info.get('description'),
-        description_en=vocab_info.get('description_en'),
-        base_uri=vocab_info.get('uri')
-    )
-    
-    db.session.add(vocab)
-    db.session.flush()  # Get vocab.id
+    vocab = _new_vocabulary(vocab_info)
     
     # Extract and create terms
-    terms_data = extract_terms(graph)
-    for term_data in terms_data:
-        term = Term(
-            vocab_id=vocab.id,
-            concept_id=term_data['concept_id'],
-            pref_label_es=term_data['pref_label_es'],
-            pref_label_en=term_data['pref_label_en'],
-            definition_es=term_data['definition_es'],
-            definition_en=term_data['definition_en'],
-            alt_labels=term_data['alt_labels'] if term_data['alt_labels'] else None,
-            broader=term_data['broader'] if term_data['broader'] else None,
-            narrower=term_data['narrower'] if term_data['narrower'] else None,
-            related=term_data['related'] if term_data['related'] else None,
-            exact_match=term_data['exact_match'] if term_data['exact_match'] else None,
-            close_match=term_data['close_match'] if term_data['close_match'] else None,
-            source=term_data['source']
-        )
-        db.session.add(term)
+    upsert_terms(vocab.id, extract_terms(graph))
     
     db.session.commit()
     return vocab
 
 
-def update_vocabulary_from_graph(vocab_id, graph, add_new=True, update_existing=True):
+def _apply_vocabulary_info(vocab, vocab_info):
+    vocab.code = vocab_info.get('code') or 'imported'
+    vocab.name = vocab_info.get('name') or 'Imported Vocabulary'
+    vocab.name_en = vocab_info.get('name_en')
+    vocab.description = vocab_info.get('description')
+    vocab.description_en = vocab_info.get('description_en')
+    vocab.base_uri = vocab_info.get('uri')
+
+
+def _new_vocabulary(vocab_info):
+    """Add a Vocabulary built from extracted metadata and flush it to get its id."""
+    vocab = Vocabulary()
+    _apply_vocabulary_info(vocab, vocab_info)
+    db.session.add(vocab)
+    db.session.flush()  # Get vocab.id
+    return vocab
+
+
+def update_vocabulary_from_graph(vocab_id, graph, add_new=True, update_existing=True,
+                                 dry_run=False, report=None):
     """
     Update an existing Vocabulary with terms from parsed RDF graph.
     
@@ -239,85 +191,332 @@ def update_vocabulary_from_graph(vocab_id, graph, add_new=True, update_existing=
         graph: rdflib.Graph with vocabulary data
         add_new: Whether to add new concepts not in the vocabulary
         update_existing: Whether to update existing concepts
+        dry_run: Only diff the graph against the vocabulary, writing nothing
+        report: Optional bulk.DiffReport to fill in
     
     Returns:
-        dict with stats: {'added': int, 'updated': int, 'skipped': int}
+        dict with stats: {'added': int, 'updated': int, 'unchanged': int, 'skipped': int}
     """
     vocab = Vocabulary.query.get(vocab_id)
     if not vocab:
         return None
     
-    # Get existing terms by concept_id
-    existing_terms = {t.concept_id: t for t in Term.query.filter_by(vocab_id=vocab_id).all()}
+    stats = upsert_terms(
+        vocab_id, extract_terms(graph),
+        add_new=add_new, update_existing=update_existing,
+        dry_run=dry_run, report=report
+    )
+    if report is not None:
+        report.finish(vocab_id)
     
-    # Extract terms from graph
-    terms_data = extract_terms(graph)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return stats
+
+
+def _import_records(records, vocab, new_vocabulary_info, add_new, update_existing,
+                    chunk_size, progress, dry_run, report):
+    """
+    Hand term dicts to the bulk writer in chunks of chunk_size.
     
-    stats = {'added': 0, 'updated': 0, 'skipped': 0}
+    When vocab is None, a vocabulary is created before the first write from
+    new_vocabulary_info(first_record).
     
-    for term_data in terms_data:
-        concept_id = term_data['concept_id']
-        
-        if concept_id in existing_terms:
-            if update_existing:
-                # Update existing term
-                term = existing_terms[concept_id]
-                term.pref_label_es = term_data['pref_label_es'] or term.pref_label_es
-                term.pref_label_en = term_data['pref_label_en'] or term.pref_label_en
-                term.definition_es = term_data['definition_es'] or term.definition_es
-                term.definition_en = term_data['definition_en'] or term.definition_en
-                if term_data['alt_labels']:
-                    term.alt_labels = term_data['alt_labels']
-                if term_data['broader']:
-                    term.broader = term_data['broader']
-                if term_data['narrower']:
-                    term.narrower = term_data['narrower']
-                if term_data['related']:
-                    term.related = term_data['related']
-                if term_data['exact_match']:
-                    term.exact_match = term_data['exact_match']
-                if term_data['close_match']:
-                    term.close_match = term_data['close_match']
-                if term_data['source']:
-                    term.source = term_data['source']
-                stats['updated'] += 1
-            else:
-                stats['skipped'] += 1
-        else:
-            if add_new:
-                # Create new term
-                term = Term(
-                    vocab_id=vocab_id,
-                    concept_id=concept_id,
-                    pref_label_es=term_data['pref_label_es'],
-                    pref_label_en=term_data['pref_label_en'],
-                    definition_es=term_data['definition_es'],
-                    definition_en=term_data['definition_en'],
-                    alt_labels=term_data['alt_labels'] if term_data['alt_labels'] else None,
-                    broader=term_data['broader'] if term_data['broader'] else None,
-                    narrower=term_data['narrower'] if term_data['narrower'] else None,
-                    related=term_data['related'] if term_data['related'] else None,
-                    exact_match=term_data['exact_match'] if term_data['exact_match'] else None,
-                    close_match=term_data['close_match'] if term_data['close_match'] else None,
-                    source=term_data['source']
-                )
-                db.session.add(term)
-                stats['added'] += 1
-            else:
-                stats['skipped'] += 1
+    Returns:
+        (Vocabulary or None if there were no records, stats dict)
+    """
+    pending = []
+    stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
     
-    db.session.commit()
-    return stats
+    def flush():
+        nonlocal vocab
+        if vocab is None:
+            vocab = _new_vocabulary(new_vocabulary_info(pending[0]))
+        written = upsert_terms(vocab.id, pending, add_new=add_new, update_existing=update_existing,
+                               dry_run=dry_run, report=report)
+        for key, value in written.items():
+            stats[key] += value
+        pending.clear()
+        if progress:
+            progress(stats)
+    
+    for record in records:
+        pending.append(record)
+        if len(pending) >= chunk_size:
+            flush()
+    if pending:
+        flush()
+    return vocab, stats
 
 
-def detect_format(filename):
-    """Detect RDF format from filename extension."""
-    filename = filename.lower()
-    if filename.endswith('.ttl'):
-        return 'turtle'
-    elif filename.endswith('.jsonld') or filename.endswith('.json'):
-        return 'json-ld'
-    elif filename.endswith('.rdf') or filename.endswith('.xml'):
-        return 'xml'
+def _finish_import(vocab, dry_run, report):
+    if report is not None:
+        report.finish(vocab.id)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+
+
+def import_stream(fileobj, format, vocab_id=None, add_new=True, update_existing=True,
+                  chunk_size=STREAM_CHUNK_SIZE, progress=None, dry_run=False, report=None):
+    """
+    Import an RDF/XML or N-Triples file block by block, without building a Graph.
+    
+    Concepts are handed to the bulk writer in chunks, so memory use does not
+    depend on the size of the file. A new vocabulary is created lazily, from
+    the ConceptScheme or, if the first chunk comes before it, from the
+    concepts' namespace (fixed up once the scheme has been read).
+    
+    Args:
+        fileobj: Binary file object
+        format: One of STREAMING_FORMATS
+        vocab_id: Vocabulary to update, or None to create a new one
+        add_new: Whether to add new concepts (updates only)
+        update_existing: Whether to update existing concepts (updates only)
+        chunk_size: Concepts per bulk write
+        progress: Optional callable, given the running stats dict after each chunk
+        dry_run: Only diff the file against the vocabulary (updates only)
+        report: Optional bulk.DiffReport to fill in
+    
+    Returns:
+        (Vocabulary, stats dict), or (None, None) if there is nothing to import
+        or the vocabulary to update does not exist
+    """
+    if dry_run and vocab_id is None:
+        raise ValueError('A dry run needs a vocabulary to compare against.')
+    if vocab_id is None:
+        add_new = update_existing = True  # The merge options only apply to updates
+    vocab = None
+    if vocab_id is not None:
+        vocab = Vocabulary.query.get(vocab_id)
+        if not vocab:
+            return None, None
+    
+    scheme_info = None
+    
+    def concepts():
+        nonlocal scheme_info
+        blocks = BLOCK_READERS[format](fileobj)
+        for subject, pairs in iter_subject_blocks(blocks, grouped=format in GROUPED_READERS):
+            records = {}
+            for predicate, obj in pairs:
+                skos_reader.add_triple(records, subject, predicate, obj)
+            record = records.get(subject)
+            if record is None:
+                continue
+            if skos_reader.is_scheme(record):
+                scheme_info = skos_reader.build_scheme_info(subject, record)
+            elif skos_reader.is_concept(record) and isinstance(subject, URIRef):
+                yield skos_reader.build_term(subject, record)
+    
+    vocab, stats = _import_records(
+        concepts(), vocab,
+        lambda first: scheme_info or _inferred_vocabulary_info(first['uri']),
+        add_new, update_existing, chunk_size, progress, dry_run, report
+    )
+    if vocab is None:
+        if scheme_info is None:
+            return None, None
+        vocab = _new_vocabulary(scheme_info)
+    elif vocab_id is None and scheme_info:
+        # The scheme came after the first chunk of concepts
+        _apply_vocabulary_info(vocab, scheme_info)
+    
+    _finish_import(vocab, dry_run, report)
+    return vocab, stats
+
+
+def import_table(fileobj, format, vocab_id=None, add_new=True, update_existing=True,
+                 chunk_size=STREAM_CHUNK_SIZE, progress=None, dry_run=False, report=None,
+                 filename=None, column_map=None):
+    """
+    Import a CSV or XLSX thesaurus row by row (see app.services.tabular).
+    
+    Args:
+        fileobj: Binary file object
+        format: One of TABULAR_FORMATS
+        vocab_id ... report: See import_stream
+        filename: Original file name, used to name a new vocabulary
+        column_map: Optional {header: field spec} mapping (see tabular.parse_header)
+    
+    Returns:
+        (Vocabulary, stats dict), or (None, None) if the file has no concepts
+        or the vocabulary to update does not exist
+    
+    Raises:
+        ValueError: if the file has no header row or no ID column
+    """
+    if dry_run and vocab_id is None:
+        raise ValueError('A dry run needs a vocabulary to compare against.')
+    if vocab_id is None:
+        add_new = update_existing = True  # The merge options only apply to updates
+    vocab = None
+    if vocab_id is not None:
+        vocab = Vocabulary.query.get(vocab_id)
+        if not vocab:
+            return None, None
+    
+    vocab, stats = _import_records(
+        iter_tabular_terms(fileobj, format, column_map), vocab,
+        lambda first: tabular_vocabulary_info(filename),
+        add_new, update_existing, chunk_size, progress, dry_run, report
+    )
+    if vocab is None:
+        return None, None
+    
+    _finish_import(vocab, dry_run, report)
+    return vocab, stats
+
+
+def import_file(path, format, vocab_id=None, add_new=True, update_existing=True, progress=None,
+                dry_run=False, report=None, filename=None):
+    """
+    Import a vocabulary file from disk, streaming it when the format allows.
+    
+    .gz and .bz2 files (by the suffix of filename, or of path) are
+    decompressed as they are read; zip archives go through import_archive.
+    
+    Args:
+        path: Path of the (spooled) file
+        format: Format from detect_format()
+        vocab_id: Vocabulary to update, or None to create a new one
+        add_new, update_existing: See update_vocabulary_from_graph
+        progress: See import_stream (called once at the end for graph formats)
+        dry_run, report: See import_stream
+        filename: Original file name (names vocabularies created from tables)
+    
+    Returns:
+        (Vocabulary or None, stats dict or None)
+    
+    Raises:
+        ValueError: if the file cannot be parsed or decompressed
+    """
+    try:
+        with open_source(path, filename) as f:
+            return import_fileobj(f, format, vocab_id, add_new, update_existing, progress=progress,
+                                  dry_run=dry_run, report=report,
+                                  filename=strip_compression(filename or path)[0])
+    except (OSError, EOFError) as e:  # Corrupt or truncated .gz/.bz2 data
+        db.session.rollback()
+        raise ValueError(str(e)) from e
+
+
+def import_fileobj(fileobj, format, vocab_id=None, add_new=True, update_existing=True, progress=None,
+                   dry_run=False, report=None, filename=None):
+    """
+    Import a vocabulary from a binary file object (see import_file).
+    
+    Raises:
+        ValueError: if the file cannot be parsed
+    """
+    if format in STREAMING_FORMATS:
+        try:
+            return import_stream(fileobj, format, vocab_id, add_new, update_existing, progress=progress,
+                                 dry_run=dry_run, report=report)
+        except RepeatedSubjectError:
+            # Descriptions of a subject are spread over the file: only a graph parse merges them
+            db.session.rollback()
+            if not fileobj.seekable():
+                raise
+            fileobj.seek(0)
+            if report is not None:
+                report.reset()
+        except SyntaxError as e:  # xml.etree.ElementTree.ParseError
+            db.session.rollback()
+            raise ValueError(str(e)) from e
+        except ValueError:
+            db.session.rollback()
+            raise
+    
+    if format in TABULAR_FORMATS:
+        try:
+            return import_table(fileobj, format, vocab_id, add_new, update_existing, progress=progress,
+                                dry_run=dry_run, report=report, filename=filename)
+        except ValueError:  # Includes UnicodeDecodeError
+            db.session.rollback()
+            raise
+    
+    if dry_run and vocab_id is None:
+        raise ValueError('A dry run needs a vocabulary to compare against.')
+    graph = Graph()
+    try:
+        graph.parse(source=fileobj, format=format)
+    except Exception as e:
+        raise ValueError(str(e)) from e
+    if vocab_id is None:
+        vocab = create_vocabulary_from_graph(graph)
+        stats = {'added': Term.query.filter_by(vocab_id=vocab.id).count(), 'updated': 0,
+                 'unchanged': 0, 'skipped': 0}
     else:
-        return 'xml'  # Default to RDF/XML
+        vocab = Vocabulary.query.get(vocab_id)
+        stats = update_vocabulary_from_graph(
+            vocab_id, graph, add_new=add_new, update_existing=update_existing,
+            dry_run=dry_run, report=report
+        )
+    if progress and stats:
+        progress(stats)
+    return vocab, stats
+
+
+def import_archive(path, vocab_id=None, add_new=True, update_existing=True, progress=None,
+                   dry_run=False, report=None):
+    """
+    Import every vocabulary file of a zip archive, streaming each member.
+    
+    Each member is imported in its own transaction, so one bad file does
+    not undo the others. Updating (and dry runs) needs an archive with a
+    single vocabulary file.
+    
+    Args:
+        path: Path of the (spooled) zip file
+        vocab_id ... report: See import_file
+        progress: Called with the running stats summed over all members
+    
+    Returns:
+        list of dicts with 'name', 'vocab' (or None), 'stats' (or None) and 'error' (or None)
+    
+    Raises:
+        ValueError: if the file is not a zip archive or holds no vocabulary file
+    """
+    totals = {'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    results = []
+    with open_archive(path) as archive:
+        members = archive_members(archive, FILE_FORMATS)
+        if not members:
+            raise ValueError('The archive holds no vocabulary files.')
+        if vocab_id is not None and len(members) > 1:
+            raise ValueError('Only an archive with a single file can update a vocabulary.')
+        
+        for info, format in members:
+            done = dict(totals)
+            
+            def member_progress(stats):
+                if progress:
+                    progress({key: done[key] + stats.get(key, 0) for key in totals})
+            
+            result = {'name': info.filename, 'vocab': None, 'stats': None, 'error': None}
+            try:
+                # import_fileobj commits each member, or rolls it back on error,
+                # so a failure only undoes this member
+                with open_member(archive, info) as f:
+                    result['vocab'], result['stats'] = import_fileobj(
+                        f, format, vocab_id, add_new, update_existing, progress=member_progress,
+                        dry_run=dry_run, report=report, filename=strip_compression(info.filename)[0]
+                    )
+            except (ValueError, OSError, EOFError, SQLAlchemyError) as e:
+                db.session.rollback()
+                result['error'] = str(e)
+            if result['stats']:
+                for key in totals:
+                    totals[key] += result['stats'].get(key, 0)
+            results.append(result)
+    return results
+
+
+def detect_format(filename):
+    """Detect the RDF, tabular or archive format from the filename extension (.gz/.bz2 are looked through)."""
+    name, _ = strip_compression(filename.lower())
+    return FILE_FORMATS.get(os.path.splitext(name)[1], 'xml')  # Default to RDF/XML
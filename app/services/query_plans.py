@@ -0,0 +1,230 @@
+"""EXPLAIN checks for the hot queries.
+
+HOT_QUERIES mirrors the queries the editor, admin, export and hierarchy code
+run on every request. ``flask check-query-plans`` explains each of them with
+sequential scans discouraged (``enable_seqscan = off``): the planner then
+uses an index whenever one can answer the query, so a Seq Scan left in a
+plan means no index matches it, whatever the size of the tables. Run it
+after changing a hot query or the indexes (migrations/versions).
+
+Requires PostgreSQL.
+"""
+import json
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+from app.models import (
+    db, Term, TermRelation, ConceptClosure, ConceptNode, ChangeRequest, ImportJob, VocabularyStats
+)
+from app.services.hierarchy import subtree_concept_ids
+from app.services import relations
+from app.services.vocab_stats import stats_row
+from app.services.search import search_facets, search_matches, search_results
+
+# Placeholder parameters; plans do not depend on the rows existing
+SAMPLE_VOCAB_ID = 1
+SAMPLE_CONCEPT_ID = 'C1'
+SAMPLE_USER_ID = 1
+SAMPLE_TERM_ID = 1
+SAMPLE_SEARCH = 'temperatura del agua'
+
+
+def _vocabulary_stats():
+    # vocab_stats.vocabulary_stats (vocabulary list, home page) on cache misses
+    return select(VocabularyStats).where(VocabularyStats.vocab_id.in_([SAMPLE_VOCAB_ID]))
+
+
+def _stats_refresh():
+    # vocab_stats.refresh_stats (bootstrap, new vocabularies, hard deletes)
+    return stats_row(SAMPLE_VOCAB_ID)
+
+
+def _pending_by_vocab():
+    # vocab_stats.pending_requests (vocabulary list)
+    return (select(ChangeRequest.vocab_id, func.count())
+            .where(ChangeRequest.status == 'pending')
+            .group_by(ChangeRequest.vocab_id))
+
+
+def _live_terms():
+    # routes.vocab.view_vocab
+    return (select(Term).where(Term.vocab_id == SAMPLE_VOCAB_ID, Term.deleted_at.is_(None))
+            .order_by(Term.concept_id))
+
+
+def _concept_lookup():
+    # routes.vocab.add_term, routes.sparql resolver, bulk._stored_rows
+    return select(Term).where(Term.vocab_id == SAMPLE_VOCAB_ID, Term.concept_id == SAMPLE_CONCEPT_ID)
+
+
+def _approved_terms():
+    # export.iter_term_rows, sparql_store
+    return (select(Term.concept_id, Term.pref_label_es)
+            .where(Term.vocab_id == SAMPLE_VOCAB_ID, Term.status == 'approved')
+            .order_by(Term.concept_id))
+
+
+def _narrower_of():
+    # hierarchy: children through broader containment
+    return select(Term.concept_id).where(Term.broader.contains(func.jsonb_build_array(SAMPLE_CONCEPT_ID)))
+
+
+def _referencing_narrower():
+    return select(Term.concept_id).where(Term.narrower.contains(func.jsonb_build_array(SAMPLE_CONCEPT_ID)))
+
+
+def _referencing_related():
+    return select(Term.concept_id).where(Term.related.contains(func.jsonb_build_array(SAMPLE_CONCEPT_ID)))
+
+
+def _subtree():
+    # hierarchy.subtree_concept_ids (export ?root=), closure.subtree
+    return subtree_concept_ids(SAMPLE_VOCAB_ID, SAMPLE_CONCEPT_ID, 3)
+
+
+def _relation_walk():
+    # relations.descendants / ancestors
+    return text(relations.WALK_SQL).bindparams(
+        vocab_id=SAMPLE_VOCAB_ID, concept_id=SAMPLE_CONCEPT_ID,
+        forward=relations.NARROWER, backward=relations.BROADER, max_depth=relations.MAX_DEPTH
+    )
+
+
+def _relation_neighbours():
+    # relations.neighbours (term page)
+    return text(relations.NEIGHBOURS_SQL).bindparams(vocab_id=SAMPLE_VOCAB_ID, concept_id=SAMPLE_CONCEPT_ID)
+
+
+def _referencing_terms():
+    # relations.referencing
+    return select(TermRelation.source).where(
+        TermRelation.vocab_id == SAMPLE_VOCAB_ID, TermRelation.target == SAMPLE_CONCEPT_ID
+    )
+
+
+def _closure_ancestors():
+    # closure.ancestors (term page breadcrumbs)
+    return (select(ConceptClosure.ancestor, ConceptClosure.depth)
+            .where(ConceptClosure.vocab_id == SAMPLE_VOCAB_ID, ConceptClosure.descendant == SAMPLE_CONCEPT_ID,
+                   ConceptClosure.depth > 0))
+
+
+def _concept_nodes():
+    # closure.node_stats (tree view)
+    return select(ConceptNode).where(ConceptNode.vocab_id == SAMPLE_VOCAB_ID)
+
+
+def _search_matches():
+    # search.search (ranked matches, for facets, total and page)
+    return search_matches('postgresql', SAMPLE_SEARCH)
+
+
+def _search_vocab_matches():
+    # search.search (vocabulary filter on a truncated search)
+    return search_matches('postgresql', SAMPLE_SEARCH, SAMPLE_VOCAB_ID)
+
+
+def _search_facets():
+    # search.search (facet vocabularies)
+    return search_facets([SAMPLE_VOCAB_ID])
+
+
+def _search_results():
+    # search.search (terms of the result page)
+    return search_results([(SAMPLE_VOCAB_ID, SAMPLE_CONCEPT_ID)])
+
+
+def _pending_requests():
+    # routes.admin.dashboard
+    return (select(ChangeRequest).where(ChangeRequest.status == 'pending')
+            .order_by(ChangeRequest.created_at.desc()))
+
+
+def _term_requests():
+    # Foreign key checks when a term is removed
+    return select(ChangeRequest.id).where(ChangeRequest.term_id == SAMPLE_TERM_ID)
+
+
+def _recent_imports():
+    # routes.vocab.import_vocab
+    return (select(ImportJob).where(ImportJob.user_id == SAMPLE_USER_ID)
+            .order_by(ImportJob.created_at.desc()).limit(10))
+
+
+# name -> statement builder
+HOT_QUERIES = {
+    'vocab_stats.read': _vocabulary_stats,
+    'vocab_stats.refresh': _stats_refresh,
+    'vocab_stats.pending_requests': _pending_by_vocab,
+    'view_vocab.live_terms': _live_terms,
+    'term.concept_lookup': _concept_lookup,
+    'export.approved_terms': _approved_terms,
+    'hierarchy.narrower_of': _narrower_of,
+    'relations.narrower': _referencing_narrower,
+    'relations.related': _referencing_related,
+    'hierarchy.subtree': _subtree,
+    'term_relations.walk': _relation_walk,
+    'term_relations.neighbours': _relation_neighbours,
+    'term_relations.referencing': _referencing_terms,
+    'closure.ancestors': _closure_ancestors,
+    'closure.nodes': _concept_nodes,
+    'search.matches': _search_matches,
+    'search.vocab_matches': _search_vocab_matches,
+    'search.facets': _search_facets,
+    'search.results': _search_results,
+    'admin.pending_requests': _pending_requests,
+    'admin.term_requests': _term_requests,
+    'import.recent_jobs': _recent_imports,
+}
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def explain(statement):
+    """
+    Return the JSON plan of a statement with sequential scans discouraged.
+
+    The setting is local to a transaction of its own, which is rolled back.
+    """
+    # Named paramstyle: no %-escaping, as the SQL is wrapped in text() again
+    dialect = postgresql.dialect(paramstyle='named')
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as connection:
+        connection.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+        connection.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def check_query_plans(queries=None):
+    """
+    EXPLAIN the hot queries and report the ones that scan a table sequentially.
+
+    Args:
+        queries: {name: statement builder} (default: HOT_QUERIES)
+
+    Returns:
+        list of dicts with name, ok, indexes (index names used) and
+        seq_scans (tables scanned sequentially)
+
+    Raises:
+        RuntimeError: if the database is not PostgreSQL
+    """
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError('Query plan checks require PostgreSQL')
+    results = []
+    for name, build in (queries or HOT_QUERIES).items():
+        nodes = list(_plan_nodes(explain(build())))
+        seq_scans = sorted({node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'})
+        results.append({
+            'name': name,
+            'ok': not seq_scans,
+            'indexes': sorted({node['Index Name'] for node in nodes if 'Index Name' in node}),
+            'seq_scans': seq_scans,
+        })
+    return results
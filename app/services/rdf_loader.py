@@ -1,185 +1,234 @@
-"""RDF Loader service - Import RDF files into the database."""
+"""RDF Loader service - Import RDF files into the database.
+
+``flask import-rdf`` parses the reference files in a process pool (parsing
+needs no database) and writes the results from the main process, one file
+per transaction. A SHA-256 of every imported file is kept in SourceFile so
+unchanged files are skipped on the next run.
+"""
+import hashlib
+import multiprocessing
 import os
-from rdflib import Graph, Namespace, RDF, SKOS, URIRef, Literal
-from app.models import db, Vocabulary, Term
-from flask import current_app
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from app.models import db, Vocabulary, SourceFile
+from app.services.bulk import upsert_terms, OVERWRITE
+from app.services import skos_reader
+from app.services.rdf_stream import iter_rdfxml_blocks
 
 
-def load_rdf_file(file_path):
-    """Load a single RDF file and import its contents."""
-    g = Graph()
-    g.parse(file_path)
-    
-    # Find the ConceptScheme (Vocabulary)
-    scheme_node = None
-    for s, p, o in g.triples((None, RDF.type, SKOS.ConceptScheme)):
-        scheme_node = s
-        break
-    
-    if not scheme_node:
-        print(f"No ConceptScheme found in {file_path}")
-        return
+def file_sha256(file_path):
+    """Return the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # Extract Vocab Metadata (with language support)
-    DC = Namespace("http://purl.org/dc/elements/1.1/")
-    
-    # Get vocab names by language
-    vocab_name = None
-    vocab_name_en = None
-    for label in g.objects(scheme_node, SKOS.prefLabel):
-        if hasattr(label, 'language'):
-            if label.language == 'es':
-                vocab_name = str(label)
-            elif label.language == 'en':
-                vocab_name_en = str(label)
-        elif not vocab_name:  # Fallback for labels without language
-            vocab_name = str(label)
-    
-    # Fallback to DC title if no prefLabel
-    if not vocab_name:
-        for title in g.objects(scheme_node, DC.title):
-            if hasattr(title, 'language'):
-                if title.language == 'es':
-                    vocab_name = str(title)
-                elif title.language == 'en':
-                    vocab_name_en = str(title)
-            elif not vocab_name:
-                vocab_name = str(title)
-    
-    # Get vocab descriptions by language
-    vocab_desc = None
-    vocab_desc_en = None
-    for desc in g.objects(scheme_node, SKOS.definition):
-        if hasattr(desc, 'language'):
-            if desc.language == 'es':
-                vocab_desc = str(desc)
-            elif desc.language == 'en':
-                vocab_desc_en = str(desc)
-        elif not vocab_desc:
-            vocab_desc = str(desc)
-    
-    # Fallback to DC description
-    if not vocab_desc:
-        for desc in g.objects(scheme_node, DC.description):
-            if hasattr(desc, 'language'):
-                if desc.language == 'es':
-                    vocab_desc = str(desc)
-                elif desc.language == 'en':
-                    vocab_desc_en = str(desc)
-            elif not vocab_desc:
-                vocab_desc = str(desc)
-    
-    # Generate a code from filename or URI if not present
-    filename = os.path.basename(file_path)
-    vocab_code = filename.replace('.rdf', '').replace(' ', '_').upper()
+
+def vocabulary_code_for(file_path):
+    """Vocabulary code of a reference file, e.g. data/RDF/geografias.rdf -> GEOGRAFIAS."""
+    return os.path.basename(file_path).replace('.rdf', '').replace(' ', '_').upper()
+
+
+def parse_rdf_source(file_path):
+    """
+    Parse an RDF/XML file into plain (picklable) data, without touching the database.
     
-    # Check if exists
+    All the records are kept until the end, so the descriptions of a subject
+    spread over several node elements are merged, as in a graph parse.
+
+    Returns:
+        dict with 'path', 'code', 'scheme' (vocabulary info or None),
+        'records' (term dicts) and 'parse_seconds'
+    """
+    start = time.perf_counter()
+    grouped = {}
+    with open(file_path, 'rb') as f:
+        for subject, pairs in iter_rdfxml_blocks(f):
+            for predicate, obj in pairs:
+                skos_reader.add_triple(grouped, subject, predicate, obj)
+    scheme = None
+    records = []
+    for subject, record in grouped.items():
+        if skos_reader.is_scheme(record):
+            if scheme is None:
+                scheme = skos_reader.build_scheme_info(subject, record)
+        elif skos_reader.is_concept(record):
+            records.append(skos_reader.build_term(subject, record))
+    return {
+        'path': file_path,
+        'code': vocabulary_code_for(file_path),
+        'scheme': scheme,
+        'records': records,
+        'parse_seconds': time.perf_counter() - start,
+    }
+
+
+def store_parsed_source(parsed):
+    """
+    Write a parsed file (see parse_rdf_source) to the database and commit.
+
+    Returns:
+        The Vocabulary, or None if the file has no ConceptScheme
+    """
+    scheme = parsed['scheme']
+    if not scheme:
+        print(f"No ConceptScheme found in {parsed['path']}")
+        return None
+
+    vocab_code = parsed['code']
     vocab = Vocabulary.query.filter_by(code=vocab_code).first()
     if not vocab:
         vocab = Vocabulary(
             code=vocab_code,
-            name=vocab_name or vocab_code,
-            name_en=vocab_name_en,
-            description=vocab_desc or '',
-            description_en=vocab_desc_en,
-            base_uri=str(scheme_node)
+            name=scheme['name'] or vocab_code,
+            name_en=scheme['name_en'],
+            description=scheme['description'] or '',
+            description_en=scheme['description_en'],
+            base_uri=scheme['uri']
         )
         db.session.add(vocab)
-        db.session.commit()
+        db.session.flush()
         print(f"Created Vocabulary: {vocab.name}")
     else:
         print(f"Updating Vocabulary: {vocab.name}")
-        vocab.name = vocab_name or vocab.name
-        vocab.name_en = vocab_name_en or vocab.name_en
-        vocab.description = vocab_desc or vocab.description
-        vocab.description_en = vocab_desc_en or vocab.description_en
-        vocab.base_uri = str(scheme_node)
-        db.session.commit()
-
-    # Extract Concepts (Terms)
-    for s, p, o in g.triples((None, RDF.type, SKOS.Concept)):
-        if s == scheme_node:
-            continue
-            
-        concept_id = str(s).split('/')[-1]
-        
-        # Labels (ES/EN)
-        pref_label_es = None
-        pref_label_en = None
-        for label in g.objects(s, SKOS.prefLabel):
-            if label.language == 'es':
-                pref_label_es = str(label)
-            elif label.language == 'en':
-                pref_label_en = str(label)
-        
-        # Definitions
-        definition_es = None
-        definition_en = None
-        for definition in g.objects(s, SKOS.definition):
-            if definition.language == 'es':
-                definition_es = str(definition)
-            elif definition.language == 'en':
-                definition_en = str(definition)
-
-        # Broader/Narrower/Related
-        broader_list = [str(broader).split('/')[-1] for broader in g.objects(s, SKOS.broader)]
-        narrower_list = [str(narrower).split('/')[-1] for narrower in g.objects(s, SKOS.narrower)]
-        related_list = [str(related).split('/')[-1] for related in g.objects(s, SKOS.related)]
-            
-        # Alt Labels
-        alt_labels = [{'label': str(alt), 'lang': alt.language} for alt in g.objects(s, SKOS.altLabel)]
-        
-        # External matches
-        exact_match_list = [str(match) for match in g.objects(s, SKOS.exactMatch)]
-        close_match_list = [str(match) for match in g.objects(s, SKOS.closeMatch)]
-        
-        # Source (dc:source)
-        source = None
-        for src in g.objects(s, DC.source):
-            source = str(src)
-            break  # Take only the first source
-
-        # Check if term exists
-        term = Term.query.filter_by(vocab_id=vocab.id, concept_id=concept_id).first()
-        if not term:
-            term = Term(
-                vocab_id=vocab.id,
-                concept_id=concept_id,
-                pref_label_es=pref_label_es,
-                pref_label_en=pref_label_en,
-                definition_es=definition_es,
-                definition_en=definition_en,
-                broader=broader_list,
-                narrower=narrower_list,
-                related=related_list,
-                alt_labels=alt_labels,
-                exact_match=exact_match_list,
-                close_match=close_match_list,
-                source=source,
-                status='approved'
-            )
-            db.session.add(term)
-        else:
-            term.pref_label_es = pref_label_es
-            term.pref_label_en = pref_label_en
-            term.definition_es = definition_es
-            term.definition_en = definition_en
-            term.broader = broader_list
-            term.narrower = narrower_list
-            term.related = related_list
-            term.alt_labels = alt_labels
-            term.exact_match = exact_match_list
-            term.close_match = close_match_list
-            term.source = source
-    
+        vocab.name = scheme['name'] or vocab.name
+        vocab.name_en = scheme['name_en'] or vocab.name_en
+        vocab.description = scheme['description'] or vocab.description
+        vocab.description_en = scheme['description_en'] or vocab.description_en
+        vocab.base_uri = scheme['uri']
+
+    stats = upsert_terms(vocab.id, parsed['records'], mode=OVERWRITE)
+    db.session.commit()
+    print(f"Imported terms for {vocab.name}: {stats['added']} added, "
+          f"{stats['updated']} updated, {stats['unchanged']} unchanged")
+    return vocab
+
+
+def load_rdf_file(file_path):
+    """Load a single RDF file and import its contents."""
+    return store_parsed_source(parse_rdf_source(file_path))
+
+
+def _source_for(file_path):
+    return SourceFile.query.filter_by(filename=os.path.basename(file_path)).first()
+
+
+def _is_unchanged(file_path, sha256):
+    source = _source_for(file_path)
+    return (source is not None and source.sha256 == sha256
+            and source.vocab_id is not None and Vocabulary.query.get(source.vocab_id) is not None)
+
+
+def _record_source(file_path, sha256, vocab):
+    source = _source_for(file_path)
+    if source is None:
+        source = SourceFile(filename=os.path.basename(file_path))
+        db.session.add(source)
+    source.sha256 = sha256
+    source.vocab_id = vocab.id
+    source.imported_at = datetime.utcnow()
     db.session.commit()
-    print(f"Imported terms for {vocab.name}")
 
 
-def import_all_rdf(directory):
-    """Import all RDF files from a directory."""
-    for filename in os.listdir(directory):
-        if filename.endswith(".rdf"):
-            file_path = os.path.join(directory, filename)
-            print(f"Processing {file_path}...")
-            load_rdf_file(file_path)
+def rdf_paths(directory):
+    """Sorted paths of the .rdf files in a directory."""
+    return sorted(
+        os.path.join(directory, filename) for filename in os.listdir(directory)
+        if filename.endswith(".rdf")
+    )
+
+
+def iter_parsed_sources(paths, workers=None):
+    """
+    Parse RDF files concurrently, yielding each as soon as it is parsed.
+
+    Args:
+        paths: RDF/XML file paths
+        workers: Parser processes (default: CPU count; 1 parses in-process)
+
+    Yields:
+        (path, parsed dict from parse_rdf_source or None, exception or None)
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) <= 1:
+        for file_path in paths:
+            try:
+                parsed = parse_rdf_source(file_path)
+            except Exception as e:
+                yield file_path, None, e
+            else:
+                yield file_path, parsed, None
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(paths)),
+        mp_context=multiprocessing.get_context('spawn')
+    ) as executor:
+        futures = {executor.submit(parse_rdf_source, file_path): file_path for file_path in paths}
+        for future in as_completed(futures):
+            try:
+                parsed = future.result()
+            except Exception as e:
+                yield futures[future], None, e
+            else:
+                yield futures[future], parsed, None
+
+
+def import_all_rdf(directory, workers=None, force=False):
+    """
+    Import all RDF files from a directory.
+
+    Args:
+        directory: Directory with .rdf files
+        workers: Parser processes (default: CPU count; 1 parses in-process)
+        force: Re-import files whose content hash has not changed
+
+    Returns:
+        list of per-file result dicts with file, status (imported, unchanged,
+        skipped or failed), concepts, parse_seconds, write_seconds and error
+    """
+    paths = rdf_paths(directory)
+    results = {}
+    hashes = {}
+    pending = []
+    for file_path in paths:
+        hashes[file_path] = file_sha256(file_path)
+        if not force and _is_unchanged(file_path, hashes[file_path]):
+            results[file_path] = {'file': os.path.basename(file_path), 'status': 'unchanged'}
+        else:
+            pending.append(file_path)
+
+    def failed(file_path, error):
+        results[file_path] = {'file': os.path.basename(file_path), 'status': 'failed', 'error': str(error)}
+
+    def store(parsed):
+        # Writes happen here, in this process only, one file per transaction
+        file_path = parsed['path']
+        print(f"Processing {file_path}...")
+        start = time.perf_counter()
+        result = {
+            'file': os.path.basename(file_path),
+            'concepts': len(parsed['records']),
+            'parse_seconds': parsed['parse_seconds'],
+        }
+        try:
+            vocab = store_parsed_source(parsed)
+            if vocab is not None:
+                _record_source(file_path, hashes[file_path], vocab)
+        except Exception as e:
+            db.session.rollback()
+            result.update(status='failed', error=str(e))
+        else:
+            result['status'] = 'imported' if vocab is not None else 'skipped'
+        result['write_seconds'] = time.perf_counter() - start
+        results[file_path] = result
+
+    for file_path, parsed, error in iter_parsed_sources(pending, workers):
+        if error is not None:
+            failed(file_path, error)
+        else:
+            store(parsed)
+
+    return [results[file_path] for file_path in paths]
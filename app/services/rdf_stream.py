@@ -0,0 +1,301 @@
+"""Incremental RDF/XML and N-Triples readers.
+
+Both readers take a binary file object and yield ``(subject, [(predicate,
+object), ...])`` blocks as rdflib terms: one block per node element
+(RDF/XML) or per subject (N-Triples, after an external sort). Only the
+current block is kept in memory, so the readers can feed skos_reader
+records into the bulk writer for files of any size. A subject described by
+several RDF/XML node elements yields several blocks; iter_subject_blocks
+merges consecutive ones and reports a subject that comes back later.
+
+The RDF/XML reader covers the striped syntax our exports and the data/RDF
+files use: typed or rdf:Description node elements, property attributes,
+rdf:resource / rdf:nodeID / rdf:datatype / xml:lang, nested node elements
+and xml:base. Property elements with rdf:parseType are skipped.
+"""
+import heapq
+import io
+import re
+import tempfile
+from urllib.parse import urljoin
+from xml.etree.ElementTree import iterparse
+from rdflib import URIRef, BNode, Literal
+
+RDF_NS = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+_RDF_RDF = f'{{{RDF_NS}}}RDF'
+_RDF_DESCRIPTION = f'{{{RDF_NS}}}Description'
+_RDF_TYPE = URIRef(RDF_NS + 'type')
+_ABOUT = f'{{{RDF_NS}}}about'
+_ID = f'{{{RDF_NS}}}ID'
+_NODE_ID = f'{{{RDF_NS}}}nodeID'
+_RESOURCE = f'{{{RDF_NS}}}resource'
+_DATATYPE = f'{{{RDF_NS}}}datatype'
+_PARSE_TYPE = f'{{{RDF_NS}}}parseType'
+_LANG = f'{{{XML_NS}}}lang'
+_BASE = f'{{{XML_NS}}}base'
+
+# Attributes that never become property attributes of a node element
+_SYNTAX_ATTRIBUTES = {_ABOUT, _ID, _NODE_ID, _RESOURCE, _DATATYPE, _PARSE_TYPE, _LANG, _BASE}
+
+
+def _uri(tag):
+    """'{ns}local' -> URIRef('nslocal')."""
+    return URIRef(tag[1:].replace('}', '', 1))
+
+
+class _Node:
+    __slots__ = ('subject', 'pairs', 'lang', 'base')
+
+    def __init__(self, subject, lang, base):
+        self.subject = subject
+        self.pairs = []
+        self.lang = lang
+        self.base = base
+
+
+class _Property:
+    __slots__ = ('predicate', 'attrib', 'lang', 'base', 'object')
+
+    def __init__(self, predicate, attrib, lang, base):
+        self.predicate = predicate
+        self.attrib = attrib
+        self.lang = lang
+        self.base = base
+        self.object = None
+
+
+def _start_node(elem, lang, base, bnodes):
+    base = urljoin(base, elem.get(_BASE)) if elem.get(_BASE) else base
+    lang = elem.get(_LANG, lang)
+    if _ABOUT in elem.attrib:
+        subject = URIRef(urljoin(base, elem.get(_ABOUT)))
+    elif _ID in elem.attrib:
+        subject = URIRef(urljoin(base, '#' + elem.get(_ID)))
+    elif _NODE_ID in elem.attrib:
+        subject = bnodes.setdefault(elem.get(_NODE_ID), BNode())
+    else:
+        subject = BNode()
+    node = _Node(subject, lang, base)
+    if elem.tag != _RDF_DESCRIPTION:
+        node.pairs.append((_RDF_TYPE, _uri(elem.tag)))
+    for name, value in elem.attrib.items():
+        if name == f'{{{RDF_NS}}}type':
+            node.pairs.append((_RDF_TYPE, URIRef(urljoin(base, value))))
+        elif name not in _SYNTAX_ATTRIBUTES and name.startswith('{'):
+            node.pairs.append((_uri(name), Literal(value, lang=lang)))
+    return node
+
+
+def iter_rdfxml_blocks(fileobj, base=''):
+    """Yield (subject, pairs) for every node element of an RDF/XML document."""
+    stack = []       # _Node / _Property frames; the rdf:RDF wrapper is a _Node without subject
+    skip = 0         # depth inside an ignored (parseType) property element
+    bnodes = {}
+    root = None
+    for event, elem in iterparse(fileobj, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            if skip:
+                skip += 1
+                continue
+            parent = stack[-1] if stack else None
+            lang = parent.lang if parent else elem.get(_LANG)
+            parent_base = parent.base if parent else (elem.get(_BASE) or base)
+            if not stack and elem.tag == _RDF_RDF:
+                stack.append(_Node(None, elem.get(_LANG), parent_base))
+            elif parent is None or isinstance(parent, _Property) or parent.subject is None:
+                stack.append(_start_node(elem, lang, parent_base, bnodes))
+            elif _PARSE_TYPE in elem.attrib:
+                skip = 1
+            else:
+                stack.append(_Property(
+                    _uri(elem.tag), dict(elem.attrib),
+                    elem.get(_LANG, lang),
+                    urljoin(parent_base, elem.get(_BASE)) if elem.get(_BASE) else parent_base
+                ))
+            continue
+
+        # end
+        if skip:
+            skip -= 1
+            if not skip:
+                elem.clear()
+            continue
+        frame = stack.pop()
+        parent = stack[-1] if stack else None
+        if isinstance(frame, _Property):
+            attrib = frame.attrib
+            if frame.object is not None:
+                obj = frame.object
+            elif _RESOURCE in attrib:
+                obj = URIRef(urljoin(frame.base, attrib[_RESOURCE]))
+            elif _NODE_ID in attrib:
+                obj = bnodes.setdefault(attrib[_NODE_ID], BNode())
+            elif _DATATYPE in attrib:
+                obj = Literal(elem.text or '', datatype=URIRef(attrib[_DATATYPE]))
+            else:
+                obj = Literal(elem.text or '', lang=frame.lang)
+            parent.pairs.append((frame.predicate, obj))
+        elif frame.subject is not None:
+            if isinstance(parent, _Property):
+                parent.object = frame.subject
+            yield frame.subject, frame.pairs
+            # Drop the parsed subtree so memory stays bounded
+            elem.clear()
+            # Only top-level nodes: a nested node's parent is a property still being read
+            if root is not None and isinstance(parent, _Node) and parent.subject is None:
+                root.clear()
+
+
+class RepeatedSubjectError(ValueError):
+    """A subject is described again after blocks of other subjects."""
+
+
+def iter_subject_blocks(blocks, grouped=False):
+    """
+    Merge consecutive blocks of the same subject into one (subject, pairs).
+
+    Only the subjects seen so far are remembered, not their triples, so a
+    subject whose descriptions are not adjacent cannot be merged here. That
+    memory is the known cost of the check: one 64-bit hash per subject
+    (tens of MB for millions of subjects, against the full IRIs). A hash
+    collision is reported as a repeated subject, which only sends the import
+    to its graph-parse fallback. Readers whose blocks are already grouped by
+    subject (``grouped``, see GROUPED_READERS) skip the check and keep
+    nothing.
+
+    Raises:
+        RepeatedSubjectError: when a subject comes back after another subject
+    """
+    seen = None if grouped else set()
+    subject = pairs = None
+    for block_subject, block_pairs in blocks:
+        if pairs is not None and block_subject == subject:
+            pairs.extend(block_pairs)
+            continue
+        if pairs is not None:
+            yield subject, pairs
+        if seen is not None:
+            key = hash(block_subject)
+            if key in seen:
+                raise RepeatedSubjectError(f"{block_subject} is described in several places")
+            seen.add(key)
+        subject, pairs = block_subject, list(block_pairs)
+    if pairs is not None:
+        yield subject, pairs
+
+
+# ------------------------------------------------------------ N-Triples
+
+# Lines sorted in memory at a time before spilling to a temporary file
+NT_SORT_RUN_SIZE = 200000
+
+_NT_LINE = re.compile(
+    r'\s*(<[^>]*>|_:\S+)\s+(<[^>]*>)\s+'
+    r'(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)\s*\.\s*$'
+)
+_NT_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+_NT_CHARS = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+def _nt_unescape(text):
+    if '\\' not in text:
+        return text
+
+    def replace(match):
+        code = match.group(1) or match.group(2)
+        if code:
+            return chr(int(code, 16))
+        return _NT_CHARS.get(match.group(3), match.group(3))
+    return _NT_ESCAPE.sub(replace, text)
+
+
+def _nt_node(token, bnodes):
+    if token[0] == '<':
+        return URIRef(_nt_unescape(token[1:-1]))
+    if token[0] == '_':
+        return bnodes.setdefault(token[2:], BNode())
+    end = token.rindex('"')
+    value = _nt_unescape(token[1:end])
+    suffix = token[end + 1:]
+    if suffix.startswith('@'):
+        return Literal(value, lang=suffix[1:])
+    if suffix.startswith('^^'):
+        return Literal(value, datatype=URIRef(suffix[3:-1]))
+    return Literal(value)
+
+
+def _spill(lines):
+    run = tempfile.TemporaryFile('w+', encoding='utf-8')
+    run.writelines(lines)
+    run.seek(0)
+    return run
+
+
+def _sorted_lines(lines, run_size):
+    """
+    Sort N-Triples lines so the lines of each subject are adjacent.
+
+    N-Triples files are not grouped by subject in general (rdflib's writer
+    interleaves them), so lines are sorted in runs of run_size that are
+    spilled to temporary files and merged back: memory stays bounded by one run.
+    """
+    runs = []
+    buffer = []
+    try:
+        for line in lines:
+            line = line.lstrip()
+            if not line or line.startswith('#'):
+                continue
+            buffer.append(line if line.endswith('\n') else line + '\n')
+            if len(buffer) >= run_size:
+                buffer.sort()
+                runs.append(_spill(buffer))
+                buffer = []
+        buffer.sort()
+        if not runs:
+            yield from buffer
+            return
+        runs.append(_spill(buffer))
+        buffer = []
+        yield from heapq.merge(*runs)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def iter_ntriples_blocks(fileobj, run_size=NT_SORT_RUN_SIZE):
+    """
+    Yield (subject, pairs) for every subject of an N-Triples document.
+
+    Raises:
+        ValueError: on a line that is not a valid triple
+    """
+    bnodes = {}
+    subject_token = None
+    subject = None
+    pairs = []
+    for line in _sorted_lines(io.TextIOWrapper(fileobj, encoding='utf-8'), run_size):
+        match = _NT_LINE.match(line)
+        if not match:
+            raise ValueError(f"Invalid N-Triples: {line[:80].strip()}")
+        s, p, o = match.groups()
+        if s != subject_token:
+            if pairs:
+                yield subject, pairs
+            subject_token, subject, pairs = s, _nt_node(s, bnodes), []
+        pairs.append((URIRef(p[1:-1]), _nt_node(o, bnodes)))
+    if pairs:
+        yield subject, pairs
+
+
+BLOCK_READERS = {
+    'xml': iter_rdfxml_blocks,
+    'nt': iter_ntriples_blocks,
+}
+
+# Readers that never yield a subject again after another one (sorted input)
+GROUPED_READERS = frozenset({'nt'})
@@ -0,0 +1,207 @@
+"""Normalized term relations and hierarchy queries over them.
+
+Terms keep their broader/narrower/related links in JSONB arrays, which is
+what the editor and importers write. Every statement in those arrays is
+mirrored as a TermRelation row (source, relation, target), refreshed for
+the written concepts inside the writing transaction (see
+changes.on_terms_written), so ORM edits, bulk imports and the bootstrap
+loader all keep the table current.
+
+Only asserted statements are stored. Inverses are derived when querying:
+"X broader Y" and "Y narrower X" both make Y a parent of X, so a hierarchy
+only needs to be recorded on one side. Ancestors and descendants are walked
+with a recursive CTE over the (vocab_id, source) primary key and the
+(vocab_id, target) index, at a cost proportional to the branch, not to the
+vocabulary.
+"""
+from sqlalchemy import delete, insert, select, text
+from app.models import db, Term, TermRelation
+from app.services import changes
+
+BROADER = 'broader'
+NARROWER = 'narrower'
+RELATED = 'related'
+RELATION_FIELDS = (BROADER, NARROWER, RELATED)
+
+# Recursion limit of the hierarchy walks; also what ends walks round a cycle
+MAX_DEPTH = 100
+
+# Concepts refreshed per statement
+SYNC_BATCH_SIZE = 1000
+
+_TARGET_LENGTH = TermRelation.__table__.c.target.type.length
+
+WALK_SQL = """
+WITH RECURSIVE walk(concept_id, depth) AS (
+    SELECT CAST(:concept_id AS VARCHAR), 0
+  UNION
+    SELECT CASE WHEN r.relation = :forward THEN r.target ELSE r.source END, w.depth + 1
+    FROM walk w
+    JOIN term_relations r
+      ON r.vocab_id = :vocab_id
+     AND ((r.relation = :forward AND r.source = w.concept_id)
+          OR (r.relation = :backward AND r.target = w.concept_id))
+    WHERE w.depth < :max_depth
+)
+SELECT concept_id, MIN(depth) AS depth
+FROM walk
+WHERE depth > 0 AND concept_id <> :concept_id
+GROUP BY concept_id
+ORDER BY MIN(depth), concept_id
+"""
+
+NEIGHBOURS_SQL = """
+SELECT relation, target AS concept_id
+FROM term_relations
+WHERE vocab_id = :vocab_id AND source = :concept_id
+UNION
+SELECT CASE relation WHEN 'broader' THEN 'narrower' WHEN 'narrower' THEN 'broader' ELSE relation END,
+       source
+FROM term_relations
+WHERE vocab_id = :vocab_id AND target = :concept_id
+ORDER BY 1, 2
+"""
+
+
+def term_statements(concept_id, values):
+    """
+    Yield the (relation, target) statements asserted by a term.
+
+    Args:
+        concept_id: concept_id of the term
+        values: Mapping with the RELATION_FIELDS keys (a Term row or term dict)
+    """
+    for relation in RELATION_FIELDS:
+        targets = values[relation]
+        if not isinstance(targets, list):
+            continue
+        for target in dict.fromkeys(targets):
+            if (isinstance(target, str) and target and target != concept_id
+                    and len(target) <= _TARGET_LENGTH):
+                yield relation, target
+
+
+def _relation_rows(vocab_id, rows):
+    return [
+        {'vocab_id': vocab_id, 'source': row.concept_id, 'relation': relation, 'target': target}
+        for row in rows
+        for relation, target in term_statements(row.concept_id, row._mapping)
+    ]
+
+
+def sync_relations(connection, vocab_id, concept_ids=None):
+    """
+    Refresh the TermRelation rows of written terms from their JSONB columns.
+
+    Soft-deleted terms assert nothing. Runs on the caller's connection, in
+    its transaction.
+
+    Args:
+        connection: Connection of the writing transaction
+        vocab_id: Vocabulary ID
+        concept_ids: concept_ids of the written terms, or None for the whole vocabulary
+    """
+    relations = TermRelation.__table__
+    terms = Term.__table__
+    live_terms = (
+        select(terms.c.concept_id, *(terms.c[relation] for relation in RELATION_FIELDS))
+        .where(terms.c.vocab_id == vocab_id, terms.c.deleted_at.is_(None))
+    )
+
+    if concept_ids is None:
+        connection.execute(delete(relations).where(relations.c.vocab_id == vocab_id))
+        result = connection.execute(live_terms, execution_options={'stream_results': True})
+        batches = (
+            _relation_rows(vocab_id, rows) for rows in result.partitions(SYNC_BATCH_SIZE)
+        )
+    else:
+        concept_ids = list(concept_ids)
+        batches = []
+        for start in range(0, len(concept_ids), SYNC_BATCH_SIZE):
+            chunk = concept_ids[start:start + SYNC_BATCH_SIZE]
+            connection.execute(
+                delete(relations)
+                .where(relations.c.vocab_id == vocab_id, relations.c.source.in_(chunk))
+            )
+            rows = connection.execute(live_terms.where(terms.c.concept_id.in_(chunk))).all()
+            batches.append(_relation_rows(vocab_id, rows))
+
+    for batch in batches:
+        if batch:
+            connection.execute(insert(relations), batch)
+
+
+def _walk(vocab_id, concept_id, forward, backward, max_depth):
+    rows = db.session.execute(text(WALK_SQL), {
+        'vocab_id': vocab_id,
+        'concept_id': concept_id,
+        'forward': forward,
+        'backward': backward,
+        'max_depth': min(max_depth or MAX_DEPTH, MAX_DEPTH),
+    })
+    return [(row.concept_id, row.depth) for row in rows]
+
+
+def ancestors(vocab_id, concept_id, max_depth=None):
+    """
+    Concepts above a concept (broader, transitively), nearest first.
+
+    Args:
+        vocab_id: Vocabulary ID
+        concept_id: Concept to start from
+        max_depth: Levels to climb (None for all, up to MAX_DEPTH)
+
+    Returns:
+        list of (concept_id, depth), depth 1 for direct parents
+    """
+    return _walk(vocab_id, concept_id, BROADER, NARROWER, max_depth)
+
+
+def descendants(vocab_id, concept_id, max_depth=None):
+    """
+    Concepts below a concept (narrower, transitively), nearest first.
+
+    Args:
+        vocab_id: Vocabulary ID
+        concept_id: Root of the branch
+        max_depth: Levels to descend (None for all, up to MAX_DEPTH)
+
+    Returns:
+        list of (concept_id, depth), depth 1 for direct children
+    """
+    return _walk(vocab_id, concept_id, NARROWER, BROADER, max_depth)
+
+
+def neighbours(vocab_id, concept_id):
+    """
+    Direct relations of a concept, asserted by it or derived from the other side.
+
+    Returns:
+        {'broader': [...], 'narrower': [...], 'related': [...]} of concept_ids
+    """
+    result = {relation: [] for relation in RELATION_FIELDS}
+    rows = db.session.execute(text(NEIGHBOURS_SQL), {'vocab_id': vocab_id, 'concept_id': concept_id})
+    for relation, target in rows:
+        result[relation].append(target)
+    return result
+
+
+def referencing(vocab_id, concept_id):
+    """
+    Statements of other terms that point at a concept ("who points at X").
+
+    Returns:
+        list of (source concept_id, relation) as asserted by the source
+    """
+    relations = TermRelation.__table__
+    rows = db.session.execute(
+        select(relations.c.source, relations.c.relation)
+        .where(relations.c.vocab_id == vocab_id, relations.c.target == concept_id)
+        .order_by(relations.c.source, relations.c.relation)
+    )
+    return [(row.source, row.relation) for row in rows]
+
+
+def init_app(app):
+    """Keep TermRelation in step with every term write."""
+    changes.on_terms_written(sync_relations)
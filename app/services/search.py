@@ -0,0 +1,308 @@
+"""Bilingual full-text and fuzzy search over term labels and definitions.
+
+Every live term has a TermSearch row with one tsvector per language
+(Spanish and English text search configurations), weighted A for the
+preferred label, B for the alternative labels and C for the definition, and
+a plain ``labels`` column for pg_trgm similarity. Accents are folded before
+indexing and querying, so "oceano" finds "Océano". The rows are refreshed
+for the written concepts inside the writing transaction (see
+changes.on_terms_written).
+
+A query matches a term when either language document matches it
+(websearch_to_tsquery syntax: words, "phrases", OR, -negation) or, for
+queries of MIN_FUZZY_LENGTH characters or more, when a label is similar to
+it (pg_trgm ``<%``), which catches typos and partial words. Each condition
+is answered by a GIN index. The matched rows are capped at
+SEARCH_MAX_MATCHES before ranking, so a very common word costs about the
+same as a rare one; only the capped rows are ranked by ts_rank_cd plus label
+similarity, once per search, and facets, total and the result page all come
+from that ranked list.
+
+On SQLite (tests) the documents are stored as plain text and matched with
+LIKE, without ranking or typo tolerance.
+"""
+from collections import Counter, namedtuple
+from flask import current_app
+from sqlalchemy import bindparam, case, delete, func, insert, literal, literal_column, or_, select, tuple_
+from app.models import db, Vocabulary, Term, TermSearch
+from app.services import changes
+
+LANGUAGES = ('es', 'en')
+TEXT_SEARCH_CONFIGS = {'es': 'spanish', 'en': 'english'}
+
+# Folded before indexing and querying; mirrored by migrations/versions/0007_term_search.py
+ACCENTED = 'áéíóúüñàèìòùâêîôûçÁÉÍÓÚÜÑÀÈÌÒÙÂÊÎÔÛÇ'
+PLAIN = 'aeiouunaeiouaeioucAEIOUUNAEIOUAEIOUC'
+_FOLD = str.maketrans(ACCENTED, PLAIN)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+DEFAULT_MAX_MATCHES = 10000
+
+# Shorter queries are matched by full text only; they share too few trigrams
+MIN_FUZZY_LENGTH = 3
+
+# Terms refreshed per statement
+SYNC_BATCH_SIZE = 1000
+
+SearchPage = namedtuple('SearchPage', 'query results total facets page per_page truncated')
+
+
+def fold(text):
+    """Fold accents (see ACCENTED); None becomes ''."""
+    return (text or '').translate(_FOLD)
+
+
+def _join(parts):
+    return fold(' '.join(part for part in parts if part))
+
+
+def _alt_labels(alt_labels, lang=None):
+    """Alt label strings for a language (untagged labels count for both), or all of them."""
+    others = set(LANGUAGES) - {lang} if lang else set()
+    labels = []
+    for alt in alt_labels if isinstance(alt_labels, list) else ():
+        if isinstance(alt, dict):
+            label, alt_lang = alt.get('label'), alt.get('lang')
+        else:
+            label, alt_lang = alt, None
+        if isinstance(label, str) and label and alt_lang not in others:
+            labels.append(label)
+    return labels
+
+
+def search_texts(values):
+    """
+    Folded texts of a term for its TermSearch row.
+
+    Args:
+        values: Mapping with the pref_label_*, definition_* and alt_labels keys
+
+    Returns:
+        dict with pref_<lang>, alt_<lang> and definition_<lang> for each of
+        LANGUAGES, and labels
+    """
+    texts = {}
+    for lang in LANGUAGES:
+        texts[f'pref_{lang}'] = fold(values[f'pref_label_{lang}'])
+        texts[f'alt_{lang}'] = _join(_alt_labels(values['alt_labels'], lang))
+        texts[f'definition_{lang}'] = fold(values[f'definition_{lang}'])
+    texts['labels'] = _join(
+        [values['pref_label_es'], values['pref_label_en']] + _alt_labels(values['alt_labels'])
+    )
+    return texts
+
+
+def _config(lang):
+    return literal_column(f"'{TEXT_SEARCH_CONFIGS[lang]}'::regconfig")
+
+
+def _weighted(lang, weight, param):
+    return func.setweight(func.to_tsvector(_config(lang), bindparam(param)), literal_column(f"'{weight}'"))
+
+
+def _insert_statement():
+    """INSERT of TermSearch rows computing the documents from search_texts() parameters."""
+    documents = {
+        f'document_{lang}': (
+            _weighted(lang, 'A', f'pref_{lang}')
+            .op('||')(_weighted(lang, 'B', f'alt_{lang}'))
+            .op('||')(_weighted(lang, 'C', f'definition_{lang}'))
+        )
+        for lang in LANGUAGES
+    }
+    return insert(TermSearch.__table__).values(**documents)
+
+
+def _search_rows(dialect_name, vocab_id, rows):
+    """Parameters of _insert_statement(), or plain TermSearch rows outside PostgreSQL."""
+    search_rows = []
+    for row in rows:
+        texts = search_texts(row._mapping)
+        if dialect_name != 'postgresql':
+            texts = dict(labels=texts['labels'], **{
+                f'document_{lang}': _join(
+                    [texts[f'pref_{lang}'], texts[f'alt_{lang}'], texts[f'definition_{lang}']]
+                )
+                for lang in LANGUAGES
+            })
+        search_rows.append(dict(texts, vocab_id=vocab_id, concept_id=row.concept_id))
+    return search_rows
+
+
+def sync_search(connection, vocab_id, concept_ids=None):
+    """
+    Refresh the TermSearch rows of written terms.
+
+    Soft-deleted terms are not searchable. Runs on the caller's connection,
+    in its transaction.
+
+    Args:
+        connection: Connection of the writing transaction
+        vocab_id: Vocabulary ID
+        concept_ids: concept_ids of the written terms, or None for the whole vocabulary
+    """
+    table = TermSearch.__table__
+    terms = Term.__table__
+    dialect_name = connection.dialect.name
+    live_terms = (
+        select(terms.c.concept_id, terms.c.pref_label_es, terms.c.pref_label_en,
+               terms.c.definition_es, terms.c.definition_en, terms.c.alt_labels)
+        .where(terms.c.vocab_id == vocab_id, terms.c.deleted_at.is_(None))
+    )
+
+    if concept_ids is None:
+        connection.execute(delete(table).where(table.c.vocab_id == vocab_id))
+        result = connection.execute(live_terms, execution_options={'stream_results': True})
+        batches = (
+            _search_rows(dialect_name, vocab_id, rows) for rows in result.partitions(SYNC_BATCH_SIZE)
+        )
+    else:
+        concept_ids = list(concept_ids)
+        batches = []
+        for start in range(0, len(concept_ids), SYNC_BATCH_SIZE):
+            chunk = concept_ids[start:start + SYNC_BATCH_SIZE]
+            connection.execute(
+                delete(table).where(table.c.vocab_id == vocab_id, table.c.concept_id.in_(chunk))
+            )
+            rows = connection.execute(live_terms.where(terms.c.concept_id.in_(chunk))).all()
+            batches.append(_search_rows(dialect_name, vocab_id, rows))
+
+    statement = _insert_statement() if dialect_name == 'postgresql' else insert(table)
+    for batch in batches:
+        if batch:
+            connection.execute(statement, batch)
+
+
+def _match_conditions(dialect_name, text, columns):
+    """Conditions of a folded query on TermSearch columns; any of them is a match."""
+    if dialect_name == 'postgresql':
+        conditions = [
+            columns[f'document_{lang}'].op('@@')(func.websearch_to_tsquery(_config(lang), text))
+            for lang in LANGUAGES
+        ]
+        if len(text) >= MIN_FUZZY_LENGTH:
+            conditions.append(literal(text).op('<%')(columns.labels))
+        return conditions
+    pattern = f'%{text}%'
+    return [columns[f'document_{lang}'].like(pattern) for lang in LANGUAGES]
+
+
+def _rank(dialect_name, text, columns):
+    """Relevance of a match: ts_rank_cd in the best language plus label similarity."""
+    if dialect_name == 'postgresql':
+        rank = func.greatest(*(
+            func.ts_rank_cd(columns[f'document_{lang}'], func.websearch_to_tsquery(_config(lang), text))
+            for lang in LANGUAGES
+        ))
+        if len(text) >= MIN_FUZZY_LENGTH:
+            rank = rank + func.word_similarity(text, columns.labels)
+        return rank
+    return case((columns.labels.like(f'%{text}%'), 1.0), else_=0.5)
+
+
+def search_matches(dialect_name, text, vocab_id=None, max_matches=DEFAULT_MAX_MATCHES):
+    """
+    Select of (vocab_id, concept_id, rank) of the matches of a folded query, best first.
+
+    The GIN-matched rows are capped at max_matches, in no particular order,
+    before any of them is ranked: ts_rank_cd and word_similarity run on at
+    most max_matches rows, however common the words are. When the cap is
+    reached the ranking covers an arbitrary subset of the matches.
+    """
+    table = TermSearch.__table__
+    candidates = select(table).where(or_(*_match_conditions(dialect_name, text, table.c)))
+    if vocab_id is not None:
+        candidates = candidates.where(table.c.vocab_id == vocab_id)
+    candidates = candidates.limit(max_matches).subquery('candidates')
+    rank = _rank(dialect_name, text, candidates.c).label('rank')
+    return (
+        select(candidates.c.vocab_id, candidates.c.concept_id, rank)
+        .order_by(rank.desc(), candidates.c.vocab_id, candidates.c.concept_id)
+    )
+
+
+def search_facets(vocab_ids):
+    """Select of (id, code, name, name_en) of the vocabularies with matches."""
+    return (select(Vocabulary.id, Vocabulary.code, Vocabulary.name, Vocabulary.name_en)
+            .where(Vocabulary.id.in_(vocab_ids)))
+
+
+def search_results(keys):
+    """Select of the terms shown for a page of (vocab_id, concept_id) matches."""
+    return (
+        select(Term.id, Term.vocab_id, Term.concept_id, Term.pref_label_es, Term.pref_label_en,
+               Term.definition_es, Term.definition_en, Vocabulary.code.label('vocab_code'))
+        .join(Vocabulary, Vocabulary.id == Term.vocab_id)
+        .where(tuple_(Term.vocab_id, Term.concept_id).in_(keys))
+    )
+
+
+def search(query, vocab_id=None, page=1, per_page=None):
+    """
+    Ranked, paginated search across one or all vocabularies.
+
+    The matches are ranked once (search_matches) and kept as a list; facets,
+    total and the page are taken from it. Only a vocabulary filter on a
+    truncated search ranks again, over that vocabulary's own matches.
+
+    Args:
+        query: Search text (websearch syntax on PostgreSQL)
+        vocab_id: Restrict the results to a vocabulary (facets still cover all)
+        page: 1-based page number
+        per_page: Results per page (default SEARCH_PAGE_SIZE, at most MAX_PAGE_SIZE)
+
+    Returns:
+        SearchPage; facets is a list of dicts with vocab_id, code, name,
+        name_en and count. When truncated, the SEARCH_MAX_MATCHES bound was
+        reached: total and counts are lower bounds and the ranking covers
+        only the matches within the bound.
+    """
+    per_page = min(max(per_page or current_app.config.get('SEARCH_PAGE_SIZE', DEFAULT_PAGE_SIZE), 1),
+                   MAX_PAGE_SIZE)
+    page = max(page, 1)
+    text = fold(query).strip()
+    if not text:
+        return SearchPage(query, [], 0, [], page, per_page, False)
+
+    dialect_name = db.engine.dialect.name
+    max_matches = current_app.config.get('SEARCH_MAX_MATCHES', DEFAULT_MAX_MATCHES)
+    matches = db.session.execute(search_matches(dialect_name, text, max_matches=max_matches)).all()
+    truncated = len(matches) >= max_matches
+
+    counts = Counter(match.vocab_id for match in matches)
+    facets = []
+    if counts:
+        facets = sorted((
+            {'vocab_id': row.id, 'code': row.code, 'name': row.name, 'name_en': row.name_en,
+             'count': counts[row.id]}
+            for row in db.session.execute(search_facets(list(counts)))
+        ), key=lambda facet: (-facet['count'], facet['code']))
+
+    if vocab_id is not None:
+        if truncated:
+            # The capped matches may miss some of this vocabulary's; rank its own
+            matches = db.session.execute(
+                search_matches(dialect_name, text, vocab_id, max_matches)
+            ).all()
+        else:
+            matches = [match for match in matches if match.vocab_id == vocab_id]
+
+    page_matches = matches[(page - 1) * per_page:page * per_page]
+    results = []
+    if page_matches:
+        keys = [(match.vocab_id, match.concept_id) for match in page_matches]
+        rows = {
+            (row.vocab_id, row.concept_id): row
+            for row in db.session.execute(search_results(keys))
+        }
+        results = [
+            dict(rows[key]._mapping, rank=match.rank)
+            for key, match in zip(keys, page_matches) if key in rows
+        ]
+    return SearchPage(query, results, len(matches), facets, page, per_page, truncated)
+
+
+def init_app(app):
+    """Keep TermSearch in step with every term write."""
+    changes.on_terms_written(sync_search)
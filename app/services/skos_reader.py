@@ -0,0 +1,170 @@
+"""Single-pass extraction of SKOS concepts from RDF triples.
+
+Both importers (import_service for uploads, rdf_loader for the CLI) build
+their term dicts here. Instead of asking the graph for each predicate of
+each concept, the triples are walked once and grouped by subject into
+compact records: a list with one slot per predicate we care about. Any
+iterable of (s, p, o) triples works, so the same engine serves rdflib
+graphs and streaming parsers.
+"""
+from rdflib import Graph, RDF, SKOS, DCTERMS, Literal
+from app.services.export import DC
+
+# Record slots
+TYPES, PREF_LABEL, ALT_LABEL, DEFINITION, BROADER, NARROWER, RELATED, \
+    EXACT_MATCH, CLOSE_MATCH, SOURCE, TITLE, DESCRIPTION = range(12)
+RECORD_SIZE = 12
+
+PREDICATE_SLOTS = {
+    RDF.type: TYPES,
+    SKOS.prefLabel: PREF_LABEL,
+    SKOS.altLabel: ALT_LABEL,
+    SKOS.definition: DEFINITION,
+    SKOS.broader: BROADER,
+    SKOS.narrower: NARROWER,
+    SKOS.related: RELATED,
+    SKOS.exactMatch: EXACT_MATCH,
+    SKOS.closeMatch: CLOSE_MATCH,
+    DC.source: SOURCE,
+    DCTERMS.source: SOURCE,
+    DC.title: TITLE,
+    DCTERMS.title: TITLE,
+    DC.description: DESCRIPTION,
+    DCTERMS.description: DESCRIPTION,
+}
+
+
+def local_name(uri):
+    """Return the concept_id for a concept URI (its last path segment or fragment)."""
+    uri = str(uri)
+    return uri.split('/')[-1] or uri.split('#')[-1]
+
+
+def add_triple(records, s, p, o):
+    """
+    Add one triple to a {subject: record} dict; ignore predicates we don't use.
+
+    Returns True if the triple was kept.
+    """
+    slot = PREDICATE_SLOTS.get(p)
+    if slot is None:
+        return False
+    record = records.get(s)
+    if record is None:
+        record = records[s] = [None] * RECORD_SIZE
+    values = record[slot]
+    if values is None:
+        record[slot] = [o]
+    else:
+        values.append(o)
+    return True
+
+
+def group_by_subject(triples):
+    """
+    Walk triples once and return {subject: record}.
+
+    For an rdflib Graph only the predicates we use are scanned, through the
+    store's predicate index, so unrelated triples are never materialized.
+    """
+    records = {}
+    if isinstance(triples, Graph):
+        for predicate, slot in PREDICATE_SLOTS.items():
+            for s, o in triples.subject_objects(predicate):
+                record = records.get(s)
+                if record is None:
+                    record = records[s] = [None] * RECORD_SIZE
+                if record[slot] is None:
+                    record[slot] = [o]
+                else:
+                    record[slot].append(o)
+        return records
+    for s, p, o in triples:
+        add_triple(records, s, p, o)
+    return records
+
+
+def is_concept(record):
+    return record[TYPES] is not None and SKOS.Concept in record[TYPES]
+
+
+def is_scheme(record):
+    return record[TYPES] is not None and SKOS.ConceptScheme in record[TYPES]
+
+
+def _by_language(values):
+    """Return (es, en) from literals; an untagged literal fills 'es' if nothing else does."""
+    es = en = untagged = None
+    for value in values or ():
+        lang = value.language if isinstance(value, Literal) else None
+        if lang == 'es':
+            es = str(value)
+        elif lang == 'en':
+            en = str(value)
+        elif untagged is None:
+            untagged = str(value)
+    return es or untagged, en
+
+
+def build_term(subject, record):
+    """Build a term dict (see bulk.TERM_DATA_FIELDS) from a subject's record."""
+    pref_label_es, pref_label_en = _by_language(record[PREF_LABEL])
+    definition_es, definition_en = _by_language(record[DEFINITION])
+    source = record[SOURCE]
+    return {
+        'concept_id': local_name(subject),
+        'uri': str(subject),
+        'pref_label_es': pref_label_es,
+        'pref_label_en': pref_label_en,
+        'definition_es': definition_es,
+        'definition_en': definition_en,
+        'alt_labels': [
+            {'label': str(alt), 'lang': alt.language if isinstance(alt, Literal) else None}
+            for alt in record[ALT_LABEL] or ()
+        ],
+        'broader': [local_name(uri) for uri in record[BROADER] or ()],
+        'narrower': [local_name(uri) for uri in record[NARROWER] or ()],
+        'related': [local_name(uri) for uri in record[RELATED] or ()],
+        'exact_match': [str(uri) for uri in record[EXACT_MATCH] or ()],
+        'close_match': [str(uri) for uri in record[CLOSE_MATCH] or ()],
+        'source': str(source[0]) if source else None,
+    }
+
+
+def build_scheme_info(subject, record):
+    """Build vocabulary metadata (see import_service.extract_vocabulary_info) from a ConceptScheme record."""
+    name, name_en = _by_language(record[PREF_LABEL])
+    if not name:
+        name, title_en = _by_language(record[TITLE])
+        name_en = name_en or title_en
+    description, description_en = _by_language(record[DEFINITION])
+    if not description:
+        description, extra_en = _by_language(record[DESCRIPTION])
+        description_en = description_en or extra_en
+    uri = str(subject)
+    return {
+        'uri': uri,
+        'code': uri.split('/')[-1] or uri.split('/')[-2],
+        'name': name,
+        'name_en': name_en,
+        'description': description,
+        'description_en': description_en,
+    }
+
+
+def extract_terms(triples, exclude=None):
+    """
+    Extract every skos:Concept from an iterable of triples (e.g. an rdflib Graph).
+
+    Args:
+        triples: Iterable of (s, p, o)
+        exclude: Optional subject to leave out (e.g. the ConceptScheme)
+
+    Returns:
+        list of term dicts
+    """
+    return [
+        build_term(subject, record)
+        for subject, record in group_by_subject(triples).items()
+        if subject != exclude and is_concept(record)
+    ]
@@ -0,0 +1,191 @@
+"""Direct SKOS serializers for Turtle, RDF/XML and JSON-LD.
+
+Our exports always have the same shape (one ConceptScheme, flat Concepts), so
+instead of building an rdflib Graph and letting its generic serializers walk
+it again, these writers format each term straight from a column tuple (see
+export.term_statements) and yield text chunks as they go. Memory stays flat
+and there is no per-triple object churn.
+"""
+import json
+from xml.sax.saxutils import escape, quoteattr
+from rdflib import RDF, SKOS
+from app.services.export import (
+    DC, STREAM_BATCH_SIZE, TERM_RDF_COLUMNS, vocabulary_base_uri, concept_iri,
+    scheme_statements, term_statements, iter_term_rows
+)
+
+PREFIXES = (
+    ('rdf', str(RDF)),
+    ('skos', str(SKOS)),
+    ('dc', str(DC)),
+)
+
+RDF_TYPE = str(RDF.type)
+
+
+def _qname(iri):
+    for prefix, namespace in PREFIXES:
+        if iri.startswith(namespace):
+            return f"{prefix}:{iri[len(namespace):]}"
+    return None
+
+
+def _subjects(vocab, rows):
+    """Yield (subject IRI, statements) for the scheme and then every term row."""
+    base_uri = vocabulary_base_uri(vocab)
+    yield base_uri, scheme_statements(vocab, base_uri)
+    for row in rows:
+        yield concept_iri(base_uri, row.concept_id), term_statements(row, base_uri)
+
+
+def _group_by_predicate(statements):
+    grouped = {}
+    for predicate, value, lang, is_uri in statements:
+        grouped.setdefault(predicate, []).append((value, lang, is_uri))
+    return grouped
+
+
+def _chunked(pieces, batch_size):
+    buffer = []
+    for piece in pieces:
+        buffer.append(piece)
+        if len(buffer) >= batch_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+# ---------------------------------------------------------------- Turtle
+
+def _turtle_string(value):
+    return '"' + (value.replace('\\', '\\\\').replace('"', '\\"')
+                  .replace('\n', '\\n').replace('\r', '\\r')) + '"'
+
+
+def _turtle_object(value, lang, is_uri):
+    if is_uri:
+        return f"<{value}>"
+    return _turtle_string(value) + (f"@{lang}" if lang else '')
+
+
+def _turtle_block(subject, statements):
+    lines = []
+    for predicate, objects in _group_by_predicate(statements).items():
+        name = 'a' if predicate == RDF_TYPE else (_qname(predicate) or f"<{predicate}>")
+        if predicate == RDF_TYPE:
+            rendered = ', '.join(_qname(value) or f"<{value}>" for value, _, _ in objects)
+        else:
+            rendered = ', '.join(_turtle_object(*obj) for obj in objects)
+        lines.append(f"    {name} {rendered}")
+    return f"<{subject}>\n" + ' ;\n'.join(lines) + ' .\n\n'
+
+
+def _write_turtle(subjects, batch_size):
+    yield ''.join(f"@prefix {prefix}: <{namespace}> .\n" for prefix, namespace in PREFIXES) + '\n'
+    yield from _chunked(
+        (_turtle_block(subject, statements) for subject, statements in subjects),
+        batch_size
+    )
+
+
+# --------------------------------------------------------------- RDF/XML
+
+def _rdfxml_block(subject, statements):
+    type_name = 'rdf:Description'
+    body = []
+    for predicate, value, lang, is_uri in statements:
+        name = _qname(predicate)
+        if predicate == RDF_TYPE and type_name == 'rdf:Description' and _qname(value):
+            type_name = _qname(value)
+        elif is_uri:
+            body.append(f"    <{name} rdf:resource={quoteattr(value)}/>\n")
+        elif lang:
+            body.append(f"    <{name} xml:lang={quoteattr(lang)}>{escape(value)}</{name}>\n")
+        else:
+            body.append(f"    <{name}>{escape(value)}</{name}>\n")
+    return f"  <{type_name} rdf:about={quoteattr(subject)}>\n" + ''.join(body) + f"  </{type_name}>\n"
+
+
+def _write_rdfxml(subjects, batch_size):
+    namespaces = ''.join(f'\n   xmlns:{prefix}="{namespace}"' for prefix, namespace in PREFIXES)
+    yield f'<?xml version="1.0" encoding="utf-8"?>\n<rdf:RDF{namespaces}\n>\n'
+    yield from _chunked(
+        (_rdfxml_block(subject, statements) for subject, statements in subjects),
+        batch_size
+    )
+    yield '</rdf:RDF>\n'
+
+
+# --------------------------------------------------------------- JSON-LD
+
+def _jsonld_node(subject, statements):
+    node = {'@id': subject}
+    for predicate, objects in _group_by_predicate(statements).items():
+        if predicate == RDF_TYPE:
+            node['@type'] = [_qname(value) or value for value, _, _ in objects]
+            continue
+        values = []
+        for value, lang, is_uri in objects:
+            if is_uri:
+                values.append({'@id': value})
+            elif lang:
+                values.append({'@value': value, '@language': lang})
+            else:
+                values.append({'@value': value})
+        node[_qname(predicate) or predicate] = values
+    return json.dumps(node, ensure_ascii=False)
+
+
+def _write_jsonld(subjects, batch_size):
+    context = json.dumps({prefix: namespace for prefix, namespace in PREFIXES})
+    yield f'{{"@context": {context},\n "@graph": [\n'
+    nodes = (_jsonld_node(subject, statements) for subject, statements in subjects)
+    yield from _chunked(
+        ((',\n' if i else '') + node for i, node in enumerate(nodes)),
+        batch_size
+    )
+    yield '\n]}\n'
+
+
+# ------------------------------------------------------------ Public API
+
+def write_turtle(vocab, rows, batch_size=STREAM_BATCH_SIZE):
+    """Yield a vocabulary as Turtle."""
+    return _write_turtle(_subjects(vocab, rows), batch_size)
+
+
+def write_rdfxml(vocab, rows, batch_size=STREAM_BATCH_SIZE):
+    """Yield a vocabulary as RDF/XML."""
+    return _write_rdfxml(_subjects(vocab, rows), batch_size)
+
+
+def write_jsonld(vocab, rows, batch_size=STREAM_BATCH_SIZE):
+    """Yield a vocabulary as a JSON-LD document with a flat @graph."""
+    return _write_jsonld(_subjects(vocab, rows), batch_size)
+
+
+WRITERS = {
+    'ttl': write_turtle,
+    'rdf': write_rdfxml,
+    'jsonld': write_jsonld,
+}
+
+_SUBJECT_WRITERS = {
+    'ttl': _write_turtle,
+    'rdf': _write_rdfxml,
+    'jsonld': _write_jsonld,
+}
+
+
+def serialize_concept(vocab, row, format):
+    """Return the standalone RDF document describing a single concept."""
+    base_uri = vocabulary_base_uri(vocab)
+    subjects = [(concept_iri(base_uri, row.concept_id), term_statements(row, base_uri))]
+    return ''.join(_SUBJECT_WRITERS[format](subjects, 1))
+
+
+def stream_vocabulary(vocab, format, batch_size=STREAM_BATCH_SIZE, concept_ids=None):
+    """Stream a vocabulary's approved terms (or a subset, see iter_term_rows) in the given format."""
+    rows = iter_term_rows(vocab.id, TERM_RDF_COLUMNS, batch_size, concept_ids)
+    return WRITERS[format](vocab, rows, batch_size)
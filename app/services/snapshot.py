@@ -0,0 +1,188 @@
+"""Compact binary snapshots of vocabulary graphs.
+
+A snapshot holds one vocabulary's triples in a form that loads without any
+RDF parsing or database access:
+
+    header    '<8sIQII'  magic, vocab_id, content_version, n_terms, n_triples
+    offsets   uint32 * (n_terms + 1)   byte offsets into the string table
+    strings   UTF-8 N-Triples terms, concatenated (padded to 4 bytes)
+    triples   uint32 * (3 * n_triples) subject, predicate, object term ids
+
+Each distinct RDF term is decoded once; triples are just integer lookups over
+an mmap'ed view of the file. Snapshots are rewritten in the background after
+every committed change and whenever the SPARQL store has to load a
+vocabulary from the database.
+"""
+import mmap
+import os
+import queue
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from flask import current_app
+from rdflib import URIRef, Literal
+from app.services import changes
+from app.services.export import nt_term
+
+MAGIC = b'OVSNAP01'
+HEADER = struct.Struct('<8sIQII')
+
+_UNESCAPES = {'\\\\': '\\', '\\"': '"', '\\n': '\n', '\\r': '\r'}
+_ESCAPE_RE = re.compile(r'\\[\\"nr]')
+
+
+def snapshot_dir():
+    """Return the snapshot directory, creating it if needed."""
+    path = current_app.config.get('SNAPSHOT_DIR') or os.path.join(current_app.instance_path, 'snapshots')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def snapshot_path(vocab_id):
+    return os.path.join(snapshot_dir(), f"vocab_{vocab_id}.snap")
+
+
+def parse_nt_term(text):
+    """Inverse of export.nt_term for the IRIs and literals we write."""
+    if text.startswith('<'):
+        return URIRef(text[1:-1])
+    end = text.rindex('"')
+    value = _ESCAPE_RE.sub(lambda m: _UNESCAPES[m.group(0)], text[1:end])
+    suffix = text[end + 1:]
+    if suffix.startswith('@'):
+        return Literal(value, lang=suffix[1:])
+    if suffix.startswith('^^'):
+        return Literal(value, datatype=URIRef(suffix[3:-1]))
+    return Literal(value)
+
+
+def _uint32_array(values):
+    data = array('I', values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def write_snapshot(vocab_id, content_version, triples):
+    """
+    Encode an iterable of (s, p, o) rdflib nodes as the snapshot of a vocabulary.
+
+    Returns the snapshot path.
+    """
+    term_ids = {}
+    strings = []
+    encoded = array('I')
+    for triple in triples:
+        for node in triple:
+            key = nt_term(node)
+            term_id = term_ids.get(key)
+            if term_id is None:
+                term_id = term_ids[key] = len(strings)
+                strings.append(key.encode('utf-8'))
+            encoded.append(term_id)
+
+    offsets = [0]
+    for data in strings:
+        offsets.append(offsets[-1] + len(data))
+    blob = b''.join(strings)
+    blob += b'\0' * (-len(blob) % 4)
+
+    path = snapshot_path(vocab_id)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, vocab_id, content_version, len(strings), len(encoded) // 3))
+        f.write(_uint32_array(offsets))
+        f.write(blob)
+        f.write(_uint32_array(encoded))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(vocab_id):
+    """
+    Load a vocabulary snapshot.
+
+    Returns:
+        (content_version, list of (s, p, o) rdflib nodes), or None if missing or invalid
+    """
+    path = snapshot_path(vocab_id)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, stored_id, content_version, n_terms, n_triples = HEADER.unpack_from(mm)
+        if magic != MAGIC or stored_id != vocab_id:
+            return None
+        position = HEADER.size
+        offsets = array('I')
+        offsets.frombytes(mm[position:position + 4 * (n_terms + 1)])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        position += 4 * (n_terms + 1)
+        strings = mm[position:position + offsets[-1]]
+        position += offsets[-1] + (-offsets[-1] % 4)
+        ids = array('I')
+        ids.frombytes(mm[position:position + 12 * n_triples])
+        if sys.byteorder == 'big':
+            ids.byteswap()
+
+    terms = [
+        parse_nt_term(strings[offsets[i]:offsets[i + 1]].decode('utf-8'))
+        for i in range(n_terms)
+    ]
+    triples = [(terms[ids[i]], terms[ids[i + 1]], terms[ids[i + 2]]) for i in range(0, len(ids), 3)]
+    return content_version, triples
+
+
+class SnapshotWriter:
+    """Background thread rewriting snapshots of vocabularies that changed."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+
+    def on_change(self, change):
+        if self._app is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+            self._thread.start()
+        self._queue.put(change.vocab_id)
+
+    def _run(self):
+        from app.extensions import db
+        from app.models import Vocabulary
+        from app.services.export import iter_vocabulary_triples
+        while True:
+            pending = {self._queue.get()}
+            while not self._queue.empty():
+                pending.add(self._queue.get_nowait())
+            with self._app.app_context():
+                for vocab_id in pending:
+                    try:
+                        vocab = Vocabulary.query.get(vocab_id)
+                        if vocab is None:
+                            if os.path.exists(snapshot_path(vocab_id)):
+                                os.remove(snapshot_path(vocab_id))
+                            continue
+                        triples = (t for batch in iter_vocabulary_triples(vocab) for t in batch)
+                        write_snapshot(vocab.id, vocab.content_version, triples)
+                    except Exception as e:
+                        current_app.logger.warning(f"Could not write snapshot for vocabulary {vocab_id}: {e}")
+                    finally:
+                        db.session.remove()
+
+
+writer = SnapshotWriter()
+
+
+def init_app(app):
+    """Rewrite snapshots in the background after committed changes."""
+    if app.config.get('SNAPSHOTS_ENABLED', True):
+        writer._app = app
+        changes.subscribe(writer.on_change)
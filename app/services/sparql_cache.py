@@ -0,0 +1,171 @@
+"""Result cache for the SPARQL endpoint.
+
+Entries are keyed on the normalized query algebra (so whitespace, comments
+and prefix spelling do not matter) plus the content_version of every
+vocabulary the query can read. A query confined to ``GRAPH <scheme>`` blocks
+only depends on those vocabularies; anything touching the default (union)
+graph depends on all of them. Writes evict just the entries that depend on
+the vocabulary that changed.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from rdflib import URIRef
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+from app.services import changes
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _canonical(node):
+    """Stable text form of an algebra tree (ignores rdflib's internal _vars)."""
+    if isinstance(node, CompValue):
+        items = ','.join(
+            f"{key}={_canonical(value)}" for key, value in node.items() if not key.startswith('_')
+        )
+        return f"{node.name}({items})"
+    if isinstance(node, dict):
+        return '{' + ','.join(f"{k}={_canonical(v)}" for k, v in node.items()) + '}'
+    if isinstance(node, (list, tuple)):
+        return '[' + ','.join(_canonical(v) for v in node) + ']'
+    if isinstance(node, (set, frozenset)):
+        return '{' + ','.join(sorted(_canonical(v) for v in node)) + '}'
+    if hasattr(node, 'n3'):
+        return node.n3()
+    return repr(node)
+
+
+def _graph_dependencies(algebra):
+    """
+    Return the set of graph IRIs a query can read, or None for all graphs.
+    """
+    dataset_clause = algebra.get('datasetClause')
+    if dataset_clause:
+        iris = set()
+        for clause in dataset_clause:
+            iris.add(clause.get('default') or clause.get('named'))
+        return iris
+
+    iris = set()
+
+    def walk(node, in_graph):
+        if isinstance(node, CompValue):
+            if node.name == 'Graph':
+                if not isinstance(node.get('term'), URIRef):
+                    return False  # GRAPH ?g can read any graph
+                iris.add(node['term'])
+                return walk(node.get('p'), True)
+            if node.name == 'BGP' and node.get('triples') and not in_graph:
+                return False  # Pattern over the default (union) graph
+            return all(walk(v, in_graph) for k, v in node.items() if not k.startswith('_'))
+        if isinstance(node, (list, tuple)):
+            return all(walk(v, in_graph) for v in node)
+        return True
+
+    return iris if walk(algebra, False) else None
+
+
+def analyze_query(query):
+    """
+    Parse a query once for caching purposes.
+
+    Returns:
+        (normalized key, set of graph IRIs or None for all graphs)
+    """
+    prepared = prepareQuery(query)
+    key = hashlib.sha256(_canonical(prepared.algebra).encode('utf-8')).hexdigest()
+    return key, _graph_dependencies(prepared.algebra)
+
+
+def byte_size(value):
+    """Size of a serialized result in bytes; str values count as UTF-8."""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return len(value)
+
+
+class SparqlResultCache:
+    """Byte-bounded LRU cache of serialized SPARQL results."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size, dependencies)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, dependencies, size=None):
+        """
+        Store a value; dependencies is a set of vocab IDs, or None for all.
+
+        size defaults to byte_size(value) and is what counts against the
+        byte budget.
+        """
+        if size is None:
+            size = byte_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, dependencies)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, vocab_id):
+        """Drop entries that depend on a vocabulary."""
+        with self._lock:
+            stale = [
+                key for key, (_, _, deps) in self._entries.items()
+                if deps is None or vocab_id in deps
+            ]
+            for key in stale:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def on_change(self, change):
+        self.invalidate(change.vocab_id)
+
+
+cache = SparqlResultCache()
+
+
+def init_app(app):
+    """Configure the cache budget and subscribe it to vocabulary changes."""
+    cache.max_bytes = app.config.get('SPARQL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+    changes.subscribe(cache.on_change)
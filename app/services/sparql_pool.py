@@ -0,0 +1,202 @@
+"""Isolated execution of SPARQL queries.
+
+Queries run in a small pool of dedicated worker processes, each holding its
+own copy of the vocabulary dataset (see sparql_store). A query that exceeds
+the wall-clock timeout gets its worker killed and replaced, so one expensive
+query cannot tie up the web workers that also serve the editor UI. A new
+worker loads the dataset before it reports ready, and the timeout of a
+query only starts once its worker is ready.
+
+Workers do not see the commits of the web process, so the pool keeps the
+committed changes (see changes.subscribe) for each worker and sends them
+before its next query: the worker patches the changed concepts, as the
+in-process store does, and any reload it still needs (changes made by
+another process) also happens before the query's timeout starts.
+With SPARQL_POOL_SIZE = 0 queries run inline, which is what tests use.
+"""
+import multiprocessing
+import queue
+import threading
+from app.services import changes
+from app.services.sparql_store import store
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_STARTUP_TIMEOUT = 300
+DEFAULT_MAX_RESULTS = 10000
+
+
+class PoolBusyError(Exception):
+    """No worker became free in time."""
+
+
+class QueryTimeoutError(Exception):
+    """The query exceeded the wall-clock timeout and was cancelled."""
+
+
+class QueryError(Exception):
+    """The query could not be parsed or evaluated."""
+
+
+def execute(query, offset=0, limit=DEFAULT_MAX_RESULTS):
+    """
+    Evaluate a query against the local store and serialize one page of it.
+
+    Only the solutions of the page are kept in memory (see VocabularyStore.query).
+
+    Returns:
+        (JSON payload as bytes, total number of solutions or None)
+    """
+    results, total = store.query(query, offset, limit)
+    return results.serialize(format='json'), total
+
+
+def _worker_main(conn):
+    """Entry point of a pool process: load the app and the dataset once, then serve queries."""
+    from app import create_app
+    from app.extensions import db
+    app = create_app()
+    with app.app_context():
+        try:
+            store.dataset()
+        except Exception:
+            # The first query loads it again and reports the error
+            app.logger.exception('Could not load the SPARQL dataset')
+        finally:
+            db.session.remove()
+        conn.send(('ready', None, None))
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+            try:
+                if message[0] == 'sync':
+                    for change in message[1]:
+                        store.notify(change)
+                    store.dataset()
+                    conn.send(('ready', None, None))
+                    continue
+                _, query, offset, limit = message
+                payload, total = execute(query, offset, limit)
+                conn.send(('ok', payload, total))
+            except Exception as e:
+                conn.send(('error', str(e), None))
+            finally:
+                # Do not hold a transaction open between queries
+                db.session.remove()
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.changes = []  # Committed VocabChanges not sent to the worker yet
+
+    def wait_ready(self, timeout):
+        """Wait for the worker to load or update the dataset; False if it is still busy after timeout."""
+        if not self.ready and self.conn.poll(timeout):
+            self.conn.recv()  # ('ready', ...), or ('error', ...) which the query reports again
+            self.ready = True
+        return self.ready
+
+    def sync(self, changes):
+        """Ask the worker to apply changes and check for others before the next query."""
+        self.conn.send(('sync', changes))
+        self.ready = False
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SparqlWorkerPool:
+    """Fixed number of query processes, each handling one query at a time."""
+
+    def __init__(self, size=0, timeout=DEFAULT_TIMEOUT, startup_timeout=DEFAULT_STARTUP_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = None
+        self._start_lock = threading.Lock()
+        self._workers = []
+        self._changes_lock = threading.Lock()
+
+    def _start(self):
+        with self._start_lock:
+            if self._idle is None:
+                idle = queue.Queue()
+                for _ in range(self.size):
+                    idle.put(self._new_worker())
+                self._idle = idle
+
+    def _new_worker(self, replacing=None):
+        worker = _Worker(self._context)
+        with self._changes_lock:
+            if replacing is not None:
+                self._workers.remove(replacing)
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.kill()
+        return self._new_worker(replacing=worker)
+
+    def notify(self, change):
+        """Keep a committed change for every worker, to send before its next query."""
+        with self._changes_lock:
+            for worker in self._workers:
+                worker.changes.append(change)
+
+    def run(self, query, offset=0, limit=DEFAULT_MAX_RESULTS):
+        """Run a query in a worker; see execute() for the return value."""
+        if self.size <= 0:
+            try:
+                return execute(query, offset, limit)
+            except Exception as e:
+                raise QueryError(str(e))
+
+        self._start()
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolBusyError('All SPARQL workers are busy')
+
+        try:
+            if not worker.wait_ready(self.startup_timeout):
+                raise PoolBusyError('SPARQL workers are still loading the dataset')
+            with self._changes_lock:
+                pending, worker.changes = worker.changes, []
+            worker.sync(pending)
+            if not worker.wait_ready(self.startup_timeout):
+                raise PoolBusyError('SPARQL workers are still updating the dataset')
+            worker.conn.send(('query', query, offset, limit))
+            if not worker.conn.poll(self.timeout):
+                worker = self._replace(worker)
+                raise QueryTimeoutError(f'Query exceeded {self.timeout}s and was cancelled')
+            status, payload, total = worker.conn.recv()
+        except (EOFError, OSError):
+            # Worker died (e.g. out of memory); replace it
+            worker = self._replace(worker)
+            raise QueryError('SPARQL worker terminated unexpectedly')
+        finally:
+            self._idle.put(worker)
+
+        if status == 'error':
+            raise QueryError(payload)
+        return payload, total
+
+
+pool = SparqlWorkerPool()
+
+
+def init_app(app):
+    """Configure the pool from the app config (workers start on first query) and forward changes to it."""
+    pool.size = app.config.get('SPARQL_POOL_SIZE', 0)
+    pool.timeout = app.config.get('SPARQL_TIMEOUT', DEFAULT_TIMEOUT)
+    pool.startup_timeout = app.config.get('SPARQL_STARTUP_TIMEOUT', DEFAULT_STARTUP_TIMEOUT)
+    changes.subscribe(pool.notify)
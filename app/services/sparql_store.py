@@ -0,0 +1,190 @@
+"""Long-lived SPARQL dataset with one named graph per vocabulary.
+
+The dataset is loaded once per process (from binary snapshots when they are
+current, see snapshot.py) and then patched as terms and vocabularies change,
+so a query only pays for its own evaluation instead of rebuilding the union
+of every vocabulary from the database.
+"""
+import threading
+from flask import current_app
+from rdflib import Dataset, URIRef
+from rdflib.plugins.sparql.processor import SPARQLProcessor, SPARQLResult
+from app.models import db, Vocabulary, Term
+from app.services import changes
+from app.services.export import (
+    vocabulary_base_uri, concept_iri, add_term_triples, populate_vocabulary_graph
+)
+from app.services.snapshot import read_snapshot, write_snapshot
+
+
+class VocabularyStore:
+    """In-memory rdflib Dataset kept in step with the database."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._dataset = None
+        self._graphs = {}  # vocab_id -> named graph identifier
+        self._versions = {}  # vocab_id -> content_version the graph reflects
+        self._pending = {}  # vocab_id -> set of concept_ids, or None for a full reload
+
+    def notify(self, change):
+        """Mark a vocabulary (or some of its concepts) as stale after a commit."""
+        with self._lock:
+            if self._dataset is None:
+                return
+            vocab_id = change.vocab_id
+            version = self._versions.get(vocab_id)
+            if version is not None and version >= change.new_version:
+                return  # Loaded after the change
+            if change.concept_ids is None or version != change.old_version:
+                # Metadata change, or we missed writes from another process
+                self._pending[vocab_id] = None
+                return
+            if vocab_id not in self._pending:
+                self._pending[vocab_id] = set(change.concept_ids)
+            elif self._pending[vocab_id] is not None:
+                self._pending[vocab_id].update(change.concept_ids)
+            self._versions[vocab_id] = change.new_version
+
+    def reset(self):
+        """Drop the dataset; it is reloaded on next use."""
+        with self._lock:
+            self._dataset = None
+            self._graphs = {}
+            self._versions = {}
+            self._pending = {}
+
+    def dataset(self):
+        """Return the dataset, loading it or applying pending patches first."""
+        with self._lock:
+            if self._dataset is None:
+                self._load_all()
+                return self._dataset
+            self._check_versions()
+            if self._pending:
+                pending, self._pending = self._pending, {}
+                for vocab_id, concept_ids in pending.items():
+                    if concept_ids is None:
+                        self._load_vocabulary(vocab_id)
+                    else:
+                        self._patch_terms(vocab_id, concept_ids)
+            return self._dataset
+
+    def query(self, query, offset=0, limit=None):
+        """
+        Run a SPARQL query over the union of all vocabulary graphs.
+
+        Only the SELECT solutions in [offset, offset + limit) are kept (all
+        of them when limit is None); the others are counted and dropped.
+
+        Returns:
+            (rdflib Result, number of SELECT solutions or None)
+        """
+        with self._lock:
+            dataset = self.dataset()
+            # The processor hands back the solutions as a lazy iterator, which
+            # Graph.query would wrap in a Result that keeps every one of them
+            evaluated = SPARQLProcessor(dataset).query(query, initNs=dict(dataset.namespaces()))
+            if evaluated['type_'] != 'SELECT':
+                return SPARQLResult(evaluated), None
+            end = None if limit is None else offset + limit
+            page = []
+            total = 0
+            for solution in evaluated['bindings']:
+                if total >= offset and (end is None or total < end):
+                    page.append(solution)
+                total += 1
+            return SPARQLResult(dict(evaluated, bindings=page)), total
+
+    def _check_versions(self):
+        """Schedule a reload of vocabularies written by other processes."""
+        current = dict(db.session.query(Vocabulary.id, Vocabulary.content_version).all())
+        for vocab_id, version in current.items():
+            if self._versions.get(vocab_id) != version:
+                self._pending[vocab_id] = None
+        for vocab_id in list(self._graphs):
+            if vocab_id not in current:
+                self._pending[vocab_id] = None
+
+    def _load_all(self):
+        self._dataset = Dataset(default_union=True)
+        self._graphs = {}
+        self._versions = {}
+        self._pending = {}
+        for vocab in Vocabulary.query.all():
+            self._add_vocabulary(vocab)
+
+    def _add_vocabulary(self, vocab):
+        identifier = URIRef(vocabulary_base_uri(vocab))
+        g = self._dataset.graph(identifier)
+        
+        # Prefer the binary snapshot; fall back to the database and refresh it
+        use_snapshots = current_app.config.get('SNAPSHOTS_ENABLED', True)
+        snapshot = read_snapshot(vocab.id) if use_snapshots else None
+        if snapshot and snapshot[0] == vocab.content_version:
+            g.addN((s, p, o, g) for s, p, o in snapshot[1])
+        else:
+            populate_vocabulary_graph(g, vocab)
+            if use_snapshots:
+                try:
+                    write_snapshot(vocab.id, vocab.content_version, g)
+                except OSError as e:
+                    current_app.logger.warning(f"Could not write snapshot for vocabulary {vocab.id}: {e}")
+        
+        self._graphs[vocab.id] = identifier
+        self._versions[vocab.id] = vocab.content_version
+
+    def _drop_vocabulary(self, vocab_id):
+        self._versions.pop(vocab_id, None)
+        identifier = self._graphs.pop(vocab_id, None)
+        if identifier is not None:
+            self._dataset.remove_graph(identifier)
+
+    def _load_vocabulary(self, vocab_id):
+        self._drop_vocabulary(vocab_id)
+        vocab = Vocabulary.query.get(vocab_id)
+        if vocab:
+            self._add_vocabulary(vocab)
+
+    def _patch_terms(self, vocab_id, concept_ids):
+        if vocab_id not in self._graphs:
+            self._load_vocabulary(vocab_id)
+            return
+
+        vocab = Vocabulary.query.get(vocab_id)
+        if not vocab:
+            self._drop_vocabulary(vocab_id)
+            return
+
+        base_uri = vocabulary_base_uri(vocab)
+        g = self._dataset.graph(self._graphs[vocab_id])
+        for concept_id in concept_ids:
+            g.remove((URIRef(concept_iri(base_uri, concept_id)), None, None))
+
+        terms = Term.query.filter(
+            Term.vocab_id == vocab_id,
+            Term.concept_id.in_(list(concept_ids)),
+            Term.status == 'approved'
+        ).all()
+        for term in terms:
+            add_term_triples(g, term, base_uri)
+
+
+store = VocabularyStore()
+
+
+def vocabulary_versions():
+    """
+    Return {vocab_id: (content_version, named graph IRI)} straight from the database.
+
+    Cheap enough to call per request; it does not load any graph.
+    """
+    rows = db.session.query(
+        Vocabulary.id, Vocabulary.code, Vocabulary.base_uri, Vocabulary.content_version
+    ).all()
+    return {row.id: (row.content_version, URIRef(vocabulary_base_uri(row))) for row in rows}
+
+
+def init_app(app):
+    """Subscribe the store to committed vocabulary changes."""
+    changes.subscribe(store.notify)
@@ -0,0 +1,190 @@
+"""Tabular (CSV / XLSX) thesaurus readers.
+
+The source thesauri under data/CSV and data/XLSX have one concept per row
+and SKOS-style headers such as ``ID``, ``SKOS:prefLabel "es"`` or
+``SKOS:broader``; multi-valued cells hold one value per line. Rows are read
+one at a time (csv module, openpyxl read-only mode) and turned into the same
+term dicts as skos_reader.build_term, so they can be fed to the bulk writer
+in chunks whatever the size of the sheet.
+
+A column mapping assigns headers to Term fields. By default it is derived
+from the headers (see parse_header); callers can pass their own, e.g.
+``{'Código': 'concept_id', 'Nombre': 'pref_label_es', 'Sinónimos': 'alt_labels@es'}``.
+Columns without a mapping (scope notes, coordinates...) are ignored.
+"""
+import csv
+import io
+import os
+import re
+import unicodedata
+import zipfile
+
+TABULAR_FORMATS = {'csv', 'xlsx'}
+
+# Mapping targets: Term fields plus the concept_id key column
+LABEL_FIELDS = ('pref_label', 'definition')
+LIST_FIELDS = ('alt_labels', 'broader', 'narrower', 'related', 'exact_match', 'close_match')
+TEXT_FIELDS = ('concept_id', 'pref_label_es', 'pref_label_en', 'definition_es', 'definition_en', 'source')
+
+# Header property (lowercase local name, prefix ignored) -> field
+HEADER_PROPERTIES = {
+    'id': 'concept_id',
+    'preflabel': 'pref_label',
+    'definition': 'definition',
+    'altlabel': 'alt_labels',
+    'broader': 'broader',
+    'narrower': 'narrower',
+    'related': 'related',
+    'exactmatch': 'exact_match',
+    'closematch': 'close_match',
+    'source': 'source',
+}
+
+_HEADER = re.compile(r'^\s*(?:[\w-]+:)?(?P<name>[\w-]+)\s*(?:"(?P<lang>[\w-]+)")?\s*$')
+_VALUE_SEPARATOR = re.compile(r'\s*\n\s*')
+
+
+def parse_header(header):
+    """
+    Map a column header to a field, e.g. 'SKOS:prefLabel "es"' -> 'pref_label_es'.
+
+    Returns:
+        Field spec ('pref_label_es', 'broader', 'alt_labels@en', ...) or None
+    """
+    match = _HEADER.match(str(header or ''))
+    if not match:
+        return None
+    field = HEADER_PROPERTIES.get(match.group('name').lower())
+    lang = match.group('lang')
+    if field in LABEL_FIELDS:
+        return f"{field}_{lang or 'es'}" if (lang or 'es') in ('es', 'en') else None
+    if field == 'alt_labels' and lang:
+        return f'alt_labels@{lang}'
+    return field
+
+
+def _columns(headers, column_map):
+    """(index, field, lang) for every mapped column of a header row."""
+    columns = []
+    for index, header in enumerate(headers):
+        if column_map is not None:
+            spec = column_map.get(str(header).strip()) if header is not None else None
+        else:
+            spec = parse_header(header)
+        if not spec:
+            continue
+        field, _, lang = spec.partition('@')
+        if field not in TEXT_FIELDS and field not in LIST_FIELDS:
+            raise ValueError(f"Unknown field '{field}' for column '{header}'")
+        columns.append((index, field, lang or None))
+    if not any(field == 'concept_id' for _, field, _ in columns):
+        raise ValueError('No ID column found')
+    return columns
+
+
+def _cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Spreadsheets store codes such as 1 as 1.0
+    return str(value).strip() or None
+
+
+def build_row_term(row, columns):
+    """Build a term dict (see skos_reader.build_term) from a row, or None for rows without an ID."""
+    term = {field: None for field in TEXT_FIELDS}
+    term.update({field: [] for field in LIST_FIELDS})
+    for index, field, lang in columns:
+        value = _cell_text(row[index]) if index < len(row) else None
+        if value is None:
+            continue
+        if field in LIST_FIELDS:
+            values = _VALUE_SEPARATOR.split(value) if '\n' in value else (value,)
+            if field == 'alt_labels':
+                term[field].extend({'label': label, 'lang': lang} for label in values)
+            else:
+                term[field].extend(values)
+        elif term[field] is None:
+            # Repeated headers (e.g. two 'prefLabel "en"' columns): the first value wins
+            term[field] = value
+    if not term['concept_id']:
+        return None
+    return term
+
+
+def iter_csv_rows(fileobj):
+    """Yield the rows of a CSV file (binary file object, UTF-8 with or without BOM)."""
+    try:
+        yield from csv.reader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline=''))
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV: {e}") from e
+
+
+def iter_xlsx_rows(fileobj):
+    """Yield the rows of the first sheet of an XLSX workbook, without loading it whole."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ValueError('XLSX import requires the openpyxl package') from e
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, OSError) as e:
+        raise ValueError(f"Invalid XLSX file: {e}") from e
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+ROW_READERS = {
+    'csv': iter_csv_rows,
+    'xlsx': iter_xlsx_rows,
+}
+
+
+def iter_tabular_terms(fileobj, format, column_map=None):
+    """
+    Yield a term dict for every concept row of a CSV or XLSX file.
+
+    Args:
+        fileobj: Binary file object
+        format: One of TABULAR_FORMATS
+        column_map: Optional {header: field spec} mapping (see parse_header);
+            by default the mapping is derived from the headers
+
+    Raises:
+        ValueError: if the file has no header row or no ID column
+    """
+    rows = ROW_READERS[format](fileobj)
+    for headers in rows:
+        if any(_cell_text(header) for header in headers):
+            break
+    else:
+        raise ValueError('The file has no header row')
+    columns = _columns(headers, column_map)
+    for row in rows:
+        term = build_row_term(row, columns)
+        if term is not None:
+            yield term
+
+
+def tabular_vocabulary_info(filename):
+    """
+    Vocabulary metadata for a new vocabulary imported from a table, from its file name.
+
+    'tesauro de banderas de calidad.xlsx' -> code BANDERAS_DE_CALIDAD, the
+    code rdf_loader gives the matching data/RDF file.
+    """
+    name = os.path.splitext(os.path.basename(filename or ''))[0].strip(' _')
+    name = re.sub(r'^tesauro de\s+', '', name, flags=re.IGNORECASE) or 'Imported Vocabulary'
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return {
+        'uri': None,
+        'code': re.sub(r'\W+', '_', ascii_name).strip('_').upper() or 'IMPORTED',
+        'name': name[:1].upper() + name[1:],
+        'name_en': None,
+        'description': None,
+        'description_en': None,
+    }
@@ -0,0 +1,280 @@
+"""Per-vocabulary statistics for the vocabulary list and the home page.
+
+Counting the terms of every vocabulary on each page view costs a scan per
+vocabulary. Instead, VocabularyStats keeps one row per vocabulary with its
+live and soft-deleted term counts and the time of its latest term write.
+
+The row is adjusted, not recounted, by the transactions that write terms:
+each flush compares the written Terms' committed state with their new one
+(see _after_flush) and bulk upserts report the concepts they insert (see
+record_write). The deltas collected in the session are applied with one
+UPDATE per vocabulary just before the commit, so ORM edits and chunked
+imports cost the same whatever the size of the vocabulary. Vocabularies
+without a stats row yet, hard-deleted terms, terms whose previous state was
+not loaded, savepoint rollbacks and the bootstrap loader fall back to
+refresh_stats, a full recount.
+
+Readers go through an in-process cache stamped with each vocabulary's
+content_version, which every term write bumps. The pages load the
+vocabularies anyway, so a warm cache answers them without touching the
+stats table, and a stale entry is simply re-read.
+"""
+import threading
+from collections import namedtuple
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, select, update
+from sqlalchemy.orm import Session
+from app.models import db, Vocabulary, Term, ChangeRequest, VocabularyStats
+
+VocabStats = namedtuple('VocabStats', 'live_terms deleted_terms last_modified_at')
+
+# Vocabularies without a stats row (no term written yet)
+EMPTY_STATS = VocabStats(0, 0, None)
+
+STATS_COLUMNS = ('vocab_id', 'live_terms', 'deleted_terms', 'last_modified_at')
+
+# session.info key of {vocab_id: [live delta, deleted delta, latest updated_at] | None}
+DELTAS_KEY = 'vocab_stats_deltas'
+
+
+def stats_row(vocab_id):
+    """Select of the STATS_COLUMNS row of a vocabulary, computed from its terms."""
+    terms = Term.__table__
+    # Each figure is answered by an index on (vocab_id, ...): the live partial
+    # index, the unique constraint and ix_terms_vocab_updated
+    live = (select(func.count()).select_from(terms)
+            .where(terms.c.vocab_id == vocab_id, terms.c.deleted_at.is_(None)).scalar_subquery())
+    total = select(func.count()).select_from(terms).where(terms.c.vocab_id == vocab_id).scalar_subquery()
+    last_modified = select(func.max(terms.c.updated_at)).where(terms.c.vocab_id == vocab_id).scalar_subquery()
+    return select(literal(vocab_id), live, total - live, last_modified)
+
+
+def refresh_stats(connection, vocab_id, concept_ids=None):
+    """
+    Recount the VocabularyStats row of a vocabulary from its terms.
+
+    Used when the written terms' previous state is unknown: by the bootstrap
+    loader, for vocabularies without a stats row and after hard deletes.
+
+    Args:
+        connection: Connection of the writing transaction
+        vocab_id: Vocabulary ID
+        concept_ids: Ignored; the whole row is recounted
+    """
+    stats = VocabularyStats.__table__
+    connection.execute(delete(stats).where(stats.c.vocab_id == vocab_id))
+    connection.execute(insert(stats).from_select(STATS_COLUMNS, stats_row(vocab_id)))
+
+
+def _apply_delta(connection, vocab_id, delta):
+    """Adjust a stats row by a [live, deleted, latest updated_at] delta, or recount it."""
+    if delta is None:
+        refresh_stats(connection, vocab_id)
+        return
+    live, deleted, modified_at = delta
+    stats = VocabularyStats.__table__
+    values = {
+        'live_terms': stats.c.live_terms + live,
+        'deleted_terms': stats.c.deleted_terms + deleted,
+    }
+    if modified_at is not None:
+        values['last_modified_at'] = case(
+            (stats.c.last_modified_at.is_(None) | (stats.c.last_modified_at < modified_at), modified_at),
+            else_=stats.c.last_modified_at
+        )
+    result = connection.execute(update(stats).where(stats.c.vocab_id == vocab_id).values(**values))
+    if result.rowcount == 0:
+        refresh_stats(connection, vocab_id)
+
+
+def _add_delta(session, vocab_id, live=0, deleted=0, modified_at=None):
+    deltas = session.info.setdefault(DELTAS_KEY, {})
+    if vocab_id in deltas and deltas[vocab_id] is None:
+        return
+    delta = deltas.setdefault(vocab_id, [0, 0, None])
+    delta[0] += live
+    delta[1] += deleted
+    if modified_at is not None and (delta[2] is None or modified_at > delta[2]):
+        delta[2] = modified_at
+
+
+def record_write(vocab_id, added, modified_at, session=None):
+    """
+    Record terms inserted by a bulk statement, for the stats delta.
+
+    Bulk upserts never change deleted_at, so only the concepts they insert
+    change the counts. A concept inserted concurrently by another
+    transaction is counted by both; the next recount corrects it.
+
+    Args:
+        vocab_id: Vocabulary ID
+        added: Number of live terms inserted
+        modified_at: updated_at written to the rows
+        session: Session the write was made in (defaults to db.session)
+    """
+    if session is None:
+        session = db.session()
+    _add_delta(session, vocab_id, live=added, modified_at=modified_at)
+
+
+# Previous value of an attribute that was assigned without being loaded first
+_UNKNOWN = object()
+
+
+def _committed(state, key):
+    """Value of an attribute as last loaded from the database, or _UNKNOWN."""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    if history.added:
+        return _UNKNOWN
+    return getattr(state.obj(), key)  # Expired and untouched: load it
+
+
+def _recount(session, vocab_id):
+    session.info.setdefault(DELTAS_KEY, {})[vocab_id] = None
+
+
+def _after_flush(session, flush_context):
+    """Collect the stats deltas of the Terms written by this flush."""
+    for obj in session.new:
+        if isinstance(obj, Term):
+            live = obj.deleted_at is None
+            _add_delta(session, obj.vocab_id, live=int(live), deleted=int(not live),
+                       modified_at=obj.updated_at)
+    for obj in session.deleted:
+        if isinstance(obj, Term):
+            # The latest updated_at may have gone with the row
+            _recount(session, _committed(inspect(obj), 'vocab_id'))
+    for obj in session.dirty:
+        if not isinstance(obj, Term) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        old_vocab_id = _committed(state, 'vocab_id')
+        old_deleted_at = _committed(state, 'deleted_at')
+        if old_vocab_id is _UNKNOWN or old_deleted_at is _UNKNOWN:
+            # Assigned on an expired instance: its previous state is not known
+            _recount(session, obj.vocab_id)
+            if old_vocab_id is not _UNKNOWN:
+                _recount(session, old_vocab_id)
+            continue
+        was_live = old_deleted_at is None
+        _add_delta(session, old_vocab_id, live=-int(was_live), deleted=-int(not was_live))
+        live = obj.deleted_at is None
+        _add_delta(session, obj.vocab_id, live=int(live), deleted=int(not live),
+                   modified_at=obj.updated_at)
+
+
+def _before_commit(session):
+    """Apply the collected deltas in the committing transaction."""
+    session.flush()  # Pending ORM changes add to the deltas
+    deltas = session.info.pop(DELTAS_KEY, None)
+    if not deltas:
+        return
+    connection = session.connection()
+    for vocab_id, delta in deltas.items():
+        _apply_delta(connection, vocab_id, delta)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    deltas = session.info.get(DELTAS_KEY)
+    if deltas and previous_transaction.nested:
+        # The savepoint's writes are gone but not told apart from the others
+        for vocab_id in deltas:
+            deltas[vocab_id] = None
+
+
+def _after_rollback(session):
+    session.info.pop(DELTAS_KEY, None)
+
+
+class StatsCache:
+    """VocabStats keyed by vocab_id, each stamped with the content_version it was read at."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # vocab_id -> (content_version, VocabStats)
+
+    def get_many(self, versions):
+        """{vocab_id: VocabStats} for the entries still at the given {vocab_id: content_version}."""
+        found = {}
+        with self._lock:
+            for vocab_id, version in versions.items():
+                entry = self._entries.get(vocab_id)
+                if entry is not None and entry[0] == version:
+                    found[vocab_id] = entry[1]
+        return found
+
+    def put(self, vocab_id, version, stats):
+        with self._lock:
+            self._entries[vocab_id] = (version, stats)
+
+
+cache = StatsCache()
+
+
+def vocabulary_stats(vocabularies):
+    """
+    Statistics of the given vocabularies, with at most one query.
+
+    Args:
+        vocabularies: Vocabulary objects or rows with id and content_version
+
+    Returns:
+        {vocab_id: VocabStats}
+    """
+    versions = {vocab.id: vocab.content_version for vocab in vocabularies}
+    result = cache.get_many(versions)
+    missing = [vocab_id for vocab_id in versions if vocab_id not in result]
+    if missing:
+        rows = VocabularyStats.query.filter(VocabularyStats.vocab_id.in_(missing))
+        found = {
+            row.vocab_id: VocabStats(row.live_terms, row.deleted_terms, row.last_modified_at)
+            for row in rows
+        }
+        for vocab_id in missing:
+            result[vocab_id] = found.get(vocab_id, EMPTY_STATS)
+            cache.put(vocab_id, versions[vocab_id], result[vocab_id])
+    return result
+
+
+def pending_requests():
+    """
+    Pending change requests per vocabulary.
+
+    Not cached: requests do not bump content_version, and the review queue is short.
+
+    Returns:
+        {vocab_id: count}
+    """
+    rows = db.session.execute(
+        select(ChangeRequest.vocab_id, func.count())
+        .where(ChangeRequest.status == 'pending')
+        .group_by(ChangeRequest.vocab_id)
+    )
+    return {vocab_id: count for vocab_id, count in rows}
+
+
+def catalogue_totals():
+    """
+    Vocabulary and live concept totals for the home page.
+
+    Returns:
+        dict with 'vocabularies' and 'concepts'
+    """
+    vocabularies = db.session.execute(select(Vocabulary.id, Vocabulary.content_version)).all()
+    stats = vocabulary_stats(vocabularies)
+    return {
+        'vocabularies': len(vocabularies),
+        'concepts': sum(entry.live_terms for entry in stats.values()),
+    }
+
+
+def init_app(app):
+    """Keep VocabularyStats in step with the term writes of every transaction (idempotent)."""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'before_commit', _before_commit)
+        event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+        event.listen(Session, 'after_rollback', _after_rollback)
@@ -0,0 +1,114 @@
+"""
+Benchmark: single-pass concept extraction vs. per-predicate graph lookups.
+
+Loads the vocabularies in data/RDF, scales them up by cloning every concept
+under new URIs, and times skos_reader.extract_terms() against the previous
+approach of one graph.objects() call per predicate per concept. Runs without
+a database.
+
+    python benchmarks/bench_extraction.py --scale 20
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rdflib import Graph, URIRef, RDF, SKOS, DCTERMS  # noqa: E402
+from app.services.export import DC  # noqa: E402
+from app.services.skos_reader import extract_terms, local_name  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'RDF')
+
+
+def load_scaled(scale):
+    """Parse every data/RDF file and clone each concept scale times."""
+    source = Graph()
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, '*.rdf'))):
+        source.parse(path)
+
+    concepts = set(source.subjects(RDF.type, SKOS.Concept))
+    g = Graph()
+    for copy in range(scale):
+        def rename(node):
+            if node in concepts:
+                return URIRef(f"{node}_{copy}" if copy else str(node))
+            return node
+        for s, p, o in source:
+            g.add((rename(s), p, rename(o)))
+    return g
+
+
+def legacy_extract_terms(graph):
+    """The per-predicate lookups the importers used before skos_reader."""
+    terms = []
+    for concept in graph.subjects(RDF.type, SKOS.Concept):
+        term = {
+            'concept_id': local_name(concept), 'uri': str(concept),
+            'pref_label_es': None, 'pref_label_en': None,
+            'definition_es': None, 'definition_en': None,
+            'alt_labels': [], 'broader': [], 'narrower': [], 'related': [],
+            'exact_match': [], 'close_match': [], 'source': None
+        }
+        for label in graph.objects(concept, SKOS.prefLabel):
+            if label.language == 'es':
+                term['pref_label_es'] = str(label)
+            elif label.language == 'en':
+                term['pref_label_en'] = str(label)
+            elif not term['pref_label_es']:
+                term['pref_label_es'] = str(label)
+        for label in graph.objects(concept, SKOS.altLabel):
+            term['alt_labels'].append({'label': str(label), 'lang': label.language})
+        for defn in graph.objects(concept, SKOS.definition):
+            if defn.language == 'es':
+                term['definition_es'] = str(defn)
+            elif defn.language == 'en':
+                term['definition_en'] = str(defn)
+            elif not term['definition_es']:
+                term['definition_es'] = str(defn)
+        for key, predicate in (('broader', SKOS.broader), ('narrower', SKOS.narrower),
+                               ('related', SKOS.related)):
+            term[key] = [local_name(uri) for uri in graph.objects(concept, predicate)]
+        term['exact_match'] = [str(uri) for uri in graph.objects(concept, SKOS.exactMatch)]
+        term['close_match'] = [str(uri) for uri in graph.objects(concept, SKOS.closeMatch)]
+        for predicate in (DC.source, DCTERMS.source):
+            for source in graph.objects(concept, predicate):
+                term['source'] = str(source)
+                break
+            if term['source']:
+                break
+        terms.append(term)
+    return terms
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=int, default=20, help='copies of every concept')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    graph = load_scaled(args.scale)
+    print(f"{len(graph)} triples")
+
+    best = {}
+    for _ in range(args.repeat):
+        for name, fn in (('per-predicate', legacy_extract_terms), ('single-pass', extract_terms)):
+            elapsed, terms = timed(fn, graph)
+            best[name] = min(best.get(name, elapsed), elapsed)
+            count = len(terms)
+
+    for name, elapsed in best.items():
+        print(f"{name:>14}: {elapsed:7.3f}s  {count / elapsed:10.0f} concepts/s")
+    print(f"speedup: {best['per-predicate'] / best['single-pass']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: direct SKOS writers vs. the rdflib Graph + serializer path.
+
+Runs without a database: terms are synthetic column tuples shaped like the
+rows export.iter_term_rows() yields.
+
+    python benchmarks/bench_serializers.py --concepts 20000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rdflib import Graph  # noqa: E402
+from app.services.export import (  # noqa: E402
+    TERM_RDF_COLUMNS, vocabulary_base_uri, add_scheme_triples, add_term_triples
+)
+from app.services.skos_writer import WRITERS  # noqa: E402
+
+Row = namedtuple('Row', [column.key for column in TERM_RDF_COLUMNS])
+
+RDFLIB_FORMATS = {'ttl': 'turtle', 'rdf': 'xml', 'jsonld': 'json-ld'}
+
+
+def make_rows(count):
+    rows = []
+    for i in range(count):
+        parent = [f"C{(i - 1) // 4}"] if i else []
+        rows.append(Row(
+            concept_id=f"C{i}",
+            pref_label_es=f"Concepto {i}",
+            pref_label_en=f"Concept {i}",
+            definition_es=f"Definición del concepto {i}, con \"comillas\".",
+            definition_en=f"Definition of concept {i}.",
+            alt_labels=[{'label': f"Alt {i}", 'lang': 'en'}],
+            broader=parent,
+            narrower=[f"C{i * 4 + k}" for k in range(1, 5) if i * 4 + k < count],
+            related=[f"C{(i + 7) % count}"],
+            exact_match=[f"http://vocab.nerc.ac.uk/collection/P01/current/X{i}/"],
+            close_match=[],
+            source="Gabinete de oceanografía física, INIDEP.",
+        ))
+    return rows
+
+
+def bench_rdflib(vocab, rows, format):
+    base_uri = vocabulary_base_uri(vocab)
+    g = Graph()
+    add_scheme_triples(g, vocab, base_uri)
+    for row in rows:
+        add_term_triples(g, row, base_uri)
+    return len(g.serialize(format=RDFLIB_FORMATS[format]).encode('utf-8'))
+
+
+def bench_direct(vocab, rows, format):
+    return sum(len(chunk.encode('utf-8')) for chunk in WRITERS[format](vocab, iter(rows)))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    size = fn(*args)
+    return time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, default=20000)
+    args = parser.parse_args()
+
+    vocab = SimpleNamespace(code='BENCH', name='Benchmark', description='Synthetic vocabulary',
+                            base_uri='https://vocab.example.org/bench/')
+    rows = make_rows(args.concepts)
+
+    print(f"{args.concepts} concepts")
+    print(f"{'format':<8}{'rdflib (s)':>12}{'direct (s)':>12}{'speedup':>10}{'concepts/s':>14}")
+    for format in WRITERS:
+        rdflib_time, _ = timed(bench_rdflib, vocab, rows, format)
+        direct_time, _ = timed(bench_direct, vocab, rows, format)
+        print(f"{format:<8}{rdflib_time:>12.3f}{direct_time:>12.3f}"
+              f"{rdflib_time / direct_time:>9.1f}x{args.concepts / direct_time:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Benchmark suite: import, export and SPARQL on synthetic vocabularies.
+
+For every size, a seeded vocabulary (see synthetic.py) is written as RDF/XML
+and pushed through the pipeline stage by stage:
+
+* without a database: streaming RDF/XML reader, rdf_loader.parse_rdf_source,
+  rdflib parse, skos_reader extraction, each skos_writer serializer and the
+  representative SPARQL queries on the parsed graph;
+* with a PostgreSQL database (--database or DATABASE_URL): import_file
+  (first import and an unchanged re-import), generate_rdf_graph, every export
+  stream and the SPARQL queries through the endpoint's store. The benchmark
+  vocabulary is deleted afterwards unless --keep is given. The SPARQL store
+  loads every vocabulary of that database, so use a dedicated one.
+
+Stages that need a whole rdflib Graph in memory are skipped above
+--graph-limit concepts. Each stage runs --warmup untimed times and then
+--repeats timed times; its minimum and median are recorded. Results are
+printed and, with --output, written as JSON; --baseline compares the median
+of every stage against an earlier JSON file and exits with status 1 when a
+stage is slower by more than --tolerance.
+
+    python benchmarks/run_suite.py --sizes 1000,100000 --output results.json
+    python benchmarks/run_suite.py --sizes 1000000 --database postgresql://... --baseline results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_GRAPH_LIMIT = 100000
+DEFAULT_REPEATS = 3
+DEFAULT_WARMUP = 1
+
+# Stages faster than this are too noisy to flag as regressions
+MIN_COMPARABLE_SECONDS = 0.1
+
+SPARQL_QUERIES = {
+    'label_lookup': """
+        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+        SELECT ?concept WHERE {{ ?concept skos:prefLabel ?label . FILTER(STR(?label) = "{label}") }}
+    """,
+    'top_concepts': """
+        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+        SELECT ?concept WHERE {{ ?concept a skos:Concept FILTER NOT EXISTS {{ ?concept skos:broader ?parent }} }}
+    """,
+    'children_per_parent': """
+        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+        SELECT ?parent (COUNT(?child) AS ?children) WHERE {{ ?child skos:broader ?parent }}
+        GROUP BY ?parent ORDER BY DESC(?children) LIMIT 10
+    """,
+    'label_search': """
+        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+        SELECT ?concept ?label WHERE {{
+            ?concept skos:prefLabel ?label . FILTER(LANG(?label) = "es" && CONTAINS(LCASE(?label), "salinidad"))
+        }} LIMIT 50
+    """,
+    'ancestors': """
+        PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+        SELECT ?ancestor WHERE {{ <{concept}> skos:broader+ ?ancestor }}
+    """,
+}
+
+
+class Suite:
+    """Collects timed stages as result dicts."""
+
+    def __init__(self, repeats=DEFAULT_REPEATS, warmup=DEFAULT_WARMUP):
+        self.repeats = max(repeats, 1)
+        self.warmup = max(warmup, 0)
+        self.results = []
+
+    def run(self, size, stage, fn, *args, unit='concepts', items=None, setup=None):
+        """
+        Time fn(*args) over warm-up and repeated runs and record it.
+
+        'seconds' is the median of the timed runs ('min_seconds' the fastest),
+        which is what --baseline compares.
+
+        Args:
+            unit: What the stage's item count measures (concepts, bytes, triples, rows...)
+            items: Item count; by default fn's return value when it is an int
+            setup: Called untimed before every run, to undo the previous one
+
+        Returns:
+            fn's return value from the last run
+        """
+        timings = []
+        for run in range(self.warmup + self.repeats):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            value = fn(*args)
+            seconds = time.perf_counter() - start
+            if run >= self.warmup:
+                timings.append(seconds)
+        median = statistics.median(timings)
+        count = items if items is not None else (value if isinstance(value, int) else None)
+        result = {
+            'size': size, 'stage': stage, 'status': 'ok', 'seconds': round(median, 4),
+            'min_seconds': round(min(timings), 4), 'runs': len(timings),
+        }
+        if count is not None:
+            result.update(items=count, unit=unit, per_second=round(count / median) if median else None)
+        self.results.append(result)
+        print(f"{size:>9} {stage:<34} {median:>10.3f} s (min {min(timings):.3f})"
+              + (f" {count:>12} {unit}" if count is not None else ''))
+        return value
+
+    def skip(self, size, stage, reason):
+        self.results.append({'size': size, 'stage': stage, 'status': 'skipped', 'reason': reason})
+        print(f"{size:>9} {stage:<34} {'skipped':>12}  {reason}")
+
+
+def _consume(chunks):
+    """Drain a stream of str/bytes chunks, returning the number of bytes."""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    return size
+
+
+def _queries(vocab):
+    # A concept deep in the hierarchy and an existing label (see synthetic.generate_rows)
+    concept = f"{vocab.base_uri}C{vocab.deep_concept}"
+    return {
+        name: query.format(label=vocab.sample_label, concept=concept)
+        for name, query in SPARQL_QUERIES.items()
+    }
+
+
+def bench_files(suite, size, path, vocab, graph_limit):
+    """Stages that need no database."""
+    from rdflib import Graph
+    from app.services import skos_reader
+    from app.services.rdf_loader import parse_rdf_source
+    from app.services.rdf_stream import iter_rdfxml_blocks
+    from app.services.skos_writer import WRITERS
+    from synthetic import generate_rows
+
+    def stream_blocks():
+        with open(path, 'rb') as f:
+            return sum(1 for _ in iter_rdfxml_blocks(f))
+
+    suite.run(size, 'parse_stream', stream_blocks, unit='blocks')
+    suite.run(size, 'rdf_loader_parse', lambda: len(parse_rdf_source(path)['records']))
+
+    if size > graph_limit:
+        for stage in ('parse_graph', 'extract', 'serialize_*', 'sparql_graph_*'):
+            suite.skip(size, stage, f'more than --graph-limit ({graph_limit}) concepts')
+        return
+
+    graph = None
+
+    def parse_graph():
+        nonlocal graph
+        graph = Graph()
+        return len(graph.parse(path, format='xml'))
+
+    suite.run(size, 'parse_graph', parse_graph, unit='triples')
+    suite.run(size, 'extract', lambda: len(skos_reader.extract_terms(graph)))
+
+    rows = list(generate_rows(size, vocab.seed))
+    for format, writer in WRITERS.items():
+        suite.run(size, f'serialize_{format}', lambda: _consume(writer(vocab, iter(rows))), unit='bytes')
+    del rows
+
+    for name, query in _queries(vocab).items():
+        suite.run(size, f'sparql_graph_{name}', lambda: len(graph.query(query)), unit='rows')
+
+
+def bench_database(suite, size, path, vocab, graph_limit, keep):
+    """Stages that go through the application and PostgreSQL."""
+    from app.models import db, Vocabulary, Term
+    from app.services.export import generate_rdf_graph, stream_ntriples, stream_csv
+    from app.services.import_service import import_file
+    from app.services.skos_writer import WRITERS, stream_vocabulary
+    from app.services.sparql_pool import execute
+    from app.services.sparql_store import store
+
+    def delete_vocabulary():
+        existing = Vocabulary.query.filter_by(code=vocab.code).first()
+        if existing:
+            Term.query.filter_by(vocab_id=existing.id).delete()
+            db.session.delete(existing)
+            db.session.commit()
+
+    imported, stats = suite.run(size, 'persist', lambda: import_file(path, 'xml'), items=size,
+                                setup=delete_vocabulary)
+    suite.run(size, 'persist_unchanged', lambda: import_file(path, 'xml', vocab_id=imported.id), items=size)
+    vocab_id = imported.id
+
+    if size > graph_limit:
+        suite.skip(size, 'generate_rdf_graph', f'more than --graph-limit ({graph_limit}) concepts')
+    else:
+        suite.run(size, 'generate_rdf_graph', lambda: len(generate_rdf_graph(vocab_id)), unit='triples')
+
+    record = Vocabulary.query.get(vocab_id)
+    for format in WRITERS:
+        suite.run(size, f'export_{format}', lambda: _consume(stream_vocabulary(record, format)), unit='bytes')
+    suite.run(size, 'export_nt', lambda: _consume(stream_ntriples(record)), unit='bytes')
+    suite.run(size, 'export_csv', lambda: _consume(stream_csv(vocab_id)), unit='bytes')
+
+    if size > graph_limit:
+        suite.skip(size, 'sparql_*', f'more than --graph-limit ({graph_limit}) concepts')
+    else:
+        suite.run(size, 'sparql_store_load', lambda: len(store.dataset()), unit='triples', setup=store.reset)
+        for name, query in _queries(vocab).items():
+            suite.run(size, f'sparql_{name}', lambda: execute(query)[1], unit='rows')
+
+    if not keep:
+        delete_vocabulary()
+        store.reset()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print stages whose median is slower than the baseline's by more than tolerance; return how many."""
+    with open(baseline_path) as f:
+        baseline = {
+            (result['size'], result['stage']): result['seconds']
+            for result in json.load(f)['results'] if result['status'] == 'ok'
+        }
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for result in results:
+        before = baseline.get((result['size'], result['stage']))
+        if result['status'] != 'ok' or before is None:
+            continue
+        change = (result['seconds'] - before) / before if before else 0
+        result['baseline_seconds'] = before
+        flag = ''
+        if change > tolerance and max(before, result['seconds']) >= MIN_COMPARABLE_SECONDS:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{result['size']:>9} {result['stage']:<34} {before:>10.3f} -> {result['seconds']:>10.3f} s"
+              f" ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated vocabulary sizes in concepts')
+    parser.add_argument('--seed', type=int, default=None, help='Generator seed (default: synthetic.DEFAULT_SEED)')
+    parser.add_argument('--graph-limit', type=int, default=DEFAULT_GRAPH_LIMIT,
+                        help='Largest size for stages that build an in-memory rdflib Graph')
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL'),
+                        help='PostgreSQL URL for the import/export/SPARQL stages')
+    parser.add_argument('--keep', action='store_true', help='Keep the imported benchmark vocabularies')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before flagging (0.2 = 20%%)')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='Timed runs per stage')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help='Untimed runs per stage before those')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported: inline SPARQL and imports, no snapshots
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    os.environ.update(SPARQL_POOL_SIZE='0', IMPORT_WORKERS='0', SNAPSHOTS_ENABLED='0')
+
+    from synthetic import DEFAULT_SEED, benchmark_vocabulary, write_vocabulary, generate_rows
+
+    seed = DEFAULT_SEED if args.seed is None else args.seed
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    use_database = bool(args.database) and args.database.startswith('postgresql')
+    if args.database and not use_database:
+        print('Database stages need PostgreSQL; running the file stages only.')
+
+    app = None
+    if use_database:
+        from app import create_app
+        from app.models import db
+        app = create_app('production')
+        app.app_context().push()
+        db.create_all()
+
+    suite = Suite(args.repeats, args.warmup)
+    with tempfile.TemporaryDirectory(prefix='oceanvocab-bench-') as tmp:
+        for size in sizes:
+            vocab = benchmark_vocabulary(size, seed)
+            vocab.seed = seed
+            path = os.path.join(tmp, f'{vocab.code}.rdf')
+            file_size = suite.run(size, 'generate', write_vocabulary, path, size, seed, items=size)
+            # Query parameters: an existing label, and the last concept (usually several levels deep)
+            sample = next(generate_rows(size, seed))
+            vocab.sample_label = sample.pref_label_es
+            vocab.deep_concept = size - 1
+
+            bench_files(suite, size, path, vocab, args.graph_limit)
+            if use_database:
+                bench_database(suite, size, path, vocab, args.graph_limit, args.keep)
+            else:
+                suite.skip(size, 'database_*', 'no PostgreSQL database configured')
+            suite.results.append({'size': size, 'stage': 'file_bytes', 'status': 'info', 'value': file_size})
+            os.remove(path)
+
+    report = {
+        'suite': 'oceanvocab',
+        'version': 2,
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'revision': git_revision(),
+        'seed': seed,
+        'sizes': sizes,
+        'graph_limit': args.graph_limit,
+        'repeats': suite.repeats,
+        'warmup': suite.warmup,
+        'database': use_database,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+        'results': suite.results,
+    }
+
+    regressions = 0
+    if args.baseline:
+        regressions = compare(suite.results, args.baseline, args.tolerance)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
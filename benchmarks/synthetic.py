@@ -0,0 +1,166 @@
+"""
+Seeded generator of synthetic SKOS vocabularies for the benchmarks.
+
+The vocabularies are shaped like the data/RDF files: bilingual labels and
+definitions, English and Spanish alt labels, dc:source, exactMatch links to
+external collections and a broader/narrower hierarchy a dozen levels deep.
+The same (concepts, seed) pair always produces the same vocabulary, so
+timings from different runs compare like with like.
+
+Rows are generated lazily as tuples with the TERM_RDF_COLUMNS attributes
+(what export.iter_term_rows() yields), so the direct writers in skos_writer
+can turn them into files of any size.
+
+    python benchmarks/synthetic.py --concepts 100000 --output /tmp/bench.rdf
+"""
+import argparse
+import os
+import random
+import sys
+from array import array
+from collections import namedtuple
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.export import TERM_RDF_COLUMNS  # noqa: E402
+from app.services.skos_writer import WRITERS  # noqa: E402
+
+Row = namedtuple('Row', [column.key for column in TERM_RDF_COLUMNS])
+
+DEFAULT_SEED = 42
+
+# Depth of the broader hierarchy; top concepts are one in TOP_CONCEPT_RATE
+MAX_DEPTH = 12
+TOP_CONCEPT_RATE = 200
+
+NOUNS = [
+    ('temperatura', 'temperature'), ('salinidad', 'salinity'), ('presión', 'pressure'),
+    ('corriente', 'current'), ('boya', 'buoy'), ('botella', 'bottle'), ('red', 'net'),
+    ('sensor', 'sensor'), ('puerto', 'port'), ('buque', 'vessel'), ('ola', 'wave'),
+    ('clorofila', 'chlorophyll'), ('oxígeno', 'oxygen'), ('sedimento', 'sediment'),
+]
+ADJECTIVES = [
+    ('superficial', 'surface'), ('profundo', 'deep'), ('costero', 'coastal'),
+    ('disuelto', 'dissolved'), ('medio', 'mean'), ('máximo', 'maximum'),
+    ('fluvial', 'fluvial'), ('discreto', 'discrete'), ('autónomo', 'autonomous'),
+]
+SOURCES = [
+    'Gabinete de oceanografía física, INIDEP.',
+    'Paris. Intergovernmental Oceanographic Commission of UNESCO. 2013.',
+    'https://vocab.nerc.ac.uk/',
+]
+
+
+def benchmark_vocabulary(concepts, seed=DEFAULT_SEED):
+    """The vocabulary object the generated rows belong to (see scheme_statements)."""
+    code = f"bench_{concepts}_{seed}"
+    return SimpleNamespace(
+        code=code,
+        name=f"Vocabulario sintético ({concepts} conceptos)",
+        description=f"Vocabulario generado para benchmarks (semilla {seed}).",
+        base_uri=f"https://vocab.example.org/{code}/",
+    )
+
+
+def _hierarchy(concepts, rng):
+    """
+    Return (parents, child_offsets, children) as arrays; parents[i] is -1 for top concepts.
+
+    Concepts are numbered in creation order, so a parent always precedes its
+    children; children are stored CSR-style (children of i are
+    children[child_offsets[i]:child_offsets[i + 1]]).
+    """
+    parents = array('i', [-1]) * concepts
+    levels = [[] for _ in range(MAX_DEPTH)]
+    for i in range(concepts):
+        if i == 0 or rng.randrange(TOP_CONCEPT_RATE) == 0:
+            levels[0].append(i)
+            continue
+        # Spread concepts evenly over the levels (as deep as the tree already goes)
+        depth = rng.randrange(1, MAX_DEPTH)
+        while not levels[depth - 1]:
+            depth -= 1
+        candidates = levels[depth - 1]
+        parent = candidates[rng.randrange(len(candidates))]
+        parents[i] = parent
+        levels[depth].append(i)
+
+    counts = array('i', [0]) * (concepts + 1)
+    for parent in parents:
+        if parent >= 0:
+            counts[parent + 1] += 1
+    for i in range(concepts):
+        counts[i + 1] += counts[i]
+    child_offsets = array('i', counts)
+    children = array('i', [0]) * concepts
+    fill = array('i', counts)
+    for i, parent in enumerate(parents):
+        if parent >= 0:
+            children[fill[parent]] = i
+            fill[parent] += 1
+    return parents, child_offsets, children
+
+
+def concept_id(i):
+    return f"C{i}"
+
+
+def generate_rows(concepts, seed=DEFAULT_SEED):
+    """Yield the rows of the synthetic vocabulary, parents before children."""
+    rng = random.Random(seed)
+    parents, child_offsets, children = _hierarchy(concepts, rng)
+    for i in range(concepts):
+        noun_es, noun_en = NOUNS[rng.randrange(len(NOUNS))]
+        adj_es, adj_en = ADJECTIVES[rng.randrange(len(ADJECTIVES))]
+        alt_labels = [{'label': f"{noun_en.upper()}{i}", 'lang': 'en'}]
+        if rng.random() < 0.3:
+            alt_labels.append({'label': f"{noun_es} {adj_es} n.º {i}", 'lang': 'es'})
+        related = [concept_id(rng.randrange(concepts))] if rng.random() < 0.1 else []
+        yield Row(
+            concept_id=concept_id(i),
+            pref_label_es=f"{noun_es.capitalize()} {adj_es} {i}",
+            pref_label_en=f"{adj_en.capitalize()} {noun_en} {i}",
+            definition_es=f"Medición de {noun_es} {adj_es} registrada por el concepto {i}.",
+            definition_en=f"Measurement of {adj_en} {noun_en} recorded by concept {i}.",
+            alt_labels=alt_labels,
+            broader=[concept_id(parents[i])] if parents[i] >= 0 else [],
+            narrower=[concept_id(child) for child in children[child_offsets[i]:child_offsets[i + 1]]],
+            related=related,
+            exact_match=(
+                [f"http://vocab.nerc.ac.uk/collection/P01/current/SYN{i:07d}/"]
+                if rng.random() < 0.3 else []
+            ),
+            close_match=[f"https://vocab.example.org/ext/{i}"] if rng.random() < 0.05 else [],
+            source=SOURCES[rng.randrange(len(SOURCES))],
+        )
+
+
+def write_vocabulary(path, concepts, seed=DEFAULT_SEED, format='rdf'):
+    """
+    Write the synthetic vocabulary to a file with a skos_writer writer.
+
+    Returns:
+        Size of the file in bytes
+    """
+    vocab = benchmark_vocabulary(concepts, seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in WRITERS[format](vocab, generate_rows(concepts, seed)):
+            f.write(chunk)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concepts', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--format', choices=sorted(WRITERS), default='rdf')
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    size = write_vocabulary(args.output, args.concepts, args.seed, args.format)
+    print(f"Wrote {args.concepts} concepts ({size} bytes) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
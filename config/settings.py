@@ -8,6 +8,38 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     BABEL_DEFAULT_LOCALE = 'es'
     BABEL_TRANSLATION_DIRECTORIES = '../translations'
+    # Serialized exports; defaults to <instance>/export_cache
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR')
+    # Byte budget of the in-process SPARQL result cache
+    SPARQL_CACHE_MAX_BYTES = int(os.environ.get('SPARQL_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Query isolation: worker processes per web worker (0 runs queries inline),
+    # wall-clock limit in seconds, seconds a query waits for a worker still
+    # loading the dataset, and maximum solutions returned per page
+    SPARQL_POOL_SIZE = int(os.environ.get('SPARQL_POOL_SIZE', 2))
+    SPARQL_TIMEOUT = int(os.environ.get('SPARQL_TIMEOUT', 30))
+    SPARQL_STARTUP_TIMEOUT = int(os.environ.get('SPARQL_STARTUP_TIMEOUT', 300))
+    SPARQL_MAX_RESULTS = int(os.environ.get('SPARQL_MAX_RESULTS', 10000))
+    # Base URI for vocabularies without their own, e.g. https://vocab.example.org/id/{code}/
+    # (served by the /id/<code>/<concept_id> resolver), and resolver cache size
+    CONCEPT_BASE_URI = os.environ.get('CONCEPT_BASE_URI')
+    CONCEPT_CACHE_SIZE = int(os.environ.get('CONCEPT_CACHE_SIZE', 10000))
+    # Binary vocabulary snapshots for fast cold loads; defaults to <instance>/snapshots
+    SNAPSHOTS_ENABLED = os.environ.get('SNAPSHOTS_ENABLED', '1') == '1'
+    SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR')
+    # Catalogue dump (flask export-all, /export/all.nq.gz); defaults to <instance>/dumps
+    DUMP_DIR = os.environ.get('DUMP_DIR')
+    DUMP_WORKERS = int(os.environ['DUMP_WORKERS']) if os.environ.get('DUMP_WORKERS') else None
+    # Background imports: worker threads per web worker (0 runs imports inline)
+    # and spool directory for uploads; defaults to <instance>/imports
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 2))
+    IMPORT_UPLOAD_DIR = os.environ.get('IMPORT_UPLOAD_DIR')
+    # Seconds without a heartbeat after which another process fails a queued or running job
+    IMPORT_HEARTBEAT_TIMEOUT = int(os.environ.get('IMPORT_HEARTBEAT_TIMEOUT', 300))
+    # maintenance_work_mem for the index rebuild at the end of flask bootstrap-rdf
+    BOOTSTRAP_MAINTENANCE_WORK_MEM = os.environ.get('BOOTSTRAP_MAINTENANCE_WORK_MEM', '512MB')
+    # Search: results per page and matches ranked and counted per query
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    SEARCH_MAX_MATCHES = int(os.environ.get('SEARCH_MAX_MATCHES', 10000))
 
 
 class DevelopmentConfig(Config):
@@ -29,6 +61,9 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SPARQL_POOL_SIZE = 0
+    SNAPSHOTS_ENABLED = False
+    IMPORT_WORKERS = 0
 
 
 config = {
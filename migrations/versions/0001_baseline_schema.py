@@ -0,0 +1,103 @@
+"""Baseline schema: users, vocabularies, terms and change requests
+
+The tables as ``flask init-db`` created them before migrations were
+introduced. Databases created that way are brought under Alembic with
+``flask db stamp 0001`` (or ``0002`` if they already have import_jobs).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('last_name', sa.String(length=100), nullable=True),
+        sa.Column('organization', sa.String(length=200), nullable=True),
+        sa.Column('contact', sa.String(length=200), nullable=True),
+        sa.Column('role', sa.String(length=20), nullable=True),
+        sa.Column('password_hash', sa.String(length=256), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table(
+        'vocabularies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=50), nullable=False),
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('name_en', sa.String(length=200), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('description_en', sa.Text(), nullable=True),
+        sa.Column('base_uri', sa.String(length=200), nullable=True),
+        sa.Column('version', sa.String(length=20), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('code')
+    )
+    op.create_table(
+        'terms',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('concept_id', sa.String(length=100), nullable=False),
+        sa.Column('pref_label_es', sa.String(length=500), nullable=True),
+        sa.Column('pref_label_en', sa.String(length=500), nullable=True),
+        sa.Column('definition_es', sa.Text(), nullable=True),
+        sa.Column('definition_en', sa.Text(), nullable=True),
+        sa.Column('alt_labels', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('broader', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('narrower', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('related', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('exact_match', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('close_match', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('source', sa.String(length=500), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('deletion_reason', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'change_requests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('term_id', sa.Integer(), nullable=True),
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('change_type', sa.String(length=20), nullable=False),
+        sa.Column('proposed_data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('reviewer_comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('reviewed_at', sa.DateTime(), nullable=True),
+        sa.Column('reviewed_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['reviewed_by'], ['users.id']),
+        sa.ForeignKeyConstraint(['term_id'], ['terms.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('change_requests')
+    op.drop_table('terms')
+    op.drop_table('vocabularies')
+    op.drop_table('users')
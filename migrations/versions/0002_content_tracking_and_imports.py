@@ -0,0 +1,80 @@
+"""Content versions, term fingerprints, import jobs and source files
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Change tracking (app.services.changes)
+    op.add_column('vocabularies', sa.Column('content_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('vocabularies', sa.Column('content_modified_at', sa.DateTime(), nullable=True))
+    op.alter_column('vocabularies', 'content_version', server_default=None)
+
+    # Bulk upserts and import diffs (app.services.bulk); existing rows get
+    # their content_hash on the next import that touches them
+    op.add_column('terms', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_terms_vocab_concept', 'terms', ['vocab_id', 'concept_id'])
+    op.create_index('ix_terms_broader', 'terms', ['broader'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'broader': 'jsonb_path_ops'})
+
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=True),
+        sa.Column('format', sa.String(length=20), nullable=False),
+        sa.Column('action', sa.String(length=20), nullable=False),
+        sa.Column('vocab_id', sa.Integer(), nullable=True),
+        sa.Column('add_new', sa.Boolean(), nullable=True),
+        sa.Column('update_existing', sa.Boolean(), nullable=True),
+        sa.Column('dry_run', sa.Boolean(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('processed', sa.Integer(), nullable=True),
+        sa.Column('added', sa.Integer(), nullable=True),
+        sa.Column('updated', sa.Integer(), nullable=True),
+        sa.Column('unchanged', sa.Integer(), nullable=True),
+        sa.Column('skipped', sa.Integer(), nullable=True),
+        sa.Column('report', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('files', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'source_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('vocab_id', sa.Integer(), nullable=True),
+        sa.Column('imported_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('filename')
+    )
+
+
+def downgrade():
+    op.drop_table('source_files')
+    op.drop_table('import_jobs')
+    op.drop_index('ix_terms_broader', table_name='terms', postgresql_using='gin')
+    op.drop_constraint('uq_terms_vocab_concept', 'terms', type_='unique')
+    op.drop_column('terms', 'content_hash')
+    op.drop_column('vocabularies', 'content_modified_at')
+    op.drop_column('vocabularies', 'content_version')
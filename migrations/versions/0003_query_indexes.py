@@ -0,0 +1,44 @@
+"""Indexes for the hot term, change request and import job queries
+
+Each index is matched to queries listed in app.services.query_plans, which
+``flask check-query-plans`` runs through EXPLAIN.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_terms_narrower', 'terms', ['narrower'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'narrower': 'jsonb_path_ops'})
+    op.create_index('ix_terms_related', 'terms', ['related'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'related': 'jsonb_path_ops'})
+    op.create_index('ix_terms_vocab_live', 'terms', ['vocab_id', 'concept_id'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_index('ix_terms_vocab_approved', 'terms', ['vocab_id', 'concept_id'], unique=False,
+                    postgresql_where=sa.text("status = 'approved'"))
+    op.create_index('ix_terms_vocab_updated', 'terms', ['vocab_id', 'updated_at'], unique=False)
+    op.create_index('ix_change_requests_status_created', 'change_requests', ['status', 'created_at'], unique=False)
+    op.create_index('ix_change_requests_term', 'change_requests', ['term_id'], unique=False)
+    op.create_index('ix_import_jobs_user_created', 'import_jobs', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_import_jobs_user_created', table_name='import_jobs')
+    op.drop_index('ix_change_requests_term', table_name='change_requests')
+    op.drop_index('ix_change_requests_status_created', table_name='change_requests')
+    op.drop_index('ix_terms_vocab_updated', table_name='terms')
+    op.drop_index('ix_terms_vocab_approved', table_name='terms')
+    op.drop_index('ix_terms_vocab_live', table_name='terms')
+    op.drop_index('ix_terms_related', table_name='terms', postgresql_using='gin')
+    op.drop_index('ix_terms_narrower', table_name='terms', postgresql_using='gin')
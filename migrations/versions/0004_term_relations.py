@@ -0,0 +1,51 @@
+"""Normalized term relations (app.services.relations)
+
+Creates term_relations and fills it from the broader/narrower/related
+arrays of the live terms.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BACKFILL_SQL = """
+INSERT INTO term_relations (vocab_id, source, relation, target)
+SELECT DISTINCT t.vocab_id, t.concept_id, '{relation}', e.value #>> '{{}}'
+FROM terms t,
+     jsonb_array_elements(
+         CASE WHEN jsonb_typeof(t.{relation}) = 'array' THEN t.{relation} ELSE '[]'::jsonb END
+     ) AS e(value)
+WHERE t.deleted_at IS NULL
+  AND jsonb_typeof(e.value) = 'string'
+  AND e.value #>> '{{}}' NOT IN ('', t.concept_id)
+  AND length(e.value #>> '{{}}') <= 500
+"""
+
+
+def upgrade():
+    op.create_table(
+        'term_relations',
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=100), nullable=False),
+        sa.Column('relation', sa.String(length=20), nullable=False),
+        sa.Column('target', sa.String(length=500), nullable=False),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vocab_id', 'source', 'relation', 'target')
+    )
+    for relation in ('broader', 'narrower', 'related'):
+        op.execute(BACKFILL_SQL.format(relation=relation))
+    op.create_index('ix_term_relations_target', 'term_relations', ['vocab_id', 'target', 'relation'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_term_relations_target', table_name='term_relations')
+    op.drop_table('term_relations')
@@ -0,0 +1,96 @@
+"""Closure-table hierarchy index (app.services.closure)
+
+Creates concept_closure and concept_nodes and builds them from
+term_relations for every vocabulary.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+CLOSURE_SQL = """
+INSERT INTO concept_closure (vocab_id, ancestor, descendant, depth)
+WITH RECURSIVE edges(vocab_id, child, parent) AS (
+    SELECT r.vocab_id, CAST(r.source AS VARCHAR), CAST(r.target AS VARCHAR)
+    FROM term_relations r
+    JOIN terms t ON t.vocab_id = r.vocab_id AND t.concept_id = r.target AND t.deleted_at IS NULL
+    WHERE r.relation = 'broader'
+  UNION
+    SELECT r.vocab_id, CAST(r.target AS VARCHAR), CAST(r.source AS VARCHAR)
+    FROM term_relations r
+    JOIN terms t ON t.vocab_id = r.vocab_id AND t.concept_id = r.target AND t.deleted_at IS NULL
+    WHERE r.relation = 'narrower'
+),
+walk(vocab_id, ancestor, descendant, depth) AS (
+    SELECT vocab_id, CAST(concept_id AS VARCHAR), CAST(concept_id AS VARCHAR), 0
+    FROM terms
+    WHERE deleted_at IS NULL
+  UNION
+    SELECT w.vocab_id, e.parent, w.descendant, w.depth + 1
+    FROM walk w
+    JOIN edges e ON e.vocab_id = w.vocab_id AND e.child = w.ancestor
+    WHERE w.depth < 100
+)
+SELECT vocab_id, ancestor, descendant, MIN(depth)
+FROM walk
+GROUP BY vocab_id, ancestor, descendant
+"""
+
+NODES_SQL = """
+INSERT INTO concept_nodes (vocab_id, concept_id, level, child_count, descendant_count, is_top_concept)
+SELECT up.vocab_id, up.concept_id, up.level, down.child_count, down.descendant_count, up.level = 0
+FROM (
+    SELECT vocab_id, descendant AS concept_id, MAX(depth) AS level
+    FROM concept_closure
+    GROUP BY vocab_id, descendant
+) up
+JOIN (
+    SELECT vocab_id, ancestor AS concept_id,
+           SUM(CASE WHEN depth = 1 THEN 1 ELSE 0 END) AS child_count,
+           COUNT(*) - 1 AS descendant_count
+    FROM concept_closure
+    GROUP BY vocab_id, ancestor
+) down ON down.vocab_id = up.vocab_id AND down.concept_id = up.concept_id
+"""
+
+
+def upgrade():
+    op.create_table(
+        'concept_closure',
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('ancestor', sa.String(length=100), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('descendant', sa.String(length=100), nullable=False),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vocab_id', 'ancestor', 'depth', 'descendant')
+    )
+    op.create_table(
+        'concept_nodes',
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('concept_id', sa.String(length=100), nullable=False),
+        sa.Column('level', sa.Integer(), nullable=False),
+        sa.Column('child_count', sa.Integer(), nullable=False),
+        sa.Column('descendant_count', sa.Integer(), nullable=False),
+        sa.Column('is_top_concept', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vocab_id', 'concept_id')
+    )
+    op.execute(CLOSURE_SQL)
+    op.execute(NODES_SQL)
+    op.create_index('ix_concept_closure_descendant', 'concept_closure',
+                    ['vocab_id', 'descendant', 'depth'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_concept_closure_descendant', table_name='concept_closure')
+    op.drop_table('concept_nodes')
+    op.drop_table('concept_closure')
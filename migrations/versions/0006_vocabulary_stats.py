@@ -0,0 +1,44 @@
+"""Per-vocabulary statistics (app.services.vocab_stats)
+
+Creates vocabulary_stats and fills it from terms with one grouped query.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+STATS_SQL = """
+INSERT INTO vocabulary_stats (vocab_id, live_terms, deleted_terms, last_modified_at)
+SELECT vocab_id,
+       SUM(CASE WHEN deleted_at IS NULL THEN 1 ELSE 0 END),
+       SUM(CASE WHEN deleted_at IS NULL THEN 0 ELSE 1 END),
+       MAX(updated_at)
+FROM terms
+GROUP BY vocab_id
+"""
+
+
+def upgrade():
+    op.create_table(
+        'vocabulary_stats',
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('live_terms', sa.Integer(), nullable=False),
+        sa.Column('deleted_terms', sa.Integer(), nullable=False),
+        sa.Column('last_modified_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vocab_id')
+    )
+    op.execute(STATS_SQL)
+
+
+def downgrade():
+    op.drop_table('vocabulary_stats')
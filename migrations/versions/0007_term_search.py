@@ -0,0 +1,89 @@
+"""Full-text and fuzzy term search (app.services.search)
+
+Enables pg_trgm, creates term_search and fills it for every live term with
+the same documents as search.sync_search, then builds the GIN indexes.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# search.ACCENTED / search.PLAIN
+ACCENTED = 'áéíóúüñàèìòùâêîôûçÁÉÍÓÚÜÑÀÈÌÒÙÂÊÎÔÛÇ'
+PLAIN = 'aeiouunaeiouaeioucAEIOUUNAEIOUAEIOUC'
+
+
+def _fold(expression):
+    return f"translate({expression}, '{ACCENTED}', '{PLAIN}')"
+
+
+def _document(config, lang, alt):
+    """Weighted tsvector: preferred label (A), alt labels (B), definition (C)."""
+    parts = ((f"COALESCE(t.pref_label_{lang}, '')", 'A'), (alt, 'B'), (f"COALESCE(t.definition_{lang}, '')", 'C'))
+    return ' || '.join(
+        f"setweight(to_tsvector('{config}', {_fold(expression)}), '{weight}')" for expression, weight in parts
+    )
+
+
+# Alt labels are strings or {"label", "lang"} objects; untagged ones count for both languages
+SEARCH_SQL = f"""
+INSERT INTO term_search (vocab_id, concept_id, document_es, document_en, labels)
+SELECT t.vocab_id, t.concept_id,
+       {_document('spanish', 'es', 'alt.es')},
+       {_document('english', 'en', 'alt.en')},
+       {_fold("concat_ws(' ', NULLIF(t.pref_label_es, ''), NULLIF(t.pref_label_en, ''), NULLIF(alt.all_labels, ''))")}
+FROM terms t
+CROSS JOIN LATERAL (
+    SELECT COALESCE(string_agg(a.label, ' ') FILTER (WHERE a.lang IS DISTINCT FROM 'en'), '') AS es,
+           COALESCE(string_agg(a.label, ' ') FILTER (WHERE a.lang IS DISTINCT FROM 'es'), '') AS en,
+           COALESCE(string_agg(a.label, ' '), '') AS all_labels
+    FROM (
+        SELECT CASE jsonb_typeof(e) WHEN 'string' THEN e #>> '{{}}' ELSE e ->> 'label' END AS label,
+               CASE jsonb_typeof(e) WHEN 'object' THEN e ->> 'lang' END AS lang
+        FROM jsonb_array_elements(
+            CASE jsonb_typeof(t.alt_labels) WHEN 'array' THEN t.alt_labels ELSE '[]'::jsonb END
+        ) e
+        WHERE jsonb_typeof(e) = 'string' OR jsonb_typeof(e -> 'label') = 'string'
+    ) a
+    WHERE a.label <> ''
+) alt
+WHERE t.deleted_at IS NULL
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_table(
+        'term_search',
+        sa.Column('vocab_id', sa.Integer(), nullable=False),
+        sa.Column('concept_id', sa.String(length=100), nullable=False),
+        sa.Column('document_es', postgresql.TSVECTOR(), nullable=True),
+        sa.Column('document_en', postgresql.TSVECTOR(), nullable=True),
+        sa.Column('labels', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['vocab_id'], ['vocabularies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vocab_id', 'concept_id')
+    )
+    op.execute(SEARCH_SQL)
+    op.create_index('ix_term_search_es', 'term_search', ['document_es'], unique=False,
+                    postgresql_using='gin')
+    op.create_index('ix_term_search_en', 'term_search', ['document_en'], unique=False,
+                    postgresql_using='gin')
+    op.create_index('ix_term_search_labels', 'term_search', ['labels'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'labels': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_term_search_labels', table_name='term_search')
+    op.drop_index('ix_term_search_en', table_name='term_search')
+    op.drop_index('ix_term_search_es', table_name='term_search')
+    op.drop_table('term_search')
@@ -0,0 +1,28 @@
+"""Owner and heartbeat of import jobs (app.services.import_jobs)
+
+Lets a starting process tell the jobs of a live sibling from the jobs left
+behind by a process that is gone.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('owner', sa.String(length=100), nullable=True))
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('import_jobs', 'heartbeat_at')
+    op.drop_column('import_jobs', 'owner')